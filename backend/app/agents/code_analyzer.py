@@ -1,16 +1,37 @@
-import google.generativeai as genai
-from typing import Dict, List
+from .gemini_client import GeminiClient
+from .pipeline import Fallback, unwrap
+from .prompt_packer import ENTRY_POINTS, MANIFESTS, PromptPacker
+from ..analysis.engine import get_static_analyzer
+from ..analysis.imports import DependencyGraph
+from ..analysis.stacks import get_stack_detector, primary
+from ..analysis.tree_index import TreeIndex, extension_of
+from ..config import get_settings
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+import asyncio
 import logging
 
+# Rounds of following imports to fetch the modules they point at
+IMPORT_FOLLOW_ROUNDS = 3
+
+# Where execution starts; package markers import things but aren't run
+GRAPH_ENTRY_POINTS = set(ENTRY_POINTS) - {"__init__.py"}
+
 
 class CodeAnalyzerAgent:
     """
     Agent 1: Analyzes code structure, complexity, and patterns
     """
 
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+    def __init__(self, api_key: str, llm: Optional[GeminiClient] = None):
+        self.llm = llm or GeminiClient(api_key)
+        settings = get_settings()
+        self.packer = PromptPacker(
+            budget_tokens=settings.prompt_budget_tokens,
+            max_map_calls=settings.prompt_max_summary_calls,
+            max_file_tokens=settings.prompt_file_max_tokens,
+        )
+        self.static_analyzer = get_static_analyzer()
+        self.stack_detector = get_stack_detector()
         self.logger = logging.getLogger(__name__)
 
     async def analyze_codebase(self, repo_data: Dict) -> Dict:
@@ -23,18 +44,20 @@ class CodeAnalyzerAgent:
 
         # Step 1: Statistical analysis (fast, no LLM needed)
         stats = self._compute_statistics(repo_data)
+        code_metrics = await self._compute_code_metrics(repo_data)
 
         # Step 2: Structure analysis
         structure = self._analyze_structure(repo_data)
 
         # Step 3: Complexity analysis (uses LLM for key files only)
-        complexity = await self._analyze_complexity(repo_data)
+        complexity = unwrap(await self._analyze_complexity(repo_data))
 
         # Step 4: Generate insights
-        key_insights = await self._generate_insights(stats, structure, complexity)
+        key_insights = await self._generate_insights(stats, structure, code_metrics)
 
         return {
             "statistics": stats,
+            "code_metrics": code_metrics,
             "structure": structure,
             "complexity": complexity,
             "key_insights": key_insights,
@@ -42,31 +65,122 @@ class CodeAnalyzerAgent:
 
     def _compute_statistics(self, repo_data: Dict) -> Dict:
         """Calculate basic metrics without LLM"""
-        total_files = 0
+        index = TreeIndex.of(repo_data)
+        file_contents = repo_data.get("file_contents") or {}
         total_lines = 0
-        languages = {}
-
-        def count_recursive(contents):
-            nonlocal total_files, total_lines
-            for item in contents:
-                if item["type"] == "file":
-                    total_files += 1
-                    # Estimate lines (actual count would require fetching content)
-                    total_lines += item.get("size", 0) // 50  # Rough estimate
-                    ext = item["name"].split(".")[-1] if "." in item["name"] else "other"
-                    languages[ext] = languages.get(ext, 0) + 1
-                elif item["type"] == "directory":
-                    count_recursive(item.get("children", []))
-
-        count_recursive(repo_data.get("contents", []))
+        languages: Dict[str, int] = {}
+
+        # Over the files analysis reads; the rest are listed for stack signals
+        files = list(index.readable())
+        exact_files = 0
+        for node, path in files:
+            extension = extension_of(index.names[node])
+            languages[extension] = languages.get(extension, 0) + 1
+            content = file_contents.get(path)
+            if content is not None:
+                # Real count when the archive gave us the content
+                total_lines += len(content.splitlines())
+                exact_files += 1
+            else:
+                total_lines += index.sizes[node] // 50  # Rough estimate
 
         return {
-            "total_files": total_files,
+            "total_files": len(files),
             "estimated_lines": total_lines,
+            "exactly_counted_files": exact_files,
             "languages": languages,
             "primary_language": repo_data.get("language", "Unknown"),
         }
 
+    async def _compute_code_metrics(
+        self, repo_data: Dict, sources: Optional[Dict[str, str]] = None
+    ) -> Dict:
+        """
+        Exact SLOC, comment ratio, complexity and API surface
+
+        PITFALL: size // 50 and extension counts say little about the code
+        SOLUTION: Statically analyze every file whose content we have (the
+        archive, plus the key files fetched for prompts)
+        """
+        index = TreeIndex.of(repo_data)
+        texts = dict(repo_data.get("file_contents") or {}, **(sources or {}))
+        files = {path: (index.sha(path), text) for path, text in texts.items()}
+        return await self.static_analyzer.analyze(files)
+
+    async def _select_key_files(
+        self,
+        repo_data: Dict,
+        fetch: Callable[[List[str]], Awaitable[Dict[str, str]]],
+        limit: int,
+    ) -> Dict:
+        """
+        Choose the files worth reading and fetch the ones we don't have
+
+        PITFALL: Names and sizes alone pick fixtures and helpers while the
+        modules everything imports stay unread
+        SOLUTION: Seed with manifests and entry points, follow their
+        imports through the dependency graph, and keep the most central
+        files. Returns {"files": {path: text} best first, "key_files"}
+        """
+        index = TreeIndex.of(repo_data)
+        known = repo_data.get("file_contents") or {}
+        paths = [path for _, path in index.readable()]
+        entry_points = {p for p in paths if p.rsplit("/", 1)[-1] in GRAPH_ENTRY_POINTS}
+        heuristic = self.packer.select_files(index, limit)
+
+        graph = DependencyGraph(paths)
+        # Archive ingestion already holds every file
+        await asyncio.to_thread(graph.add_files, known)
+
+        fetched: Dict[str, str] = {}
+        attempted = set()
+
+        async def fetch_missing(wanted: List[str]):
+            wanted = [p for p in wanted if p not in known and p not in attempted]
+            attempted.update(wanted)
+            if wanted:
+                texts = await fetch(wanted)
+                fetched.update(texts)
+                graph.add_files(texts)
+
+        await fetch_missing(heuristic[: max(1, limit // 2)])
+        for _ in range(IMPORT_FOLLOW_ROUNDS):
+            room = limit - len(fetched)
+            if room <= 0:
+                break
+            frontier = [
+                path
+                for path in graph.frontier(room + len(attempted), entry_points)
+                if path not in attempted
+            ][:room]
+            if not frontier:
+                break
+            await fetch_missing(frontier)
+
+        available = dict(known, **fetched)
+        key_files = graph.top_k(limit, entry_points, candidates=set(available))
+        # Manifests and entry points lead; the graph orders the rest
+        leading = [
+            p
+            for p in heuristic
+            if p.rsplit("/", 1)[-1] in MANIFESTS or p in entry_points
+        ]
+        order = leading + [item["path"] for item in key_files] + heuristic
+        if len(set(order) & set(available)) < limit:
+            # Fill with the remaining heuristic picks when imports ran dry
+            await fetch_missing([p for p in heuristic if p not in available])
+            available.update(fetched)
+
+        files: Dict[str, str] = {}
+        for path in order:
+            if path in available and path not in files and len(files) < limit:
+                files[path] = available[path]
+        self.logger.info(
+            f"Key files: {len(files)} selected, {len(fetched)} fetched, "
+            f"{len(graph.parsed)} parsed for imports"
+        )
+        return {"files": files, "key_files": key_files}
+
     def _analyze_structure(self, repo_data: Dict) -> Dict:
         """
         Identify project structure patterns
@@ -74,22 +188,15 @@ class CodeAnalyzerAgent:
         PITFALL: Assuming all projects follow standard conventions
         SOLUTION: Look for common patterns but don't force categorization
         """
-        contents = repo_data.get("contents", [])
+        index = TreeIndex.of(repo_data)
+        directories = [name.lower() for name in index.top_level(directories=True)]
+        detected = self.stack_detector.detect(index)
 
         # Common patterns
-        has_tests = any(
-            "test" in item["name"].lower()
-            for item in contents
-            if item["type"] == "directory"
-        )
-        has_docs = any(
-            "doc" in item["name"].lower()
-            for item in contents
-            if item["type"] == "directory"
-        )
-        has_config = any(
-            item["name"]
-            in [
+        has_tests = any("test" in name for name in directories)
+        has_docs = any("doc" in name for name in directories)
+        has_config = not set(index.top_level(directories=False)).isdisjoint(
+            [
                 "package.json",
                 "requirements.txt",
                 "Cargo.toml",
@@ -97,91 +204,83 @@ class CodeAnalyzerAgent:
                 "setup.py",
                 "pyproject.toml",
             ]
-            for item in contents
-            if item["type"] == "file"
         )
 
-        # Identify framework (React, Django, etc.)
-        framework = self._detect_framework(contents)
+        # Identify framework (React, Django, etc.), else the platform
+        framework = primary(detected["stacks"], ("framework", "platform"))
+        project_types = detected["project_types"]
 
         return {
             "has_tests": has_tests,
             "has_documentation": has_docs,
             "has_config_files": has_config,
-            "detected_framework": framework,
-            "project_type": self._infer_project_type(contents, framework),
+            "detected_framework": framework or "Unknown",
+            "project_type": project_types[0]["name"] if project_types else "Unknown",
+            "stacks": detected["stacks"],
+            "project_types": project_types,
         }
 
-    def _detect_framework(self, contents: List[Dict]) -> str:
-        """Detect web framework or project type"""
-        filenames = [item["name"] for item in contents if item["type"] == "file"]
-
-        if "package.json" in filenames:
-            return "Node.js/JavaScript"
-        elif "requirements.txt" in filenames or "setup.py" in filenames:
-            return "Python"
-        elif "Cargo.toml" in filenames:
-            return "Rust"
-        elif "go.mod" in filenames:
-            return "Go"
-        elif "pom.xml" in filenames:
-            return "Java/Maven"
-        else:
-            return "Unknown"
-
-    def _infer_project_type(self, contents: List[Dict], framework: str) -> str:
-        """Guess project type (web app, library, CLI tool, etc.)"""
-        dir_names = [
-            item["name"].lower() for item in contents if item["type"] == "directory"
-        ]
+    async def _build_code_context(
+        self, readme: Optional[str], sources: Dict[str, str]
+    ) -> Dict:
+        """
+        Pack README sections and key source files into the prompt budget
 
-        if "src" in dir_names or "app" in dir_names:
-            if "public" in dir_names or "static" in dir_names:
-                return "Web Application"
-            return "Application"
-        elif "lib" in dir_names:
-            return "Library"
-        else:
-            return "Unknown"
+        PITFALL: Gemini has token limits, and truncating the README hides
+        the code entirely
+        SOLUTION: PromptPacker ranks the material and summarizes what
+        doesn't fit in a bounded number of calls
+        """
+        return await self.packer.build_context(readme, sources, self.llm.generate)
 
-    async def _analyze_complexity(self, repo_data: Dict) -> Dict:
+    async def _analyze_complexity(self, repo_data: Dict) -> Union[Dict, Fallback]:
         """
         Use LLM to assess code complexity
 
-        PITFALL: Gemini has token limits (~30k input tokens for gemini-pro)
-        SOLUTION: Sample only key files (README, main entry points)
+        Reads repo_data["code_context"] when the pipeline already built it,
+        otherwise packs the README and any fetched file contents here. A
+        failed call returns a Fallback with the error as the analysis.
         """
-        readme_content = repo_data.get("readme")
+        code_context = repo_data.get("code_context")
+        if code_context is None:
+            code_context = await self._build_code_context(
+                repo_data.get("readme"), repo_data.get("file_contents") or {}
+            )
 
-        if readme_content:
-            # Truncate to avoid token limits
-            truncated_readme = readme_content[:3000]
+        if not code_context["text"]:
+            return {
+                "complexity_analysis": "Unable to determine - no README or source files found"
+            }
 
-            prompt = f"""
-Analyze this project's README and assess its complexity level:
+        prompt = f"""
+Analyze this project's README and key source files and assess its complexity level:
 
-{truncated_readme}
+{code_context["text"]}
 
 Provide a JSON response with:
 1. complexity_level: "Beginner", "Intermediate", or "Advanced"
-2. key_technologies: List of main technologies mentioned
+2. key_technologies: List of main technologies used
 3. main_purpose: Brief description of project purpose
 4. target_audience: Who would use this project
+5. architecture: How the main components fit together
 
 Format your response as valid JSON only, no markdown.
 """
 
-            try:
-                response = await self.model.generate_content_async(prompt)
-                return {"complexity_analysis": response.text}
-            except Exception as e:
-                self.logger.error(f"Error analyzing complexity: {str(e)}")
-                return {"complexity_analysis": f"Error: {str(e)}"}
-
-        return {"complexity_analysis": "Unable to determine - no README found"}
+        complexity = {
+            "analyzed_files": code_context["included"],
+            "summarized_files": code_context["summarized"],
+            "llm_calls": code_context["map_calls"] + 1,
+        }
+        try:
+            text = await self.llm.generate(prompt)
+        except Exception as e:
+            self.logger.error(f"Error analyzing complexity: {str(e)}")
+            return Fallback(dict(complexity, complexity_analysis=f"Error: {e}"), str(e))
+        return dict(complexity, complexity_analysis=text)
 
     async def _generate_insights(
-        self, stats: Dict, structure: Dict, complexity: Dict
+        self, stats: Dict, structure: Dict, code_metrics: Optional[Dict] = None
     ) -> List[str]:
         """Synthesize findings into key insights"""
         insights = []
@@ -191,7 +290,9 @@ Format your response as valid JSON only, no markdown.
                 "Large codebase - documentation should focus on high-level architecture"
             )
         elif stats["total_files"] < 10:
-            insights.append("Small project - documentation can cover all components in detail")
+            insights.append(
+                "Small project - documentation can cover all components in detail"
+            )
 
         if not structure["has_tests"]:
             insights.append(
@@ -208,4 +309,29 @@ Format your response as valid JSON only, no markdown.
                 f"Framework detected: {structure['detected_framework']} - leverage framework conventions"
             )
 
+        platforms = [
+            stack["name"]
+            for stack in structure.get("stacks", [])
+            if stack["kind"] == "platform"
+        ]
+        if structure["project_type"] == "Monorepo":
+            insights.append(
+                "Monorepo - documentation should map the packages and how they depend on each other"
+            )
+        elif len(platforms) > 1:
+            insights.append(
+                f"Multiple stacks ({', '.join(platforms)}) - explain how the parts fit together"
+            )
+
+        if code_metrics and code_metrics.get("sloc"):
+            if code_metrics["max_complexity"] >= 50:
+                hotspot = code_metrics["most_complex_files"][0]["path"]
+                insights.append(
+                    f"High complexity in {hotspot} - documentation should walk through its control flow"
+                )
+            if code_metrics["comment_ratio"] < 0.05:
+                insights.append(
+                    "Few code comments - documentation should explain intent that the code doesn't"
+                )
+
         return insights
@@ -1,5 +1,6 @@
-import google.generativeai as genai
-from typing import Dict, List
+from .gemini_client import GeminiClient
+from .pipeline import Fallback, unwrap
+from typing import Dict, List, Optional, Union
 import logging
 
 
@@ -8,9 +9,8 @@ class ContextGathererAgent:
     Agent 2: Gathers external context about the project
     """
 
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+    def __init__(self, api_key: str, llm: Optional[GeminiClient] = None):
+        self.llm = llm or GeminiClient(api_key)
         self.logger = logging.getLogger(__name__)
 
     async def gather_context(self, repo_data: Dict, analysis: Dict) -> Dict:
@@ -22,20 +22,31 @@ class ContextGathererAgent:
         """
 
         context = {
-            "documentation_standards": await self._get_doc_standards(analysis),
-            "best_practices": await self._get_best_practices(repo_data, analysis),
+            "documentation_standards": unwrap(await self._get_doc_standards(analysis)),
+            "best_practices": unwrap(
+                await self._get_best_practices(repo_data, analysis)
+            ),
         }
 
         return context
 
-    async def _get_doc_standards(self, analysis: Dict) -> Dict:
+    async def _get_doc_standards(self, analysis: Dict) -> Union[Dict, Fallback]:
         """
         Get documentation standards for detected framework/language
 
         PITFALL: Hard-coding standards quickly becomes outdated
         SOLUTION: Use LLM to generate current best practices
         """
-        framework = analysis.get("structure", {}).get("detected_framework", "Unknown")
+        structure = analysis.get("structure", {})
+        # All detected frameworks and platforms, e.g. "React + TypeScript"
+        stacks = [
+            stack["name"]
+            for stack in structure.get("stacks", [])
+            if stack["kind"] != "tooling"
+        ]
+        framework = " + ".join(stacks[:3]) or structure.get(
+            "detected_framework", "Unknown"
+        )
 
         prompt = f"""
 What are the current documentation best practices for {framework} projects?
@@ -49,13 +60,17 @@ Keep response concise (under 500 words).
 """
 
         try:
-            response = await self.model.generate_content_async(prompt)
-            return {"standards": response.text}
+            text = await self.llm.generate(prompt)
+            return {"standards": text}
         except Exception as e:
             self.logger.error(f"Error getting doc standards: {str(e)}")
-            return {"standards": f"Using default standards due to error: {str(e)}"}
+            return Fallback(
+                {"standards": f"Using default standards due to error: {str(e)}"}, str(e)
+            )
 
-    async def _get_best_practices(self, repo_data: Dict, analysis: Dict) -> Dict:
+    async def _get_best_practices(
+        self, repo_data: Dict, analysis: Dict
+    ) -> Union[Dict, Fallback]:
         """
         Get language-specific best practices
 
@@ -77,8 +92,8 @@ Provide 3-5 specific suggestions.
 """
 
         try:
-            response = await self.model.generate_content_async(prompt)
-            return {"best_practices": response.text}
+            text = await self.llm.generate(prompt)
+            return {"best_practices": text}
         except Exception as e:
             self.logger.error(f"Error getting best practices: {str(e)}")
-            return {"best_practices": "Default best practices"}
+            return Fallback({"best_practices": "Default best practices"}, str(e))
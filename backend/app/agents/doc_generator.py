@@ -1,51 +1,104 @@
-import google.generativeai as genai
-from typing import Dict
+from .gemini_client import GeminiClient
+from .pipeline import Fallback, unwrap
+from typing import AsyncIterator, Dict, Iterable, Optional, Union
+import asyncio
 import json
 import logging
 
+LEVELS = ("beginner", "intermediate", "advanced")
+
 
 class DocGeneratorAgent:
     """
     Agent 3: Generates multi-level documentation
     """
 
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+    def __init__(self, api_key: str, llm: Optional[GeminiClient] = None):
+        self.llm = llm or GeminiClient(api_key)
         self.logger = logging.getLogger(__name__)
 
     async def generate_documentation(
-        self, repo_data: Dict, analysis: Dict, context: Dict
+        self,
+        repo_data: Dict,
+        analysis: Dict,
+        context: Dict,
+        levels: Iterable[str] = LEVELS,
+        timeout: Optional[float] = None,
     ) -> Dict:
         """
-        Generate three levels of documentation
+        Generate the requested levels of documentation (all three by default)
 
         PITFALL: All three levels sound the same
         SOLUTION: Use distinct prompting strategies for each level
+
+        PITFALL: Generating every level when the reader opens one tab
+        SOLUTION: Only the requested levels' prompts are run
+
+        PITFALL: One hung level made gathering all of them wait forever
+        SOLUTION: Levels not finished within timeout are cancelled and left
+        out of the result
         """
+        levels = [level for level in LEVELS if level in set(levels)]
+        if not levels:
+            return {}
+
+        # Generate the levels in parallel for speed
+        tasks = {
+            level: asyncio.create_task(
+                self.generate_level(level, repo_data, analysis, context)
+            )
+            for level in levels
+        }
+        try:
+            done, _ = await asyncio.wait(tasks.values(), timeout=timeout)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        for level, task in tasks.items():
+            if task not in done:
+                self.logger.warning(f"{level.title()} docs timed out after {timeout}s")
+        return {
+            level: unwrap(task.result())
+            for level, task in tasks.items()
+            if task in done
+        }
 
-        # Generate all three levels in parallel for speed
-        import asyncio
+    async def generate_level(
+        self, level: str, repo_data: Dict, analysis: Dict, context: Dict
+    ) -> Union[str, Fallback]:
+        """Generate a single documentation level (a Fallback if the call failed)"""
+        generate = getattr(self, f"_generate_{level}_docs")
+        return await generate(repo_data, analysis, context)
 
-        beginner_task = self._generate_beginner_docs(repo_data, analysis, context)
-        intermediate_task = self._generate_intermediate_docs(
-            repo_data, analysis, context
-        )
-        advanced_task = self._generate_advanced_docs(repo_data, analysis, context)
+    async def stream_level(
+        self, level: str, repo_data: Dict, analysis: Dict, context: Dict
+    ) -> AsyncIterator[Union[str, Fallback]]:
+        """
+        Stream a single documentation level as text chunks
 
-        beginner, intermediate, advanced = await asyncio.gather(
-            beginner_task, intermediate_task, advanced_task
-        )
+        PITFALL: Waiting for a full document delays the first visible output
+        SOLUTION: Yield Gemini's streamed chunks as they arrive
 
-        return {
-            "beginner": beginner,
-            "intermediate": intermediate,
-            "advanced": advanced,
-        }
+        If the call fails, the last item is a Fallback holding the error text.
+        """
+        prompt = getattr(self, f"_{level}_prompt")(repo_data, analysis, context)
+        try:
+            async for text in self.llm.stream(prompt):
+                yield text
+        except Exception as e:
+            self.logger.error(f"Error streaming {level} docs: {str(e)}")
+            yield Fallback("\n\n" + self._error_doc(level, e), str(e))
+
+    def _error_doc(self, level: str, error: Exception) -> str:
+        """What readers see in place of a level that failed to generate"""
+        return (
+            f"# Error Generating {level.title()} Documentation\n\nError: {str(error)}"
+        )
 
     async def _generate_beginner_docs(
         self, repo_data: Dict, analysis: Dict, context: Dict
-    ) -> str:
+    ) -> Union[str, Fallback]:
         """
         Beginner-level documentation
 
@@ -54,6 +107,55 @@ class DocGeneratorAgent:
         STRUCTURE: What/Why/How with lots of examples
         """
 
+        prompt = self._beginner_prompt(repo_data, analysis, context)
+
+        try:
+            return await self.llm.generate(prompt)
+        except Exception as e:
+            self.logger.error(f"Error generating beginner docs: {str(e)}")
+            return Fallback(self._error_doc("beginner", e), str(e))
+
+    async def _generate_intermediate_docs(
+        self, repo_data: Dict, analysis: Dict, context: Dict
+    ) -> Union[str, Fallback]:
+        """
+        Intermediate-level documentation
+
+        TARGET AUDIENCE: Developer with some experience in this domain
+        TONE: Professional but accessible
+        STRUCTURE: Architecture overview, integration patterns, configuration
+        """
+
+        prompt = self._intermediate_prompt(repo_data, analysis, context)
+
+        try:
+            return await self.llm.generate(prompt)
+        except Exception as e:
+            self.logger.error(f"Error generating intermediate docs: {str(e)}")
+            return Fallback(self._error_doc("intermediate", e), str(e))
+
+    async def _generate_advanced_docs(
+        self, repo_data: Dict, analysis: Dict, context: Dict
+    ) -> Union[str, Fallback]:
+        """
+        Advanced-level documentation
+
+        TARGET AUDIENCE: Experienced developer or contributor
+        TONE: Concise, technical, assumes deep knowledge
+        STRUCTURE: Technical reference, edge cases, internals
+        """
+
+        prompt = self._advanced_prompt(repo_data, analysis, context)
+
+        try:
+            return await self.llm.generate(prompt)
+        except Exception as e:
+            self.logger.error(f"Error generating advanced docs: {str(e)}")
+            return Fallback(self._error_doc("advanced", e), str(e))
+
+    def _beginner_prompt(self, repo_data: Dict, analysis: Dict, context: Dict) -> str:
+        """Prompt for beginner-level documentation"""
+
         stats = json.dumps(analysis.get("statistics", {}), indent=2)
         insights = "\n".join(analysis.get("key_insights", []))
 
@@ -89,24 +191,12 @@ LENGTH: 500-800 words
 
 IMPORTANT: Avoid jargon. If technical terms are necessary, define them in simple language.
 """
+        return prompt
 
-        try:
-            response = await self.model.generate_content_async(prompt)
-            return response.text
-        except Exception as e:
-            self.logger.error(f"Error generating beginner docs: {str(e)}")
-            return f"# Error Generating Beginner Documentation\n\nError: {str(e)}"
-
-    async def _generate_intermediate_docs(
+    def _intermediate_prompt(
         self, repo_data: Dict, analysis: Dict, context: Dict
     ) -> str:
-        """
-        Intermediate-level documentation
-
-        TARGET AUDIENCE: Developer with some experience in this domain
-        TONE: Professional but accessible
-        STRUCTURE: Architecture overview, integration patterns, configuration
-        """
+        """Prompt for intermediate-level documentation"""
 
         structure = json.dumps(analysis.get("structure", {}), indent=2)
 
@@ -120,7 +210,7 @@ PROJECT INFO:
 
 PROJECT STRUCTURE:
 {structure}
-
+{self._key_files(analysis)}{self._source_material(analysis)}
 REQUIREMENTS FOR INTERMEDIATE DOCS:
 1. Architecture Overview (how components interact)
 2. Key Features and their implementation approach
@@ -138,24 +228,10 @@ LENGTH: 700-1000 words
 
 IMPORTANT: Focus on "how" and "why", not just "what"
 """
+        return prompt
 
-        try:
-            response = await self.model.generate_content_async(prompt)
-            return response.text
-        except Exception as e:
-            self.logger.error(f"Error generating intermediate docs: {str(e)}")
-            return f"# Error Generating Intermediate Documentation\n\nError: {str(e)}"
-
-    async def _generate_advanced_docs(
-        self, repo_data: Dict, analysis: Dict, context: Dict
-    ) -> str:
-        """
-        Advanced-level documentation
-
-        TARGET AUDIENCE: Experienced developer or contributor
-        TONE: Concise, technical, assumes deep knowledge
-        STRUCTURE: Technical reference, edge cases, internals
-        """
+    def _advanced_prompt(self, repo_data: Dict, analysis: Dict, context: Dict) -> str:
+        """Prompt for advanced-level documentation"""
 
         complexity = json.dumps(analysis.get("complexity", {}), indent=2)
 
@@ -168,7 +244,7 @@ PROJECT INFO:
 
 COMPLEXITY ANALYSIS:
 {complexity}
-
+{self._code_metrics(analysis)}{self._key_files(analysis)}{self._source_material(analysis)}
 REQUIREMENTS FOR ADVANCED DOCS:
 1. Technical architecture deep-dive
 2. Design decisions and trade-offs
@@ -185,11 +261,47 @@ FORMAT: Markdown with code examples, avoid excessive explanation
 LENGTH: 600-900 words
 
 IMPORTANT: Be precise and technical. Skip basic concepts.
+"""
+        return prompt
+
+    def _code_metrics(self, analysis: Dict) -> str:
+        """Measured code metrics, when static analysis ran"""
+        metrics = analysis.get("code_metrics") or {}
+        if not metrics.get("analyzed_files"):
+            return ""
+        hotspots = ", ".join(
+            f"{item['path']} ({item['complexity']})"
+            for item in metrics.get("most_complex_files", [])[:5]
+        )
+        return f"""
+MEASURED CODE METRICS ({metrics['analyzed_files']} files):
+- Source lines: {metrics['sloc']}, comment ratio: {metrics['comment_ratio']}
+- Functions: {metrics['functions']}, classes: {metrics['classes']}, public API: {metrics['public_api']}
+- Cyclomatic complexity: avg {metrics['avg_complexity']}, max {metrics['max_complexity']}
+- Most complex files: {hotspots or 'n/a'}
 """
 
-        try:
-            response = await self.model.generate_content_async(prompt)
-            return response.text
-        except Exception as e:
-            self.logger.error(f"Error generating advanced docs: {str(e)}")
-            return f"# Error Generating Advanced Documentation\n\nError: {str(e)}"
+    def _key_files(self, analysis: Dict) -> str:
+        """The most central files by import graph, when it was built"""
+        key_files = analysis.get("key_files") or []
+        if not key_files:
+            return ""
+        lines = "\n".join(
+            f"- {item['path']} (imported by {item['imported_by']}, "
+            f"imports {item['imports']})"
+            for item in key_files[:10]
+        )
+        return f"""
+KEY FILES (most central in the import graph, first is most central):
+{lines}
+"""
+
+    def _source_material(self, analysis: Dict) -> str:
+        """Packed README sections and source files, when the analysis has them"""
+        code_context = analysis.get("code_context") or {}
+        if not code_context.get("text"):
+            return ""
+        return f"""
+KEY SOURCE MATERIAL (README sections, manifests, entry points):
+{code_context["text"]}
+"""
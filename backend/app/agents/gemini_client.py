@@ -0,0 +1,167 @@
+import google.generativeai as genai
+from typing import Any, AsyncIterator, Dict, Optional
+from .prompt_packer import estimate_tokens
+from ..utils import metrics, tracing
+from ..utils.llm_cache import get_llm_cache, llm_cache_bypass
+from ..utils.rate_limiter import get_llm_rate_limiter
+import logging
+import time
+
+
+class GeminiClient:
+    """
+    Single entry point for Gemini calls made by the agents
+
+    PITFALL: Each agent calling the model directly repeats identical work
+    SOLUTION: Route every generation through one place that consults the
+    shared response cache first, and admits cache misses through the
+    process-wide rate limiter
+
+    Each model call gets a span and call/token metrics, attributed to the
+    agent and level tagged on the enclosing pipeline stage span.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = "gemini-2.5-flash",
+        generation_config: Optional[Dict] = None,
+    ):
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.model = genai.GenerativeModel(
+            model_name, generation_config=generation_config
+        )
+        self.cache = get_llm_cache()
+        self.limiter = get_llm_rate_limiter()
+        self.logger = logging.getLogger(__name__)
+
+    async def generate(self, prompt: str) -> str:
+        """Generate text for a prompt, serving repeats from the cache"""
+        cached = await self._cached(prompt)
+        if cached is not None:
+            return cached
+
+        call_state: Dict[str, Any] = {}
+
+        async def call():
+            call_state["started"] = time.perf_counter()
+            response = await self.model.generate_content_async(prompt)
+            call_state["response"] = response
+            # Reading .text raises on blocked/empty responses; keep that
+            # inside the limiter so it counts as a failed call
+            return response.text
+
+        with tracing.span("gemini.generate", model=self.model_name) as span:
+            text = ""
+            outcome = "cancelled"
+            try:
+                text = await self.limiter.call(call, tokens=estimate_tokens(prompt))
+                outcome = "ok"
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                self._observe(span, prompt, text, call_state, outcome)
+
+        await self._store(prompt, text)
+        return text
+
+    async def warm_up(self):
+        """Open the connection to the API (DNS, TLS, auth) with a free call"""
+        await self.model.count_tokens_async("ping")
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yield generated text as it arrives
+
+        A cached answer is yielded as a single chunk; a fresh one is cached
+        once the stream completes. The limiter admits (and retries) opening
+        the stream, and its slot is held until the stream is consumed or
+        closed.
+        """
+        cached = await self._cached(prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        call_state: Dict[str, Any] = {}
+
+        async def open_stream():
+            call_state["started"] = time.perf_counter()
+            response = await self.model.generate_content_async(prompt, stream=True)
+            call_state["response"] = response
+            return response
+
+        # Not made current: the caller runs between chunks
+        span = tracing.start_span("gemini.stream", model=self.model_name)
+        chunks = []
+        outcome = "cancelled"
+        try:
+            async with self.limiter.hold(
+                open_stream, tokens=estimate_tokens(prompt)
+            ) as response:
+                async for chunk in response:
+                    text = chunk.text
+                    chunks.append(text)
+                    yield text
+            outcome = "ok"
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            self._observe(span, prompt, "".join(chunks), call_state, outcome)
+            span.end()
+
+        await self._store(prompt, "".join(chunks))
+
+    def _observe(
+        self,
+        span: tracing.Span,
+        prompt: str,
+        text: str,
+        call_state: Dict[str, Any],
+        outcome: str,
+    ):
+        """Record one model call (the last attempt, if it was retried)"""
+        agent = span.attribute("agent", "unknown")
+        level = span.attribute("level", "none")
+        # Reported usage when the SDK gives it, else the packer's estimate
+        usage = getattr(call_state.get("response"), "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        response_tokens = getattr(usage, "candidates_token_count", None)
+        if not isinstance(prompt_tokens, int) or not prompt_tokens:
+            prompt_tokens = estimate_tokens(prompt)
+        if not isinstance(response_tokens, int) or not response_tokens:
+            response_tokens = estimate_tokens(text)
+
+        span.set(
+            agent=agent,
+            level=level,
+            outcome=outcome,
+            prompt_tokens=prompt_tokens,
+            response_tokens=response_tokens,
+        )
+        metrics.LLM_CALLS.inc(agent=agent, level=level, outcome=outcome)
+        if "started" in call_state:
+            metrics.LLM_DURATION.observe(
+                time.perf_counter() - call_state["started"], agent=agent, level=level
+            )
+        metrics.LLM_TOKENS.inc(prompt_tokens, agent=agent, level=level, kind="prompt")
+        if outcome == "ok":
+            metrics.LLM_TOKENS.inc(
+                response_tokens, agent=agent, level=level, kind="response"
+            )
+
+    async def _cached(self, prompt: str) -> Optional[str]:
+        if self.cache is None or llm_cache_bypass.get():
+            return None
+        key = self.cache.key(self.model_name, prompt, self.generation_config)
+        return await self.cache.get(key)
+
+    async def _store(self, prompt: str, text: str):
+        # Bypassed requests still refresh the cache with the new answer
+        if self.cache is not None:
+            key = self.cache.key(self.model_name, prompt, self.generation_config)
+            await self.cache.set(key, text)
@@ -1,10 +1,104 @@
 from .code_analyzer import CodeAnalyzerAgent
 from .context_gatherer import ContextGathererAgent
-from .doc_generator import DocGeneratorAgent
-from ..mcp_servers.github_mcp import GitHubMCP
-from typing import Dict, Optional
+from .doc_generator import LEVELS, DocGeneratorAgent
+from .gemini_client import GeminiClient
+from .pipeline import (
+    DeadlineExceeded,
+    Fallback,
+    PipelineScheduler,
+    Stage,
+    fingerprint,
+)
+from ..config import get_settings
+from ..mcp_servers.github_mcp import GitHubMCP, normalize_repo_url
+from ..mcp_servers.http_cache import start_request_stats
+from ..utils.artifact_store import get_artifact_store
+from ..utils.doc_store import get_doc_store
+from ..utils.llm_cache import llm_cache_bypass
+from ..utils.rate_limiter import start_call_stats
+from ..utils.single_flight import SingleFlight
+from ..utils import tracing
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 import logging
 import asyncio
+import time
+
+LevelRunner = Callable[[str, Dict, Dict, Dict], Awaitable[Union[str, Fallback]]]
+
+# analysis key -> stage that produces it
+ANALYSIS_FIELDS = [
+    ("statistics", "statistics"),
+    ("code_metrics", "code_metrics"),
+    ("key_files", "key_files"),
+    ("structure", "structure"),
+    ("complexity", "complexity"),
+    ("key_insights", "insights"),
+]
+
+# context key -> stage that produces it
+CONTEXT_FIELDS = [
+    ("documentation_standards", "doc_standards"),
+    ("best_practices", "best_practices"),
+]
+
+# metadata section -> the fields in it that stages produce
+METADATA_STAGES = {"analysis": ANALYSIS_FIELDS, "context": CONTEXT_FIELDS}
+
+# Analysis fields each documentation prompt reads
+LEVEL_INPUTS = {
+    "beginner": [("statistics", "statistics"), ("key_insights", "insights")],
+    "intermediate": [
+        ("structure", "structure"),
+        ("key_files", "key_files"),
+        ("code_context", "code_context"),
+    ],
+    "advanced": [
+        ("complexity", "complexity"),
+        ("code_metrics", "code_metrics"),
+        ("key_files", "key_files"),
+        ("code_context", "code_context"),
+    ],
+}
+
+# Coarse progress reported to job status and SSE clients
+STAGE_PHASES = {
+    "tree": "fetching",
+    "readme": "fetching",
+    "sources": "fetching",
+    "beginner": "generating",
+    "intermediate": "generating",
+    "advanced": "generating",
+}
+
+# Agent behind each LLM-backed stage; tags the stage's span so Gemini call
+# metrics and traces are attributed to it (levels are tagged by name too)
+STAGE_AGENTS = {
+    "code_context": "code_analyzer",
+    "complexity": "code_analyzer",
+    "insights": "code_analyzer",
+    "doc_standards": "context_gatherer",
+    "best_practices": "context_gatherer",
+    **{level: "doc_generator" for level in LEVELS},
+}
+
+# Repo metadata the documentation prompts read from the tree result
+SUMMARY_FIELDS = ("name", "description", "language", "stars")
+
+# Bump when stage logic or prompts change so stored artifacts are not reused
+ARTIFACT_VERSION = 5
+
+# Process-wide so concurrent requests for the same repo+commit share one run
+_inflight_generations = SingleFlight()
 
 
 class AgentOrchestrator:
@@ -20,62 +114,830 @@ class AgentOrchestrator:
         # Initialize MCP servers
         self.github_mcp = GitHubMCP(github_token)
 
-        # Initialize agents
-        self.code_analyzer = CodeAnalyzerAgent(gemini_api_key)
-        self.context_gatherer = ContextGathererAgent(gemini_api_key)
-        self.doc_generator = DocGeneratorAgent(gemini_api_key)
+        # Initialize agents around one shared model client, so the API key
+        # is configured once. Nothing here holds per-request state, so one
+        # orchestrator serves all concurrent requests.
+        self.llm = GeminiClient(gemini_api_key)
+        self.code_analyzer = CodeAnalyzerAgent(gemini_api_key, llm=self.llm)
+        self.context_gatherer = ContextGathererAgent(gemini_api_key, llm=self.llm)
+        self.doc_generator = DocGeneratorAgent(gemini_api_key, llm=self.llm)
+
+        # Previous runs per repo, for incremental regeneration
+        self.artifacts = get_artifact_store()
+        # Every version served so far, for GET /api/v1/docs
+        self.docs = get_doc_store()
+
+    async def warm_up(self, timeout: float) -> Dict[str, str]:
+        """
+        Open GitHub and Gemini connections ahead of the first request
+
+        PITFALL: The first request after a deploy pays for DNS lookups, TLS
+        handshakes and auth on both APIs
+        SOLUTION: Do it at startup, concurrently. Returns "ok" or the error
+        per service; failures are logged, not fatal.
+        """
+        checks = {
+            "github": self.github_mcp.client.warm_up(),
+            "gemini": self.llm.warm_up(),
+        }
+
+        async def check(name: str, warm):
+            try:
+                await asyncio.wait_for(warm, timeout)
+                return name, "ok"
+            except Exception as e:
+                reason = str(e) or type(e).__name__
+                self.logger.warning(f"Warm-up of {name} failed: {reason}")
+                return name, reason
 
-    async def generate_documentation(self, repo_url: str) -> Dict:
+        return dict(await asyncio.gather(*(check(n, w) for n, w in checks.items())))
+
+    async def generate_documentation(
+        self,
+        repo_url: str,
+        ingestion_mode: Optional[str] = None,
+        bypass_cache: bool = False,
+        levels: Optional[List[str]] = None,
+        metadata_fields: Optional[List[str]] = None,
+        deadline_seconds: Optional[float] = None,
+        progress: Optional[Callable[[str], None]] = None,
+    ) -> Dict:
         """
         Main orchestration flow
 
         DESIGN PRINCIPLE: Sequential dependencies, parallel where possible
 
-        Flow:
-        1. Fetch repo data (must be first)
-        2. Analyze code (depends on #1)
-        3. Gather context (depends on #2)
-        4. Generate docs (depends on #2 and #3)
+        Flow (see _build_stages for the exact graph):
+        1. Fetch tree and README (in parallel)
+        2. Statistics and structure (no LLM, right after the tree)
+        3. Complexity, insights and context (as soon as their inputs exist)
+        4. Generate each doc level (as soon as its own inputs exist)
 
         PITFALL: Sequential execution is slow
-        SOLUTION: Steps 2 & 3 can run in parallel after step 1
+        SOLUTION: A dependency-graph scheduler starts every stage as soon as
+        its inputs are ready; per-stage timings land in metadata.timings
+
+        PITFALL: Many users requesting the same popular repo at once
+        SOLUTION: Coalesce concurrent runs for the same repo and commit
+
+        PITFALL: Regenerating everything after every small commit
+        SOLUTION: Diff against the last processed commit and only re-run the
+        stages whose inputs changed (see _execute)
+
+        PITFALL: Generating all three levels (and all metadata) when the
+        reader only opens one tab
+        SOLUTION: levels and metadata_fields (None = all) decide which stages
+        run at all; levels asked for later reuse the stored analysis
+
+        PITFALL: One hung Gemini call kept the request (and its quota) busy
+        forever, and failed it when it finally errored
+        SOLUTION: A deadline for the whole request (deadline_seconds, capped
+        by the server setting) and per-stage timeouts; levels that didn't
+        finish in time are left out and listed in "pending_levels". A
+        caller that joined a shared run still gives up at its own deadline.
         """
 
-        try:
-            self.logger.info(f"Starting documentation generation for {repo_url}")
+        deadline = time.perf_counter() + request_budget(deadline_seconds)
+        report = progress or (lambda stage: None)
+        levels = _requested_levels(levels)
+        targets = _pipeline_targets(levels, metadata_fields)
 
-            # Step 1: Fetch repository data
-            self.logger.info("Fetching repository structure...")
-            repo_data = await self.github_mcp.fetch_repo_structure(repo_url)
+        with tracing.span(
+            "orchestrator.generate", repo=repo_url, levels=",".join(levels)
+        ) as span:
+            try:
+                report("resolving")
+                head = await self._resolve_head(repo_url, deadline)
+            except Exception as e:
+                self.logger.error(f"Error resolving repository head: {str(e)}")
+                return {"success": False, "error": str(e), "documentation": None}
+            span.set(commit=head["sha"])
 
-            # Step 2 & 3: Analyze and gather context in parallel
-            self.logger.info("Analyzing code and gathering context...")
-            analysis, initial_context = await asyncio.gather(
-                self.code_analyzer.analyze_codebase(repo_data),
-                self.context_gatherer.gather_context(repo_data, {}),
+            # A caller leaving (or running out of time) only detaches it;
+            # the shared run keeps going for the others and is cancelled
+            # once nobody is waiting any more. Only callers asking for the
+            # same work, with no later deadline, share it; its spans nest
+            # under the one that started it.
+            key = (head["repo_url"], head["sha"], targets, bypass_cache, ingestion_mode)
+            limit = asyncio.timeout(max(0.0, deadline - time.perf_counter()))
+            try:
+                async with limit:
+                    result = await _inflight_generations.do(
+                        key,
+                        lambda broadcast: self._run_pipeline(
+                            repo_url,
+                            head["sha"],
+                            ingestion_mode,
+                            bypass_cache,
+                            targets,
+                            deadline,
+                            broadcast,
+                            resolved_at=head["resolved_at"],
+                        ),
+                        listener=report,
+                        deadline=deadline,
+                    )
+            except TimeoutError:
+                if not limit.expired():
+                    raise
+                # The run we joined was started with more time than we have
+                self.logger.warning(f"Deadline exceeded waiting for {repo_url}")
+                return {
+                    "success": False,
+                    "error": "Deadline exceeded before any documentation level finished",
+                    "documentation": None,
+                    "pending_levels": list(levels),
+                }
+            return select_result(result, levels, metadata_fields)
+
+    async def stream_documentation(
+        self,
+        repo_url: str,
+        ingestion_mode: Optional[str] = None,
+        bypass_cache: bool = False,
+        levels: Optional[List[str]] = None,
+        metadata_fields: Optional[List[str]] = None,
+        deadline_seconds: Optional[float] = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Same flow as generate_documentation, emitted as a stream of events
+
+        Events: "stage" (pipeline progress), "token" (documentation text for
+        one level), "level_complete", then a final "complete" carrying the
+        full result, or "error". A level still generating at the deadline
+        stops mid-text and is listed in the result's "pending_levels".
+
+        PITFALL: Nothing reaches the client until every level is finished
+        SOLUTION: Stream LLM tokens for all levels as they are generated
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(
+            self._stream_pipeline(
+                repo_url,
+                ingestion_mode,
+                bypass_cache,
+                _requested_levels(levels),
+                metadata_fields,
+                time.perf_counter() + request_budget(deadline_seconds),
+                events.put_nowait,
             )
+        )
+        try:
+            while True:
+                event = await events.get()
+                yield event
+                if event["event"] in ("complete", "error"):
+                    break
+        finally:
+            # Client went away: stop generating
+            producer.cancel()
+
+    async def _stream_pipeline(
+        self,
+        repo_url: str,
+        ingestion_mode: Optional[str],
+        bypass_cache: bool,
+        levels: Tuple[str, ...],
+        metadata_fields: Optional[List[str]],
+        deadline: float,
+        emit: Callable[[Dict], None],
+    ):
+        """Producer side of stream_documentation, runs in its own task"""
 
-            # Update context with full analysis
-            context = await self.context_gatherer.gather_context(repo_data, analysis)
+        def report(stage: str):
+            emit({"event": "stage", "data": {"stage": stage}})
 
-            # Step 4: Generate documentation
-            self.logger.info("Generating multi-level documentation...")
-            documentation = await self.doc_generator.generate_documentation(
-                repo_data, analysis, context
+        async def stream_level(
+            level: str, repo_data: Dict, analysis: Dict, context: Dict
+        ) -> Union[str, Fallback]:
+            text = ""
+            failure = None
+            async for chunk in self.doc_generator.stream_level(
+                level, repo_data, analysis, context
+            ):
+                if isinstance(chunk, Fallback):
+                    failure, chunk = chunk, chunk.value
+                text += chunk
+                emit({"event": "token", "data": {"level": level, "text": chunk}})
+            emit({"event": "level_complete", "data": {"level": level}})
+            return Fallback(text, failure.error) if failure else text
+
+        bypass_token = llm_cache_bypass.set(bypass_cache)
+        try:
+            with tracing.span(
+                "orchestrator.stream", repo=repo_url, levels=",".join(levels)
+            ) as span:
+                report("resolving")
+                head = await self._resolve_head(repo_url, deadline)
+                span.set(commit=head["sha"])
+                result = await self._execute(
+                    repo_url,
+                    head["sha"],
+                    ingestion_mode,
+                    _pipeline_targets(levels, metadata_fields),
+                    deadline,
+                    report,
+                    stream_level,
+                    resolved_at=head["resolved_at"],
+                )
+            emit(
+                {
+                    "event": "complete",
+                    "data": select_result(result, levels, metadata_fields),
+                }
             )
 
+        except Exception as e:
+            self.logger.error(f"Error in documentation streaming: {str(e)}")
+            emit({"event": "error", "data": {"error": str(e)}})
+        finally:
+            llm_cache_bypass.reset(bypass_token)
+
+    async def _run_pipeline(
+        self,
+        repo_url: str,
+        commit_sha: str,
+        ingestion_mode: Optional[str],
+        bypass_cache: bool,
+        targets: Tuple[str, ...],
+        deadline: float,
+        report: Callable[[str], None],
+        resolved_at: Optional[float] = None,
+    ) -> Dict:
+        """Run the agent pipeline once for a resolved commit"""
+
+        # Stage tasks spawned below inherit this context
+        bypass_token = llm_cache_bypass.set(bypass_cache)
+        try:
+            self.logger.info(f"Starting documentation generation for {repo_url}")
+            result = await self._execute(
+                repo_url,
+                commit_sha,
+                ingestion_mode,
+                targets,
+                deadline,
+                report,
+                self.doc_generator.generate_level,
+                resolved_at=resolved_at,
+            )
             self.logger.info("Documentation generation complete!")
+            return result
+
+        except Exception as e:
+            self.logger.error(f"Error in documentation generation: {str(e)}")
+            return {"success": False, "error": str(e), "documentation": None}
+        finally:
+            llm_cache_bypass.reset(bypass_token)
+
+    async def _execute(
+        self,
+        repo_url: str,
+        commit_sha: str,
+        ingestion_mode: Optional[str],
+        targets: Tuple[str, ...],
+        deadline: float,
+        report: Callable[[str], None],
+        level_runner: LevelRunner,
+        resolved_at: Optional[float] = None,
+    ) -> Dict:
+        """
+        Run the stages needed for targets and assemble the response payload
+
+        With a stored run for an older commit, the compare API decides how
+        much work is needed: nothing relevant changed and the stored result
+        covers targets -> return the stored docs; otherwise stages whose
+        input keys match the stored ones reuse their outputs, and the README
+        is only re-fetched if it changed.
+
+        The payload holds everything known for this commit: levels and
+        metadata from earlier runs that are still valid are merged in, and
+        callers trim it with select_result.
+
+        Stages still running at the deadline are listed in
+        metadata.pending_stages. Whatever finished is kept for the next run;
+        a partial result is returned but not published, and with no
+        requested level finished the request fails with DeadlineExceeded.
+        resolved_at (when commit_sha was read as the head) orders what
+        gets published.
+        """
+        cache_stats = start_request_stats()
+        llm_stats = start_call_stats()
+        started = time.perf_counter()
+        record_key, previous = await self._load_artifacts(repo_url, ingestion_mode)
+
+        changes = None
+        if previous is not None:
+            if previous["commit_sha"] == commit_sha:
+                changes = []
+            else:
+                changes = await self.github_mcp.compare_commits(
+                    repo_url, previous["commit_sha"], commit_sha
+                )
+
+        # The stored result still describes this commit
+        still_valid = changes is not None and not any(
+            self.github_mcp.affects_documentation(c) for c in changes
+        )
+        if still_valid and set(targets) <= _result_stages(previous["result"]):
+            self.logger.info("No relevant changes since last run, reusing docs")
+            result = self._reuse_result(
+                previous, commit_sha, len(changes), cache_stats, started
+            )
+            result["metadata"]["llm_calls"] = llm_stats
+            await self._save_artifacts(
+                record_key, commit_sha, previous["stages"], result
+            )
+            await self._publish(repo_url, commit_sha, result, resolved_at=resolved_at)
+            return result
+
+        stages = self._build_stages(repo_url, commit_sha, ingestion_mode, level_runner)
+        if changes is not None and "readme" in previous["stages"]:
+            changed_paths = {c["filename"] for c in changes} | {
+                c["previous_filename"] for c in changes if c.get("previous_filename")
+            }
+            if not any(self.github_mcp.is_readme(path) for path in changed_paths):
+                readme = previous["stages"]["readme"]["value"]
+                stages = [
+                    Stage("readme", lambda r: readme) if s.name == "readme" else s
+                    for s in stages
+                ]
+        reported = set()
+
+        def on_start(stage: str):
+            # Keep the coarse phases callers already understand
+            phase = STAGE_PHASES.get(stage, "analyzing")
+            if phase not in reported:
+                reported.add(phase)
+                self.logger.info(f"Pipeline phase: {phase}")
+                report(phase)
+
+        memo = previous["stages"] if previous else None
+        run = await PipelineScheduler(stages, targets).run(
+            on_start=on_start, memo=memo, deadline=deadline
+        )
+        results = run["results"]
+        if "tree" in run["pending"]:
+            raise DeadlineExceeded("Deadline exceeded while fetching the repository")
 
-            return {
-                "success": True,
-                "repo_name": repo_data.get("name"),
-                "documentation": documentation,
-                "metadata": {
-                    "analysis": analysis,
-                    "rate_limit_remaining": repo_data.get("rate_limit_remaining"),
+        repo_data = results["tree"]
+        analysis = self._analysis_view(results, ANALYSIS_FIELDS)
+        context = self._analysis_view(results, CONTEXT_FIELDS)
+
+        result = {
+            "success": True,
+            "repo_name": repo_data.get("name"),
+            "documentation": {
+                level: results[level] for level in LEVELS if level in results
+            },
+            "metadata": {
+                "analysis": analysis,
+                "context": context,
+                "rate_limit_remaining": repo_data.get("rate_limit_remaining"),
+                "github_cache": cache_stats,
+                "llm_calls": llm_stats,
+                "ingestion_mode": repo_data.get("ingestion_mode"),
+                "commit_sha": commit_sha,
+                "timings": run["timings"],
+                "pending_stages": run["pending"],
+                "failed_stages": run["failed"],
+                "incremental": {
+                    "mode": "partial" if previous else "full",
+                    "base_sha": previous["commit_sha"] if previous else None,
+                    "reused_stages": run["reused"],
                 },
+            },
+        }
+
+        if still_valid:
+            result = _merge_results(previous["result"], result)
+
+        # The tree is re-fetched on every non-trivial change, so only the
+        # derived stages are worth keeping. Stages this run skipped keep
+        # their stored records; their keys decide if they're still usable.
+        stage_records = dict(previous["stages"]) if previous else {}
+        stage_records.update(
+            {
+                name: {"key": run["keys"].get(name), "value": value}
+                for name, value in results.items()
+                if name != "tree"
             }
+        )
+        await self._save_artifacts(
+            record_key, commit_sha, stage_records, result, run["failed"]
+        )
+
+        requested = [level for level in LEVELS if level in targets]
+        pending = [level for level in requested if level not in result["documentation"]]
+        if requested and len(pending) == len(requested):
+            raise DeadlineExceeded(
+                f"Deadline exceeded before any documentation level finished"
+                f" (pending: {', '.join(pending)})"
+            )
+        if not run["pending"]:
+            await self._publish(
+                repo_url, commit_sha, result, run["failed"], resolved_at
+            )
+        return result
+
+    async def _resolve_head(self, repo_url: str, deadline: float) -> Dict:
+        """The head commit, stamped with when it was resolved ("resolved_at")"""
+        limit = asyncio.timeout(max(0.0, deadline - time.perf_counter()))
+        try:
+            async with limit:
+                resolved_at = time.time()
+                head = await self.github_mcp.resolve_head(repo_url)
+                return dict(head, resolved_at=resolved_at)
+        except TimeoutError:
+            if not limit.expired():
+                raise
+            raise DeadlineExceeded("Deadline exceeded while resolving the repository")
 
+    async def _load_artifacts(
+        self, repo_url: str, ingestion_mode: Optional[str]
+    ) -> Tuple[Optional[str], Optional[Dict]]:
+        """Return (record key, previous run), ignoring it on cache bypass"""
+        if self.artifacts is None:
+            return None, None
+        record_key = self.artifacts.key(
+            normalize_repo_url(repo_url),
+            ingestion_mode or self.github_mcp.ingestion_mode,
+        )
+        if llm_cache_bypass.get():
+            return record_key, None
+        try:
+            previous = await self.artifacts.load(record_key)
         except Exception as e:
-            self.logger.error(f"Error in documentation generation: {str(e)}")
-            return {"success": False, "error": str(e), "documentation": None}
+            self.logger.warning(f"Could not load previous artifacts: {str(e)}")
+            return record_key, None
+        if previous is None or previous.get("version") != ARTIFACT_VERSION:
+            return record_key, None
+        return record_key, previous
+
+    async def _save_artifacts(
+        self,
+        record_key: Optional[str],
+        commit_sha: str,
+        stages: Dict,
+        result: Dict,
+        failed: Iterable[str] = (),
+    ):
+        """Store the run, minus the stages that failed so the next one retries them"""
+        if record_key is None:
+            return
+        record = {
+            "version": ARTIFACT_VERSION,
+            "commit_sha": commit_sha,
+            "stages": {name: r for name, r in stages.items() if name not in failed},
+            "result": _without_stages(result, failed),
+        }
+        try:
+            await self.artifacts.save(record_key, record)
+        except Exception as e:
+            # Losing the artifacts only costs the next run some speed
+            self.logger.warning(f"Could not save artifacts: {str(e)}")
+
+    async def _publish(
+        self,
+        repo_url: str,
+        commit_sha: str,
+        result: Dict,
+        failed: Iterable[str] = (),
+        resolved_at: Optional[float] = None,
+    ):
+        """
+        Store the result as the latest documentation version of the repo
+
+        PITFALL: Error text was published and served as cacheable docs, and
+        republishing unchanged docs gave them a new ETag on every run
+        SOLUTION: Failed levels are left out, and a version whose content
+        didn't change is only touched, keeping its record and ETag. The
+        latest pointer only moves to commits resolved after its own.
+        """
+        if self.docs is None:
+            return
+        repo_url = normalize_repo_url(repo_url)
+        result = _without_stages(result, failed)
+        try:
+            # Keep the levels generated earlier for the same commit
+            stored = await self.docs.get(repo_url, commit_sha)
+            if stored is not None:
+                merged = _merge_results(stored["result"], result)
+                if _published_content(merged) == _published_content(stored["result"]):
+                    await self.docs.touch(repo_url, commit_sha)
+                    return
+                result = merged
+            elif not result["documentation"]:
+                return
+            await self.docs.put(repo_url, commit_sha, result, resolved_at)
+        except Exception as e:
+            # Readers fall back to generating; the request itself succeeded
+            self.logger.warning(f"Could not store documentation: {str(e)}")
+
+    def _reuse_result(
+        self,
+        previous: Dict,
+        commit_sha: str,
+        changed_files: int,
+        cache_stats: Dict,
+        started: float,
+    ) -> Dict:
+        """The previous result, re-stamped for the new commit"""
+        result = dict(previous["result"])
+        result["metadata"] = dict(
+            result["metadata"],
+            commit_sha=commit_sha,
+            github_cache=cache_stats,
+            pending_stages=[],
+            failed_stages=[],
+            timings={
+                "total": {
+                    "start": 0.0,
+                    "duration": round(time.perf_counter() - started, 4),
+                }
+            },
+            incremental={
+                "mode": "reused",
+                "base_sha": previous["commit_sha"],
+                "changed_files": changed_files,
+            },
+        )
+        return result
+
+    def _build_stages(
+        self,
+        repo_url: str,
+        commit_sha: str,
+        ingestion_mode: Optional[str],
+        level_runner: LevelRunner,
+    ) -> List[Stage]:
+        """
+        The documentation pipeline as a dependency graph
+
+        Each stage lists only the results it actually reads, so e.g. the
+        best-practices prompt starts as soon as the structure is known
+        instead of waiting for the complexity LLM call. Stages that read
+        only part of the tree declare those parts as their inputs, so an
+        unrelated tree change doesn't invalidate their stored output.
+        """
+        analyzer = self.code_analyzer
+        gatherer = self.context_gatherer
+
+        stages = [
+            # GitHub I/O
+            Stage(
+                "tree",
+                lambda r: self.github_mcp.fetch_repo_tree(
+                    repo_url, ingestion_mode, ref=commit_sha
+                ),
+            ),
+            Stage(
+                "readme", lambda r: self.github_mcp.fetch_readme(repo_url, commit_sha)
+            ),
+            # Code analysis (statistics/structure/insights need no LLM)
+            Stage(
+                "statistics",
+                lambda r: analyzer._compute_statistics(
+                    dict(
+                        r["tree"],
+                        file_contents=dict(
+                            r["tree"].get("file_contents") or {},
+                            **r["sources"]["files"],
+                        ),
+                    )
+                ),
+                ["tree", "sources"],
+            ),
+            Stage(
+                "code_metrics",
+                lambda r: analyzer._compute_code_metrics(
+                    r["tree"], r["sources"]["files"]
+                ),
+                ["tree", "sources"],
+            ),
+            Stage(
+                "structure", lambda r: analyzer._analyze_structure(r["tree"]), ["tree"]
+            ),
+            Stage(
+                "sources",
+                lambda r: self._fetch_sources(repo_url, commit_sha, r["tree"]),
+                ["tree"],
+                inputs=lambda r: r["tree"]["index"],
+            ),
+            Stage("key_files", lambda r: r["sources"]["key_files"], ["sources"]),
+            Stage(
+                "code_context",
+                lambda r: analyzer._build_code_context(
+                    r["readme"], r["sources"]["files"]
+                ),
+                ["readme", "sources"],
+            ),
+            Stage(
+                "complexity",
+                lambda r: analyzer._analyze_complexity(
+                    {"code_context": r["code_context"]}
+                ),
+                ["code_context"],
+            ),
+            Stage(
+                "insights",
+                lambda r: analyzer._generate_insights(
+                    r["statistics"], r["structure"], r["code_metrics"]
+                ),
+                ["statistics", "structure", "code_metrics"],
+            ),
+            # Context gathering
+            Stage(
+                "doc_standards",
+                lambda r: gatherer._get_doc_standards({"structure": r["structure"]}),
+                ["structure"],
+            ),
+            Stage(
+                "best_practices",
+                lambda r: gatherer._get_best_practices(
+                    r["tree"], {"structure": r["structure"]}
+                ),
+                ["tree", "structure"],
+                inputs=lambda r: [r["tree"].get("language"), r["structure"]],
+            ),
+        ]
+
+        # Documentation levels; the prompts don't read context yet, so the
+        # levels don't wait for the context stages
+        for level in LEVELS:
+            fields = LEVEL_INPUTS[level]
+            stages.append(
+                Stage(
+                    level,
+                    lambda r, level=level, fields=fields: level_runner(
+                        level, r["tree"], self._analysis_view(r, fields), {}
+                    ),
+                    ["tree"] + [stage for _, stage in fields],
+                    inputs=lambda r, fields=fields: [
+                        _repo_summary(r["tree"]),
+                        self._analysis_view(r, fields),
+                    ],
+                    attributes={"level": level},
+                )
+            )
+        # A stuck Gemini call gives up its stage well before the deadline
+        llm_timeout = get_settings().llm_stage_timeout_seconds
+        for stage in stages:
+            if stage.name in STAGE_AGENTS:
+                stage.attributes["agent"] = STAGE_AGENTS[stage.name]
+                stage.timeout = llm_timeout
+        return stages
+
+    async def _fetch_sources(
+        self, repo_url: str, commit_sha: str, repo_data: Dict
+    ) -> Dict:
+        """The key files for analysis, best first, fetched only if needed"""
+
+        async def fetch(paths: List[str]) -> Dict[str, str]:
+            return await self.github_mcp.fetch_files(repo_url, paths, commit_sha)
+
+        return await self.code_analyzer._select_key_files(
+            repo_data, fetch, get_settings().source_max_files
+        )
+
+    def _analysis_view(self, results: Dict, fields) -> Dict:
+        """Build the analysis dict the agents expect from stage results"""
+        return {key: results[stage] for key, stage in fields if stage in results}
+
+
+def select_result(
+    result: Dict, levels: Iterable[str], metadata_fields: Optional[List[str]]
+) -> Dict:
+    """
+    The payload trimmed to the requested levels and metadata fields
+
+    metadata_fields are metadata keys ("commit_sha", "analysis") or one
+    field inside a section ("analysis.statistics"); None keeps everything.
+    """
+    if not result.get("success"):
+        return result
+    levels = set(levels)
+    selected = dict(
+        result,
+        documentation={
+            level: text
+            for level, text in result["documentation"].items()
+            if level in levels
+        },
+        # Requested, but not finished before the deadline
+        pending_levels=[
+            level
+            for level in LEVELS
+            if level in levels and level not in result["documentation"]
+        ],
+    )
+    if metadata_fields is None:
+        return selected
+
+    metadata = result.get("metadata") or {}
+    picked: Dict = {}
+    for field in metadata_fields:
+        section, _, key = field.partition(".")
+        if section not in metadata:
+            continue
+        if not key:
+            picked[section] = metadata[section]
+        elif isinstance(metadata[section], dict) and key in metadata[section]:
+            picked.setdefault(section, {})[key] = metadata[section][key]
+    selected["metadata"] = picked
+    return selected
+
+
+def request_budget(deadline_seconds: Optional[float] = None) -> float:
+    """Seconds a request may run: what it asked for, at most the server's limit"""
+    limit = get_settings().request_deadline_seconds
+    return limit if deadline_seconds is None else min(deadline_seconds, limit)
+
+
+def _requested_levels(levels: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    if not levels:
+        return LEVELS
+    unknown = set(levels) - set(LEVELS)
+    if unknown:
+        raise ValueError(f"Unknown documentation levels: {sorted(unknown)}")
+    return tuple(level for level in LEVELS if level in set(levels))
+
+
+def _pipeline_targets(
+    levels: Iterable[str], metadata_fields: Optional[List[str]]
+) -> Tuple[str, ...]:
+    """Stages a request needs: its levels plus the metadata it asked for"""
+    # The README is always fetched, so a stored one is never out of date
+    targets = {"tree", "readme", *levels}
+    for section, fields in METADATA_STAGES.items():
+        for key, stage in fields:
+            if (
+                metadata_fields is None
+                or section in metadata_fields
+                or f"{section}.{key}" in metadata_fields
+            ):
+                targets.add(stage)
+    return tuple(sorted(targets))
+
+
+def _result_stages(result: Dict) -> set:
+    """Stages whose output a stored result already carries"""
+    metadata = result.get("metadata") or {}
+    stages = set(result.get("documentation") or {}) | {"tree", "readme"}
+    for section, fields in METADATA_STAGES.items():
+        present = metadata.get(section) or {}
+        stages.update(stage for key, stage in fields if key in present)
+    return stages
+
+
+def _without_stages(result: Dict, stages: Iterable[str]) -> Dict:
+    """result minus the levels and metadata fields the given stages produced"""
+    stages = set(stages)
+    if not stages:
+        return result
+    metadata = dict(result["metadata"])
+    for section, fields in METADATA_STAGES.items():
+        if metadata.get(section):
+            producers = dict(fields)
+            metadata[section] = {
+                key: value
+                for key, value in metadata[section].items()
+                if producers.get(key) not in stages
+            }
+    return dict(
+        result,
+        documentation={
+            level: text
+            for level, text in result["documentation"].items()
+            if level not in stages
+        },
+        metadata=metadata,
+    )
+
+
+def _published_content(result: Dict) -> str:
+    """Hash of what readers of a published version see, minus run bookkeeping"""
+    metadata = result.get("metadata") or {}
+    return fingerprint(
+        {
+            "documentation": result.get("documentation") or {},
+            **{section: metadata.get(section) or {} for section in METADATA_STAGES},
+        }
+    )
+
+
+def _merge_results(older: Dict, newer: Dict) -> Dict:
+    """newer, plus the levels and metadata fields only older has"""
+    merged = dict(
+        newer, documentation=dict(older["documentation"], **newer["documentation"])
+    )
+    metadata = dict(newer["metadata"])
+    for section in METADATA_STAGES:
+        metadata[section] = dict(
+            older["metadata"].get(section) or {}, **(metadata.get(section) or {})
+        )
+    merged["metadata"] = metadata
+    return merged
+
+
+def _repo_summary(repo_data: Dict) -> Dict:
+    return {field: repo_data.get(field) for field in SUMMARY_FIELDS}
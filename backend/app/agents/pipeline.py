@@ -0,0 +1,288 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from ..utils import metrics, tracing
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import time
+
+StageHook = Callable[[str], None]
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes before it has a usable result"""
+
+
+class Fallback:
+    """
+    What an agent returns instead of raising when its call failed
+
+    value stands in for the real result (so a run can still finish), error
+    says what went wrong. The scheduler hands value to later stages but
+    lists the stage as failed, so it's never memoized, stored or reused.
+    """
+
+    __slots__ = ("value", "error")
+
+    def __init__(self, value: Any, error: str):
+        self.value = value
+        self.error = error
+
+
+def unwrap(value: Any) -> Any:
+    """A stage result, with a Fallback replaced by its stand-in value"""
+    return value.value if isinstance(value, Fallback) else value
+
+
+# Fields that change on every run without changing what a stage computes
+VOLATILE_KEYS = {"download_url", "ref", "rate_limit_remaining", "http_cache"}
+
+
+def fingerprint(value: Any) -> str:
+    """Stable hash of a stage input, ignoring volatile fields"""
+
+    def strip(item):
+        if isinstance(item, dict):
+            return {k: strip(v) for k, v in item.items() if k not in VOLATILE_KEYS}
+        if isinstance(item, (list, tuple)):
+            return [strip(v) for v in item]
+        return item
+
+    def encode(item):
+        # Indexes carry their own content hash (TreeIndex.digest)
+        return getattr(item, "digest", None) or str(item)
+
+    encoded = json.dumps(strip(value), sort_keys=True, default=encode)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class Stage:
+    """
+    One unit of pipeline work
+
+    func receives the results of all finished stages (keyed by stage name)
+    and may be sync or async. Stages with dependencies can be memoized:
+    their key is a hash of their inputs (by default, the dependencies'
+    results), and a previous result with the same key is reused.
+    attributes tag the stage's trace span (and so the calls made in it).
+    timeout caps how long the stage may take, on top of the run's deadline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Any],
+        deps: Iterable[str] = (),
+        inputs: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.inputs = inputs
+        self.attributes = attributes or {}
+        self.timeout = timeout
+
+    @property
+    def memoizable(self) -> bool:
+        return bool(self.deps) or self.inputs is not None
+
+
+class PipelineScheduler:
+    """
+    Runs stages as a dependency graph
+
+    PITFALL: A hard-coded sequence of awaits makes every step wait for the
+    slowest thing before it, even when it doesn't need its output
+    SOLUTION: Start each stage as soon as its own dependencies finish, and
+    record how long each one took
+
+    With targets, only those stages and what they depend on are run.
+    """
+
+    def __init__(self, stages: List[Stage], targets: Optional[Iterable[str]] = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = self._topological_order(stages)
+        if targets is not None:
+            self.order = self._required(targets)
+        self.logger = logging.getLogger(__name__)
+
+    def _required(self, targets: Iterable[str]) -> List[str]:
+        """The topological order, cut down to targets and their dependencies"""
+        needed = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown target stage '{name}'")
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.stages[name].deps)
+        return [name for name in self.order if name in needed]
+
+    def _topological_order(self, stages: List[Stage]) -> List[str]:
+        names = {stage.name for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in names]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown {missing}")
+
+        order: List[str] = []
+        visiting = set()
+
+        def visit(name: str):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for stage in stages:
+            visit(stage.name)
+        return order
+
+    async def run(
+        self,
+        on_start: Optional[StageHook] = None,
+        on_finish: Optional[StageHook] = None,
+        memo: Optional[Dict[str, Dict]] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run every stage and return {"results", "timings", "keys", "reused",
+        "pending", "failed"}
+
+        timings maps each stage to {"start", "duration"} in seconds relative
+        to the pipeline start. memo is the "keys"/"results" of an earlier
+        run as {stage: {"key", "value"}}; stages whose input key is
+        unchanged reuse the stored value instead of running. If any stage
+        fails, the others are cancelled and the error is raised.
+
+        PITFALL: One hung LLM call held the whole request open forever
+        SOLUTION: Stages are cancelled at their own timeout or at deadline
+        (a time.perf_counter() value), whichever comes first. They and the
+        stages depending on them are listed in "pending" instead of raising,
+        so the caller can return whatever did finish.
+
+        PITFALL: An agent's error text was memoized like a real result and
+        reused by every later run
+        SOLUTION: Stages that return a Fallback, and the stages computed
+        from one, are listed in "failed" and get no key
+        """
+        memo = memo or {}
+        results: Dict[str, Any] = {}
+        timings: Dict[str, Dict[str, float]] = {}
+        keys: Dict[str, str] = {}
+        reused: List[str] = []
+        pending: List[str] = []
+        failed: List[str] = []
+        value_hashes: Dict[str, str] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        pipeline_start = time.perf_counter()
+
+        def input_key(stage: Stage) -> str:
+            if stage.inputs is not None:
+                return fingerprint([stage.name, stage.inputs(results)])
+            for dep in stage.deps:
+                if dep not in value_hashes:
+                    value_hashes[dep] = fingerprint(results[dep])
+            return fingerprint([stage.name] + [value_hashes[d] for d in stage.deps])
+
+        def time_left(stage: Stage) -> Optional[float]:
+            limits = [stage.timeout] if stage.timeout is not None else []
+            if deadline is not None:
+                limits.append(deadline - time.perf_counter())
+            return max(0.0, min(limits)) if limits else None
+
+        async def run_stage(stage: Stage):
+            if stage.deps:
+                await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+            if any(dep in pending for dep in stage.deps):
+                pending.append(stage.name)
+                return
+
+            with tracing.span(
+                "pipeline.stage", stage=stage.name, **stage.attributes
+            ) as span:
+                started = time.perf_counter()
+                key = input_key(stage) if stage.memoizable else None
+                previous = memo.get(stage.name)
+                hit = key is not None and previous and previous.get("key") == key
+                if key is not None and memo:
+                    metrics.record_cache_lookup("pipeline_stage", bool(hit))
+                if hit:
+                    value = previous["value"]
+                    reused.append(stage.name)
+                    span.set(reused=True)
+                else:
+                    if on_start:
+                        on_start(stage.name)
+                    value = stage.func(results)
+                    if inspect.isawaitable(value):
+                        limit = asyncio.timeout(time_left(stage))
+                        try:
+                            async with limit:
+                                value = await value
+                        except TimeoutError:
+                            # A timeout inside the stage (e.g. GitHub's) is
+                            # an ordinary failure
+                            if not limit.expired():
+                                raise
+                            self.logger.warning(
+                                f"Stage '{stage.name}' timed out after "
+                                f"{time.perf_counter() - started:.1f}s"
+                            )
+                            span.set(timed_out=True)
+                            pending.append(stage.name)
+                            return
+                finished = time.perf_counter()
+                if not hit:
+                    metrics.STAGE_DURATION.observe(finished - started, stage=stage.name)
+                if isinstance(value, Fallback):
+                    self.logger.warning(
+                        f"Stage '{stage.name}' fell back after an error: {value.error}"
+                    )
+                    span.set(failed=True)
+                    value = value.value
+                    failed.append(stage.name)
+                elif any(dep in failed for dep in stage.deps):
+                    failed.append(stage.name)
+
+            results[stage.name] = value
+            if key is not None and stage.name not in failed:
+                keys[stage.name] = key
+            timings[stage.name] = {
+                "start": round(started - pipeline_start, 4),
+                "duration": round(finished - started, 4),
+            }
+            if on_finish:
+                on_finish(stage.name)
+
+        # Dependencies come first in topological order, so their tasks exist
+        for name in self.order:
+            tasks[name] = asyncio.create_task(run_stage(self.stages[name]))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        timings["total"] = {
+            "start": 0.0,
+            "duration": round(time.perf_counter() - pipeline_start, 4),
+        }
+        return {
+            "results": results,
+            "timings": timings,
+            "keys": keys,
+            "reused": reused,
+            "pending": [name for name in self.order if name in pending],
+            "failed": [name for name in self.order if name in failed],
+        }
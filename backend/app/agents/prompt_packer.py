@@ -0,0 +1,256 @@
+from ..analysis.tree_index import MANIFESTS, TreeIndex
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+import asyncio
+import logging
+import re
+
+# Conventional entry points, most telling first
+ENTRY_POINTS = [
+    "main.py",
+    "app.py",
+    "__main__.py",
+    "manage.py",
+    "cli.py",
+    "server.py",
+    "index.js",
+    "index.ts",
+    "main.js",
+    "main.ts",
+    "server.js",
+    "app.js",
+    "App.jsx",
+    "App.tsx",
+    "main.go",
+    "main.rs",
+    "lib.rs",
+    "Main.java",
+    "Program.cs",
+    "__init__.py",
+]
+
+# README sections worth more than their position suggests
+README_KEYWORDS = (
+    "overview",
+    "feature",
+    "architecture",
+    "design",
+    "usage",
+    "getting started",
+    "install",
+    "how it works",
+)
+
+_HEADING = re.compile(r"^#{1,6}\s+(.*)$", re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate
+
+    PITFALL: Asking the API to count tokens costs a round trip per check
+    SOLUTION: ~4 characters per token for English and code, never less
+    than the number of whitespace-separated words
+    """
+    if not text:
+        return 0
+    return max((len(text) + 3) // 4, len(text.split()))
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut text to roughly `tokens` tokens, on a line boundary if possible"""
+    if estimate_tokens(text) <= tokens:
+        return text
+    cut = text[: tokens * 4]
+    newline = cut.rfind("\n")
+    if newline > len(cut) // 2:
+        cut = cut[:newline]
+    return cut + "\n[...truncated]"
+
+
+class Material:
+    """One piece of prompt input (a file or README section) and its priority"""
+
+    def __init__(self, label: str, text: str, priority: float):
+        self.label = label
+        self.text = text
+        self.priority = priority
+        self.tokens = estimate_tokens(text)
+
+    def render(self) -> str:
+        return f"--- {self.label} ---\n{self.text}\n"
+
+
+class PromptPacker:
+    """
+    Fits the most informative repo material into a fixed token budget
+
+    PITFALL: Truncating the README to N characters throws away the code
+    and often the useful half of the README too
+    SOLUTION: Rank README sections, manifests and entry points, pack them
+    greedily into the budget, and summarize what doesn't fit in a bounded
+    number of parallel map calls followed by one reduce call
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 6000,
+        max_map_calls: int = 4,
+        max_file_tokens: int = 2000,
+    ):
+        self.budget_tokens = budget_tokens
+        self.max_map_calls = max_map_calls
+        self.max_file_tokens = max_file_tokens
+        self.logger = logging.getLogger(__name__)
+
+    def select_files(self, tree: Union[TreeIndex, List[Dict]], limit: int) -> List[str]:
+        """Paths of the files most worth reading, best first"""
+        index = tree if isinstance(tree, TreeIndex) else TreeIndex.from_contents(tree)
+        files = []
+        for node, path in index.readable():
+            # The README is packed section by section instead
+            if path.lower().startswith("readme"):
+                continue
+            files.append((index.names[node], path, index.sizes[node]))
+
+        ranked = sorted(files, key=lambda item: self._file_rank(*item))
+        return [path for _, path, _ in ranked[:limit]]
+
+    def _file_rank(self, name: str, path: str, size: int):
+        depth = path.count("/")
+        if name in MANIFESTS:
+            return (0, depth, 0, path)
+        if name in ENTRY_POINTS:
+            return (1, depth, ENTRY_POINTS.index(name), path)
+        if name.lower().endswith((".md", ".json", ".yaml", ".yml", ".toml")):
+            return (3, depth, 0, path)
+        # Other source: shallow and substantial files first
+        return (2, depth, -size, path)
+
+    def readme_materials(self, readme: Optional[str]) -> List[Material]:
+        """Split a README into sections, ranked by how informative they are"""
+        if not readme:
+            return []
+
+        starts = [m.start() for m in _HEADING.finditer(readme)]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        starts.append(len(readme))
+
+        materials = []
+        for index, (start, end) in enumerate(zip(starts, starts[1:])):
+            section = readme[start:end].strip()
+            if not section:
+                continue
+            heading = _HEADING.match(section)
+            title = heading.group(1).strip() if heading else "Introduction"
+            if index == 0:
+                priority = 0.0
+            elif any(word in title.lower() for word in README_KEYWORDS):
+                priority = 1.0
+            else:
+                priority = 4.0 + index / 100
+            materials.append(
+                Material(
+                    f"README: {title}",
+                    truncate_to_tokens(section, self.max_file_tokens),
+                    priority,
+                )
+            )
+        return materials
+
+    def file_materials(self, sources: Dict[str, str]) -> List[Material]:
+        """Files in the order select_files ranked them"""
+        return [
+            Material(
+                path,
+                truncate_to_tokens(text, self.max_file_tokens),
+                2.0 + index / 100,
+            )
+            for index, (path, text) in enumerate(sources.items())
+        ]
+
+    def pack(self, materials: List[Material], budget: int):
+        """Greedily take the best materials that fit; return (packed, rest)"""
+        packed, rest = [], []
+        used = 0
+        for material in sorted(materials, key=lambda m: m.priority):
+            if used + material.tokens <= budget:
+                packed.append(material)
+                used += material.tokens
+            else:
+                rest.append(material)
+        return packed, rest
+
+    def chunk(self, materials: List[Material], chunk_tokens: int):
+        """Group materials into at most max_map_calls chunks of chunk_tokens"""
+        chunks: List[List[Material]] = []
+        size = 0
+        for material in materials:
+            if not chunks or size + material.tokens > chunk_tokens:
+                if len(chunks) == self.max_map_calls:
+                    break
+                chunks.append([])
+                size = 0
+            chunks[-1].append(material)
+            size += material.tokens
+        return chunks
+
+    async def build_context(
+        self,
+        readme: Optional[str],
+        sources: Dict[str, str],
+        summarize: Callable[[str], Awaitable[str]],
+    ) -> Dict:
+        """
+        Material for one analysis prompt, within the token budget
+
+        Everything that fits goes in verbatim. The overflow is summarized
+        in at most max_map_calls parallel calls, and the summaries take the
+        share of the budget reserved for them, so a repo of any size costs
+        at most max_map_calls + 1 model calls.
+        """
+        materials = self.readme_materials(readme) + self.file_materials(sources)
+        total = sum(m.tokens for m in materials)
+        if total <= self.budget_tokens:
+            return {
+                "text": "".join(
+                    m.render() for m in sorted(materials, key=lambda m: m.priority)
+                ),
+                "included": [m.label for m in materials],
+                "summarized": [],
+                "map_calls": 0,
+            }
+
+        # Keep half the budget verbatim; the rest is for the summaries
+        packed, rest = self.pack(materials, self.budget_tokens // 2)
+        chunks = self.chunk(rest, max(self.budget_tokens, self.max_file_tokens))
+        summary_tokens = (self.budget_tokens - self.budget_tokens // 2) // max(
+            len(chunks), 1
+        )
+
+        async def summarize_chunk(chunk: List[Material]) -> str:
+            files = "".join(m.render() for m in chunk)
+            prompt = f"""
+Summarize the following files from one software project for a reviewer.
+Focus on purpose, main components, notable dependencies and patterns.
+Use at most {summary_tokens * 3 // 4} words.
+
+{files}
+"""
+            try:
+                return truncate_to_tokens(await summarize(prompt), summary_tokens)
+            except Exception as e:
+                self.logger.error(f"Error summarizing source chunk: {str(e)}")
+                return ""
+
+        summaries = await asyncio.gather(*(summarize_chunk(c) for c in chunks))
+        text = "".join(m.render() for m in packed)
+        for index, summary in enumerate(s for s in summaries if s):
+            text += f"--- Summary of other files ({index + 1}) ---\n{summary}\n"
+
+        return {
+            "text": text,
+            "included": [m.label for m in packed],
+            "summarized": [m.label for chunk in chunks for m in chunk],
+            "map_calls": len(chunks),
+        }
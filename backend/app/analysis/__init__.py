@@ -0,0 +1 @@
+# Static analysis module
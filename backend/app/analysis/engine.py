@@ -0,0 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from .metrics import LANGUAGES, METRICS_VERSION, analyze_batch
+from ..config import get_settings
+from ..utils.disk_cache import DiskCache
+from ..utils.metrics import CACHE_LOOKUPS
+import asyncio
+import json
+import logging
+
+# Files per process-pool task; one task per file spends more on pickling
+BATCH_SIZE = 64
+
+# Below this many files the pool's startup and IPC cost more than it saves
+INLINE_THRESHOLD = 16
+
+METRIC_FIELDS = ("sloc", "comment_lines", "functions", "classes", "public_api")
+
+# Languages that count towards the totals; docs and config ("Other") only
+# get line counts, which would inflate SLOC
+SOURCE_LANGUAGES = set(LANGUAGES.values())
+
+
+class StaticAnalyzer:
+    """
+    Exact code metrics for fetched files, computed off the event loop
+
+    PITFALL: Parsing thousands of files in the event loop (or in threads,
+    under the GIL) stalls every other request
+    SOLUTION: Spread batches over a process pool and memoize each file's
+    metrics by git blob SHA, so unchanged files are never analyzed twice,
+    across runs and across repos that vendor the same file
+    """
+
+    def __init__(self, workers: int, cache: Optional[DiskCache] = None):
+        self.workers = workers or None  # None: one per CPU
+        self.cache = cache
+        self.logger = logging.getLogger(__name__)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def analyze(self, files: Dict[str, Tuple[Optional[str], str]]) -> Dict:
+        """Analyze {path: (blob_sha, text)} into repo-level metrics (see summarize)"""
+        per_file: Dict[str, Dict] = {}
+        pending: List[Tuple[str, Optional[str], str]] = []
+
+        cached = await asyncio.to_thread(self._lookup, files)
+        for path, (sha, text) in files.items():
+            if path in cached:
+                per_file[path] = cached[path]
+            else:
+                pending.append((path, sha, text))
+
+        if pending:
+            computed = await self._compute([(path, text) for path, _, text in pending])
+            for (path, sha, _), metrics in zip(pending, computed):
+                per_file[path] = metrics
+            await asyncio.to_thread(
+                self._store,
+                [
+                    (path, sha, metrics)
+                    for (path, sha, _), metrics in zip(pending, computed)
+                ],
+            )
+
+        if self.cache is not None:
+            CACHE_LOOKUPS.inc(
+                len(files) - len(pending), cache="static_analysis", result="hit"
+            )
+            CACHE_LOOKUPS.inc(len(pending), cache="static_analysis", result="miss")
+        self.logger.info(
+            f"Static analysis: {len(pending)} files analyzed, "
+            f"{len(files) - len(pending)} from cache"
+        )
+        return dict(summarize(per_file), cached_files=len(files) - len(pending))
+
+    async def _compute(self, files: List[Tuple[str, str]]) -> List[Dict]:
+        if len(files) < INLINE_THRESHOLD:
+            return await asyncio.to_thread(analyze_batch, files)
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        batches = [files[i : i + BATCH_SIZE] for i in range(0, len(files), BATCH_SIZE)]
+        results = await asyncio.gather(
+            *(loop.run_in_executor(pool, analyze_batch, batch) for batch in batches)
+        )
+        return [metrics for batch in results for metrics in batch]
+
+    def _cache_key(self, path: str, sha: str) -> str:
+        # The same blob can be parsed differently under another extension
+        extension = path.rsplit(".", 1)[-1] if "." in path else ""
+        return f"v{METRICS_VERSION}:{extension}:{sha}"
+
+    def _lookup(self, files: Dict[str, Tuple[Optional[str], str]]) -> Dict[str, Dict]:
+        found = {}
+        if self.cache is None:
+            return found
+        for path, (sha, _) in files.items():
+            if sha is None:
+                continue
+            raw = self.cache.get(self._cache_key(path, sha))
+            if raw is not None:
+                found[path] = json.loads(raw)
+        return found
+
+    def _store(self, entries: List[Tuple[str, Optional[str], Dict]]):
+        if self.cache is None:
+            return
+        for path, sha, metrics in entries:
+            if sha is not None and "error" not in metrics:
+                key = self._cache_key(path, sha)
+                self.cache.set(key, json.dumps(metrics).encode())
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def summarize(per_file: Dict[str, Dict], top: int = 10) -> Dict:
+    """
+    Repo-level totals, per-language breakdown and the most complex files
+
+    Only source files that were analyzed count: files that failed to parse
+    and non-code files are left out.
+    """
+    totals = {field: 0 for field in METRIC_FIELDS}
+    languages: Dict[str, Dict] = {}
+    complexities = []
+    analyzed = 0
+
+    for path, metrics in per_file.items():
+        if "error" in metrics or metrics["language"] not in SOURCE_LANGUAGES:
+            continue
+        analyzed += 1
+        language = languages.setdefault(
+            metrics["language"], {"files": 0, "sloc": 0, "complexity": 0}
+        )
+        language["files"] += 1
+        language["sloc"] += metrics["sloc"]
+        language["complexity"] += metrics["complexity"]
+        for field in METRIC_FIELDS:
+            totals[field] += metrics[field]
+        if metrics["complexity"]:
+            complexities.append((metrics["complexity"], path))
+
+    commented = totals["sloc"] + totals["comment_lines"]
+    complexities.sort(reverse=True)
+    return {
+        "analyzed_files": analyzed,
+        **totals,
+        "comment_ratio": round(totals["comment_lines"] / commented, 3)
+        if commented
+        else 0.0,
+        "avg_complexity": round(sum(c for c, _ in complexities) / len(complexities), 2)
+        if complexities
+        else 0.0,
+        "max_complexity": complexities[0][0] if complexities else 0,
+        "most_complex_files": [
+            {"path": path, "complexity": c} for c, path in complexities[:top]
+        ],
+        "languages": languages,
+    }
+
+
+@lru_cache()
+def get_static_analyzer() -> StaticAnalyzer:
+    settings = get_settings()
+    cache = None
+    if settings.static_analysis_cache_enabled:
+        cache = DiskCache(
+            settings.static_analysis_cache_path,
+            settings.static_analysis_cache_max_mb * 1024 * 1024,
+        )
+    return StaticAnalyzer(settings.static_analysis_workers, cache)
@@ -0,0 +1,299 @@
+from typing import Dict, Iterable, List, Optional, Set
+from .metrics import language_for
+import ast
+import posixpath
+import re
+
+# Languages whose imports we can resolve to files in the repo
+GRAPH_LANGUAGES = {"Python", "JavaScript", "TypeScript", "Go", "Rust"}
+
+JS_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".mjs")
+
+# Common bundler aliases for the source root
+JS_ALIASES = {"@/": "src/", "~/": "src/"}
+
+_JS_IMPORTS = re.compile(
+    r"""(?:import|export)\s[^'";]*?from\s*['"]([^'"]+)['"]"""
+    r"""|import\s*['"]([^'"]+)['"]"""
+    r"""|(?:require|import)\s*\(\s*['"]([^'"]+)['"]\s*\)"""
+)
+_GO_IMPORT = re.compile(r'^\s*import\s+(?:[\w.]+\s+)?"([^"]+)"', re.MULTILINE)
+_GO_IMPORT_BLOCK = re.compile(r"^\s*import\s*\((.*?)\)", re.MULTILINE | re.DOTALL)
+_GO_PATH = re.compile(r'"([^"]+)"')
+_RUST_MOD = re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?mod\s+(\w+)\s*;", re.MULTILINE)
+_RUST_USE = re.compile(
+    r"^\s*(?:pub(?:\([^)]*\))?\s+)?use\s+((?:crate|super|self)(?:::\w+)*)",
+    re.MULTILINE,
+)
+
+# PageRank damping and iteration bounds
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+
+
+class DependencyGraph:
+    """
+    Module dependency graph over a repository's files
+
+    PITFALL: Picking files by name and size sends helpers and fixtures to
+    the model while the modules everything depends on stay unread
+    SOLUTION: Resolve each file's imports to paths in the tree and rank
+    files by PageRank over the import edges, restarting at the entry
+    points, so entry points and the modules they (transitively) lean on
+    come first
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths: Set[str] = set(paths)
+        self.imports: Dict[str, Set[str]] = {}
+        self.imported_by: Dict[str, Set[str]] = {}
+        self._python_modules: Dict[str, Optional[str]] = {}
+        self._python_suffixes: Dict[str, Optional[str]] = {}
+        self._go_packages: Dict[str, List[str]] = {}
+        self._index()
+
+    def _index(self):
+        for path in sorted(self.paths):
+            if path.endswith(".py"):
+                parts = path[:-3].split("/")
+                if parts[-1] == "__init__":
+                    parts = parts[:-1]
+                if not parts:
+                    continue
+                self._python_modules.setdefault(".".join(parts), path)
+                # Suffixes resolve absolute imports under src/ layouts;
+                # ambiguous ones resolve to nothing
+                for start in range(1, len(parts)):
+                    suffix = ".".join(parts[start:])
+                    if self._python_suffixes.get(suffix, path) != path:
+                        self._python_suffixes[suffix] = None
+                    else:
+                        self._python_suffixes[suffix] = path
+            elif path.endswith(".go") and not path.endswith("_test.go"):
+                package = posixpath.dirname(path)
+                self._go_packages.setdefault(package, []).append(path)
+
+    @property
+    def parsed(self) -> Set[str]:
+        """Files whose imports have been read"""
+        return set(self.imports)
+
+    def add_file(self, path: str, text: str):
+        """Parse one file's imports and add its edges"""
+        language = language_for(path)
+        if language not in GRAPH_LANGUAGES:
+            return
+        self.paths.add(path)
+        targets = set()
+        for spec in extract_imports(path, text):
+            targets.update(self.resolve(path, spec))
+        targets.discard(path)
+
+        self.imports[path] = targets
+        for target in targets:
+            self.imported_by.setdefault(target, set()).add(path)
+
+    def add_files(self, texts: Dict[str, str]):
+        for path, text in texts.items():
+            self.add_file(path, text)
+
+    def resolve(self, path: str, spec: str) -> List[str]:
+        """Repo paths an import spec in `path` refers to (empty if external)"""
+        language = language_for(path)
+        if language == "Python":
+            return self._resolve_python(path, spec)
+        if language in ("JavaScript", "TypeScript"):
+            return self._resolve_js(path, spec)
+        if language == "Go":
+            return self._resolve_go(spec)
+        if language == "Rust":
+            return self._resolve_rust(path, spec)
+        return []
+
+    def _resolve_python(self, path: str, spec: str) -> List[str]:
+        # Relative imports arrive as ".module" / "..package.module"
+        level = len(spec) - len(spec.lstrip("."))
+        if level:
+            package = path.split("/")[:-1]
+            if level > 1:
+                package = package[: -(level - 1)] or []
+            name = ".".join(package + [p for p in spec[level:].split(".") if p])
+            found = self._python_modules.get(name)
+            return [found] if found else []
+
+        found = self._python_modules.get(spec) or self._python_suffixes.get(spec)
+        return [found] if found else []
+
+    def _resolve_js(self, path: str, spec: str) -> List[str]:
+        for alias, root in JS_ALIASES.items():
+            if spec.startswith(alias):
+                base = root + spec[len(alias) :]
+                break
+        else:
+            if not spec.startswith("."):
+                return []  # A package from node_modules
+            base = posixpath.normpath(posixpath.join(posixpath.dirname(path), spec))
+
+        candidates = [base] + [base + ext for ext in JS_EXTENSIONS]
+        candidates += [f"{base}/index{ext}" for ext in JS_EXTENSIONS]
+        for candidate in candidates:
+            if candidate in self.paths:
+                return [candidate]
+        return []
+
+    def _resolve_go(self, spec: str) -> List[str]:
+        # Module paths end in the package's directory in this repo; try the
+        # longest matching suffix
+        parts = spec.split("/")
+        if "." not in parts[0] and spec not in self._go_packages:
+            return []  # Standard library
+        for start in range(len(parts)):
+            package = "/".join(parts[start:])
+            if package in self._go_packages:
+                return self._go_packages[package]
+        return []
+
+    def _resolve_rust(self, path: str, spec: str) -> List[str]:
+        directory, name = posixpath.split(path)
+        stem = name[: -len(".rs")]
+        # Children of foo.rs live in foo/; of mod.rs, lib.rs and main.rs
+        # next to them
+        module_dir = (
+            directory
+            if stem in ("mod", "lib", "main")
+            else posixpath.join(directory, stem)
+        )
+
+        if "::" not in spec:
+            # `mod name;`
+            base = posixpath.join(module_dir, spec)
+        else:
+            parts = spec.split("::")
+            if parts[0] == "crate":
+                if path.startswith("src/"):
+                    root = "src"
+                elif "/src/" in path:
+                    root = path[: path.index("/src/") + len("/src")]
+                else:
+                    root = directory
+                base = posixpath.join(root, *parts[1:])
+            elif parts[0] == "super":
+                base = posixpath.join(posixpath.dirname(module_dir), *parts[1:])
+            else:
+                base = posixpath.join(module_dir, *parts[1:])
+
+        # `use crate::a::b::Item` names an item; walk up to the module file
+        while base and base not in (".", "/"):
+            for candidate in (base + ".rs", base + "/mod.rs"):
+                if candidate in self.paths and candidate != path:
+                    return [candidate]
+            base = posixpath.dirname(base)
+        return []
+
+    def rank(self, entry_points: Iterable[str] = ()) -> Dict[str, float]:
+        """
+        PageRank over import edges (importer -> imported)
+
+        Random jumps land on the entry points when there are any, so
+        modules they depend on outrank code nothing reaches.
+        """
+        nodes = sorted(set(self.imports) | set(self.imported_by))
+        if not nodes:
+            return {}
+        entry_points = set(entry_points)
+        starts = [node for node in nodes if node in entry_points] or nodes
+        restart = {node: 1.0 / len(starts) for node in starts}
+
+        scores = {node: 1.0 / len(nodes) for node in nodes}
+        for _ in range(MAX_ITERATIONS):
+            # Files that import nothing hand their score back to the restart
+            dangling = sum(scores[n] for n in nodes if not self.imports.get(n))
+            updated = {
+                node: (1 - DAMPING + DAMPING * dangling) * restart.get(node, 0.0)
+                for node in nodes
+            }
+            for node in nodes:
+                targets = self.imports.get(node)
+                if targets:
+                    share = DAMPING * scores[node] / len(targets)
+                    for target in targets:
+                        updated[target] += share
+            delta = sum(abs(updated[n] - scores[n]) for n in nodes)
+            scores = updated
+            if delta < TOLERANCE:
+                break
+        return scores
+
+    def top_k(
+        self,
+        k: int,
+        entry_points: Iterable[str] = (),
+        candidates: Optional[Set[str]] = None,
+    ) -> List[Dict]:
+        """
+        The k most central files, best first
+
+        Each entry has path, score, imports and imported_by counts.
+        candidates restricts the result, e.g. to files whose text we have.
+        """
+        scores = self.rank(entry_points)
+        ranked = sorted(
+            (
+                (score, path)
+                for path, score in scores.items()
+                if candidates is None or path in candidates
+            ),
+            key=lambda item: (-item[0], item[1]),
+        )
+        return [
+            {
+                "path": path,
+                "score": round(score, 4),
+                "imports": len(self.imports.get(path, ())),
+                "imported_by": len(self.imported_by.get(path, ())),
+            }
+            for score, path in ranked[:k]
+        ]
+
+    def frontier(self, k: int, entry_points: Iterable[str] = ()) -> List[str]:
+        """The k most central files that are imported but not yet parsed"""
+        parsed = self.parsed
+        unread = {path for path in self.imported_by if path not in parsed}
+        return [item["path"] for item in self.top_k(k, entry_points, candidates=unread)]
+
+
+def extract_imports(path: str, text: str) -> List[str]:
+    """Raw import specs in one file (module names, relative paths, ...)"""
+    language = language_for(path)
+    if language == "Python":
+        return _python_imports(text)
+    if language in ("JavaScript", "TypeScript"):
+        return [next(g for g in m.groups() if g) for m in _JS_IMPORTS.finditer(text)]
+    if language == "Go":
+        specs = _GO_IMPORT.findall(text)
+        for block in _GO_IMPORT_BLOCK.findall(text):
+            specs.extend(_GO_PATH.findall(block))
+        return specs
+    if language == "Rust":
+        return _RUST_MOD.findall(text) + _RUST_USE.findall(text)
+    return []
+
+
+def _python_imports(text: str) -> List[str]:
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return []
+
+    specs = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            specs.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            # `from pkg import mod` may name submodules rather than objects
+            separator = "" if module.endswith(".") or not module else "."
+            specs.extend(module + separator + alias.name for alias in node.names)
+            specs.append(module)
+    return specs
@@ -0,0 +1,251 @@
+from typing import Dict, List, Optional, Tuple
+import ast
+import re
+
+# Bump when the metrics change so memoized results are recomputed
+METRICS_VERSION = 1
+
+LANGUAGES = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".jsx": "JavaScript",
+    ".mjs": "JavaScript",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".java": "Java",
+    ".kt": "Kotlin",
+    ".c": "C",
+    ".h": "C",
+    ".cpp": "C++",
+    ".swift": "Swift",
+    ".php": "PHP",
+    ".rb": "Ruby",
+}
+
+# Languages whose comments start with // and /* */
+C_STYLE = {"JavaScript", "TypeScript", "Go", "Rust", "Java", "Kotlin", "C", "C++"}
+C_STYLE |= {"Swift", "PHP"}
+
+# Strings and comments for C-style languages, matched in one left-to-right
+# scan so comment markers inside strings (and vice versa) are ignored
+_C_TOKENS = re.compile(
+    r"""
+    (?P<block>/\*.*?\*/)
+  | (?P<line>//[^\n]*)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+# Go and Rust: single quotes are one-character literals (and Rust
+# lifetimes like 'a, which must not start a string)
+_CHAR_LITERAL_TOKENS = re.compile(
+    r"""
+    (?P<block>/\*.*?\*/)
+  | (?P<line>//[^\n]*)
+  | (?P<string>"(?:\\.|[^"\\])*"|`[^`]*`|'(?:\\.|[^'\\\n])')
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Decision points per language family (cyclomatic complexity = 1 + count)
+_C_DECISIONS = re.compile(r"\b(?:if|for|while|case|catch)\b|&&|\|\||\?(?![.?:])")
+_RUST_DECISIONS = re.compile(r"\b(?:if|for|while|loop)\b|=>|&&|\|\||\?")
+_GO_DECISIONS = re.compile(r"\b(?:if|for|case|select)\b|&&|\|\|")
+
+_STRUCTURE = {
+    "JavaScript": (
+        re.compile(
+            r"\bfunction\b|=>|^\s*(?:async\s+)?"
+            r"(?!(?:if|for|while|switch|catch)\b)\w+\s*\([^)]*\)\s*\{",
+            re.MULTILINE,
+        ),
+        re.compile(r"\bclass\s+\w+"),
+        re.compile(r"^\s*export\b", re.MULTILINE),
+    ),
+    "Go": (
+        re.compile(r"^func\b", re.MULTILINE),
+        re.compile(r"^type\s+\w+\s+(?:struct|interface)\b", re.MULTILINE),
+        re.compile(
+            r"^(?:func(?:\s*\([^)]*\))?|type|var|const)\s+[A-Z]\w*", re.MULTILINE
+        ),
+    ),
+    "Rust": (
+        re.compile(r"\bfn\s+\w+"),
+        re.compile(r"\b(?:struct|enum|trait)\s+\w+"),
+        re.compile(
+            r"^\s*pub\s+(?:fn|struct|enum|trait|mod|const|type)\b", re.MULTILINE
+        ),
+    ),
+}
+_STRUCTURE["TypeScript"] = _STRUCTURE["JavaScript"]
+
+
+def language_for(path: str) -> Optional[str]:
+    dot = path.rfind(".")
+    return LANGUAGES.get(path[dot:].lower()) if dot != -1 else None
+
+
+def analyze_file(path: str, text: str) -> Dict:
+    """
+    Metrics for one source file
+
+    Lines are split into code (SLOC), comment-only and blank. Python gets
+    function/class counts, cyclomatic complexity and public names from its
+    AST; JS/TS/Go/Rust get the same from a string- and comment-aware
+    tokenizer. Other files only get line counts.
+    """
+    language = language_for(path)
+    metrics = {
+        "language": language or "Other",
+        "lines": len(text.splitlines()),
+        "sloc": 0,
+        "comment_lines": 0,
+        "functions": 0,
+        "classes": 0,
+        "complexity": 0,
+        "public_api": 0,
+    }
+
+    if language == "Python":
+        _python_metrics(text, metrics)
+    elif language in C_STYLE:
+        _c_style_metrics(text, language, metrics)
+    else:
+        metrics["sloc"] = sum(1 for line in text.splitlines() if line.strip())
+    return metrics
+
+
+def analyze_batch(files: List[Tuple[str, str]]) -> List[Dict]:
+    """Process-pool entry point: analyze several (path, text) pairs"""
+    results = []
+    for path, text in files:
+        try:
+            results.append(analyze_file(path, text))
+        except Exception as e:
+            # One odd file shouldn't fail the batch
+            results.append({"language": language_for(path) or "Other", "error": str(e)})
+    return results
+
+
+def _count_lines(code_lines: List[str], comment_lines: set, metrics: Dict):
+    for number, line in enumerate(code_lines, start=1):
+        if line.strip():
+            metrics["sloc"] += 1
+        elif number in comment_lines:
+            metrics["comment_lines"] += 1
+
+
+def _python_metrics(text: str, metrics: Dict):
+    lines = text.splitlines()
+    docstring_lines = set()
+
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        tree = None
+
+    if tree is not None:
+        for node in ast.walk(tree):
+            if isinstance(
+                node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+            ):
+                body = node.body
+                if (
+                    body
+                    and isinstance(body[0], ast.Expr)
+                    and isinstance(body[0].value, ast.Constant)
+                    and isinstance(body[0].value.value, str)
+                ):
+                    docstring_lines.update(
+                        range(body[0].lineno, body[0].end_lineno + 1)
+                    )
+
+    for number, line in enumerate(lines, start=1):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        # Docstrings count as comments
+        if stripped.startswith("#") or number in docstring_lines:
+            metrics["comment_lines"] += 1
+        else:
+            metrics["sloc"] += 1
+
+    if tree is None:
+        return
+
+    complexity = 1
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            metrics["functions"] += 1
+        elif isinstance(node, ast.ClassDef):
+            metrics["classes"] += 1
+        elif isinstance(
+            node,
+            (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler),
+        ):
+            complexity += 1
+        elif isinstance(node, ast.BoolOp):
+            complexity += len(node.values) - 1
+        elif isinstance(node, ast.comprehension):
+            complexity += 1 + len(node.ifs)
+        elif isinstance(node, ast.match_case):
+            complexity += 1
+    metrics["complexity"] = complexity
+    metrics["public_api"] = _python_public_names(tree)
+
+
+def _python_public_names(tree: ast.Module) -> int:
+    for node in tree.body:
+        # An explicit __all__ is the public API
+        if isinstance(node, ast.Assign) and any(
+            isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets
+        ):
+            if isinstance(node.value, (ast.List, ast.Tuple)):
+                return len(node.value.elts)
+    return sum(
+        1
+        for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        and not node.name.startswith("_")
+    )
+
+
+def _c_style_metrics(text: str, language: str, metrics: Dict):
+    comment_lines = set()
+    pieces = []
+    position = 0
+    line = 1
+    tokens = _CHAR_LITERAL_TOKENS if language in ("Go", "Rust") else _C_TOKENS
+
+    # Blank out comments and string contents, keeping newlines so line
+    # numbers still match
+    for match in tokens.finditer(text):
+        pieces.append(text[position : match.start()])
+        line += text.count("\n", position, match.start())
+        token = match.group(0)
+        newlines = token.count("\n")
+        if match.lastgroup == "string":
+            pieces.append('""' + "\n" * newlines)
+        else:
+            comment_lines.update(range(line, line + newlines + 1))
+            pieces.append("\n" * newlines)
+        line += newlines
+        position = match.end()
+    pieces.append(text[position:])
+    code = "".join(pieces)
+
+    _count_lines(code.splitlines(), comment_lines, metrics)
+
+    decisions = {"Rust": _RUST_DECISIONS, "Go": _GO_DECISIONS}.get(
+        language, _C_DECISIONS
+    )
+    metrics["complexity"] = 1 + len(decisions.findall(code))
+
+    structure = _STRUCTURE.get(language)
+    if structure is not None:
+        functions, classes, public = structure
+        metrics["functions"] = len(functions.findall(code))
+        metrics["classes"] = len(classes.findall(code))
+        metrics["public_api"] = len(public.findall(code))
@@ -0,0 +1,186 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from .tree_index import ROOT, TreeIndex
+from ..config import get_settings
+import json
+import logging
+
+DEFAULT_RULES_PATH = Path(__file__).parent / "rules" / "stacks.json"
+
+# Matched paths kept per signal, as evidence in the report
+MAX_EVIDENCE = 3
+
+SIGNAL_KINDS = ("file", "directory", "extension")
+
+
+class Signal:
+    __slots__ = ("rule", "weight", "min_count", "root_only")
+
+    def __init__(self, rule: int, weight: float, min_count: int, root_only: bool):
+        self.rule = rule
+        self.weight = weight
+        self.min_count = min_count
+        self.root_only = root_only
+
+
+class StackDetector:
+    """
+    Declarative stack and project-type detection over the whole tree
+
+    PITFALL: An if/elif chain over top-level names calls every monorepo
+    (packages/*/package.json, nested pyproject.toml) "Unknown", and each
+    new stack means a code change
+    SOLUTION: Rules in JSON name the files, directories and extensions that
+    count as evidence. They're compiled into lookup tables keyed by name,
+    so one pass over the tree index's name tables matches every rule at
+    once; a rule's confidence is the noisy-OR of the weights of the
+    signals it matched
+    """
+
+    def __init__(self, rules: Dict):
+        self.min_confidence = rules.get("min_confidence", 0.3)
+        self.rules: List[Dict] = []
+        self.signals: List[Signal] = []
+        self.tables: Dict[str, Dict[str, List[int]]] = {
+            kind: {} for kind in SIGNAL_KINDS
+        }
+
+        for category in ("stacks", "project_types"):
+            for rule in rules.get(category, []):
+                self._compile(category, rule)
+
+    def _compile(self, category: str, rule: Dict):
+        rule_id = len(self.rules)
+        self.rules.append(
+            {
+                "name": rule["name"],
+                "kind": rule.get("kind", "project_type"),
+                "category": category,
+            }
+        )
+        for spec in rule["signals"]:
+            kinds = [kind for kind in SIGNAL_KINDS if kind in spec]
+            if len(kinds) != 1:
+                raise ValueError(
+                    f"Rule '{rule['name']}': each signal needs exactly one of "
+                    f"{', '.join(SIGNAL_KINDS)}"
+                )
+            kind = kinds[0]
+            signal_id = len(self.signals)
+            self.signals.append(
+                Signal(
+                    rule_id,
+                    float(spec["weight"]),
+                    int(spec.get("min_count", 1)),
+                    spec.get("scope") == "root",
+                )
+            )
+            names = spec[kind] if isinstance(spec[kind], list) else [spec[kind]]
+            for name in names:
+                # Directories and extensions match case-insensitively
+                key = name if kind == "file" else name.lower()
+                self.tables[kind].setdefault(key, []).append(signal_id)
+
+    def detect(self, index: TreeIndex) -> Dict:
+        """{"stacks": [...], "project_types": [...]}, best first"""
+        counts = [0] * len(self.signals)
+        evidence: List[List[int]] = [[] for _ in self.signals]
+        files = self.tables["file"]
+        directories = self.tables["directory"]
+        parents, is_dir = index.parents, index.is_dir
+
+        def match(signal_ids: List[int], nodes: List[int], directory: bool):
+            for signal_id in signal_ids:
+                root_only = self.signals[signal_id].root_only
+                for node in nodes:
+                    if is_dir[node] != directory:
+                        continue
+                    if root_only and parents[node] != ROOT:
+                        continue
+                    counts[signal_id] += 1
+                    if len(evidence[signal_id]) < MAX_EVIDENCE:
+                        evidence[signal_id].append(node)
+
+        # One pass over the index's basename table: every distinct name is
+        # looked up once, however many rules mention it
+        for name, nodes in index.by_name.items():
+            file_hits = files.get(name)
+            if file_hits:
+                match(file_hits, nodes, directory=False)
+            directory_hits = directories.get(name.lower())
+            if directory_hits:
+                match(directory_hits, nodes, directory=True)
+        for extension, nodes in index.by_extension.items():
+            extension_hits = self.tables["extension"].get(extension.lower())
+            if extension_hits:
+                match(extension_hits, nodes, directory=False)
+
+        return self._report(index, counts, evidence)
+
+    def _report(
+        self, index: TreeIndex, counts: List[int], evidence: List[List[int]]
+    ) -> Dict:
+        missing = [1.0] * len(self.rules)
+        found: List[List[str]] = [[] for _ in self.rules]
+        for signal_id, signal in enumerate(self.signals):
+            if counts[signal_id] >= signal.min_count:
+                missing[signal.rule] *= 1 - signal.weight
+                found[signal.rule].extend(
+                    index.path(node) for node in evidence[signal_id]
+                )
+
+        report: Dict[str, List[Dict]] = {"stacks": [], "project_types": []}
+        for rule_id, rule in enumerate(self.rules):
+            confidence = round(1 - missing[rule_id], 3)
+            if confidence < self.min_confidence:
+                continue
+            entry = {"name": rule["name"], "confidence": confidence}
+            if rule["category"] == "stacks":
+                entry["kind"] = rule["kind"]
+            entry["evidence"] = found[rule_id][:MAX_EVIDENCE]
+            report[rule["category"]].append(entry)
+
+        # Stable sort: ties keep rule order
+        for entries in report.values():
+            entries.sort(key=lambda entry: -entry["confidence"])
+        return report
+
+
+def primary(stacks: List[Dict], kinds: Tuple[str, ...]) -> Optional[str]:
+    """Most confident stack of the first kind (in order) that has one"""
+    for kind in kinds:
+        for stack in stacks:
+            if stack["kind"] == kind:
+                return stack["name"]
+    return None
+
+
+def load_rules(extra_path: Optional[str] = None) -> Dict:
+    """Built-in rules, plus rules from extra_path (same names replace ours)"""
+    rules = json.loads(DEFAULT_RULES_PATH.read_text())
+    if not extra_path:
+        return rules
+
+    extra = json.loads(Path(extra_path).read_text())
+    for category in ("stacks", "project_types"):
+        replaced = {rule["name"] for rule in extra.get(category, [])}
+        rules[category] = [
+            rule for rule in rules.get(category, []) if rule["name"] not in replaced
+        ] + extra.get(category, [])
+    if "min_confidence" in extra:
+        rules["min_confidence"] = extra["min_confidence"]
+    return rules
+
+
+@lru_cache()
+def get_stack_detector() -> StackDetector:
+    settings = get_settings()
+    try:
+        return StackDetector(load_rules(settings.detection_rules_path))
+    except (OSError, ValueError, KeyError) as e:
+        # A broken extra rules file shouldn't take detection down
+        logging.getLogger(__name__).error(
+            f"Can't load detection rules from {settings.detection_rules_path}: {e}"
+        )
+        return StackDetector(load_rules())
@@ -0,0 +1,232 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+import hashlib
+import sys
+
+ROOT = 0
+
+# Files whose content is worth reading: source, docs and config. The tree
+# lists every file (stack detection needs go.mod, pom.xml, lockfiles...);
+# only fetching and analysis are limited to these
+CODE_EXTENSIONS = (
+    ".py",
+    ".js",
+    ".jsx",
+    ".ts",
+    ".tsx",
+    ".java",
+    ".cpp",
+    ".c",
+    ".h",
+    ".go",
+    ".rs",
+    ".rb",
+    ".php",
+    ".swift",
+    ".kt",
+    ".md",
+    ".json",
+    ".yaml",
+    ".yml",
+    ".toml",
+)
+
+# Files that describe a project's dependencies and tooling
+MANIFESTS = {
+    "package.json",
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+    "Cargo.toml",
+    "composer.json",
+    "pom.xml",
+    "build.gradle",
+    "go.mod",
+    "Gemfile",
+    "requirements.txt",
+    "docker-compose.yml",
+}
+
+# Larger files are listed but never read
+MAX_READ_BYTES = 1_000_000
+
+
+class TreeIndex:
+    """
+    Compact, flat index over a repository tree
+
+    PITFALL: The nested contents dicts get walked recursively by every
+    analysis function, and tens of thousands of entries cost a dict (and a
+    full path string) each
+    SOLUTION: Build once during fetch: one node per entry in parallel
+    arrays, interned name components, a path trie for lookups and tables by
+    basename and extension, so the analysis queries are O(1) or O(k)
+    """
+
+    __slots__ = (
+        "names",
+        "parents",
+        "is_dir",
+        "sizes",
+        "shas",
+        "children",
+        "by_name",
+        "by_extension",
+        "file_ids",
+        "_digest",
+    )
+
+    def __init__(self):
+        # Node 0 is the repository root
+        self.names: List[str] = [""]
+        self.parents = array("i", [-1])
+        self.is_dir = bytearray(b"\x01")
+        self.sizes = array("q", [0])
+        self.shas: List[Optional[str]] = [None]
+        # The path trie: directory node -> {name: child node}
+        self.children: Dict[int, Dict[str, int]] = {ROOT: {}}
+        self.by_name: Dict[str, List[int]] = {}
+        self.by_extension: Dict[str, List[int]] = {}
+        self.file_ids = array("i")
+        self._digest = hashlib.sha256()
+
+    @classmethod
+    def from_contents(cls, contents: List[Dict]) -> "TreeIndex":
+        """Index a nested contents list (as built by the GitHub MCP)"""
+        index = cls()
+        stack = [contents]
+        while stack:
+            for item in stack.pop():
+                is_dir = item["type"] == "directory"
+                index.insert(item["path"], is_dir, item.get("size", 0), item.get("sha"))
+                if is_dir:
+                    stack.append(item.get("children", []))
+        return index
+
+    @classmethod
+    def of(cls, repo_data: Dict) -> "TreeIndex":
+        """The index fetched with repo_data, built from its contents if missing"""
+        index = repo_data.get("index")
+        if index is None:
+            index = cls.from_contents(repo_data.get("contents", []))
+        return index
+
+    def insert(
+        self, path: str, is_dir: bool, size: int = 0, sha: Optional[str] = None
+    ) -> int:
+        """Add an entry by path, creating parent directories as needed"""
+        parent = ROOT
+        *directories, name = path.split("/")
+        for part in directories:
+            node = self.children[parent].get(part)
+            if node is None:
+                node = self._add(parent, part, True, 0, None)
+            parent = node
+
+        node = self.children[parent].get(name)
+        if node is not None:
+            return node  # Listed already (or created as a parent)
+        return self._add(parent, name, is_dir, size, sha)
+
+    def _add(
+        self, parent: int, name: str, is_dir: bool, size: int, sha: Optional[str]
+    ) -> int:
+        node = len(self.names)
+        name = sys.intern(name)
+        self.names.append(name)
+        self.parents.append(parent)
+        self.is_dir.append(1 if is_dir else 0)
+        self.sizes.append(size or 0)
+        self.shas.append(sha)
+        self.children[parent][name] = node
+        self.by_name.setdefault(name, []).append(node)
+        if is_dir:
+            self.children[node] = {}
+        else:
+            self.file_ids.append(node)
+            self.by_extension.setdefault(extension_of(name), []).append(node)
+        self._digest.update(f"{parent}/{name}:{int(is_dir)}:{size}:{sha}\n".encode())
+        return node
+
+    @property
+    def digest(self) -> str:
+        """Content hash, so pipeline fingerprints skip walking the tree"""
+        return self._digest.hexdigest()
+
+    @property
+    def file_count(self) -> int:
+        return len(self.file_ids)
+
+    def path(self, node: int) -> str:
+        parts = []
+        while node != ROOT:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        return "/".join(reversed(parts))
+
+    def depth(self, node: int) -> int:
+        depth = -1
+        while node != ROOT:
+            depth += 1
+            node = self.parents[node]
+        return depth
+
+    def find(self, path: str) -> Optional[int]:
+        """Node for a path, walking the trie (O(depth))"""
+        node = ROOT
+        for part in path.split("/"):
+            node = self.children.get(node, {}).get(part)
+            if node is None:
+                return None
+        return node
+
+    def sha(self, path: str) -> Optional[str]:
+        node = self.find(path)
+        return None if node is None else self.shas[node]
+
+    def files(self) -> Iterator[Tuple[int, str]]:
+        """(node, path) for every file, in tree order"""
+        for node in self.file_ids:
+            yield node, self.path(node)
+
+    def paths(self) -> List[str]:
+        return [self.path(node) for node in self.file_ids]
+
+    def readable(self) -> Iterator[Tuple[int, str]]:
+        """(node, path) for every file worth reading, in tree order"""
+        for node in self.file_ids:
+            if worth_reading(self.names[node], self.sizes[node]):
+                yield node, self.path(node)
+
+    def top_level(self, directories: bool) -> List[str]:
+        """Names of the root's directories (or files)"""
+        flag = 1 if directories else 0
+        return [
+            name
+            for name, node in self.children[ROOT].items()
+            if self.is_dir[node] == flag
+        ]
+
+    def with_name(self, name: str) -> List[str]:
+        """Paths of every entry with this basename"""
+        return [self.path(node) for node in self.by_name.get(name, ())]
+
+    def with_extension(self, extension: str) -> List[str]:
+        return [self.path(node) for node in self.by_extension.get(extension, ())]
+
+    def extension_counts(self) -> Dict[str, int]:
+        return {ext: len(nodes) for ext, nodes in self.by_extension.items()}
+
+
+def is_code_file(name: str) -> bool:
+    return name.endswith(CODE_EXTENSIONS) or name in MANIFESTS
+
+
+def worth_reading(name: str, size: int) -> bool:
+    """Whether to fetch (or extract) a file's content for analysis"""
+    return is_code_file(name) and size < MAX_READ_BYTES
+
+
+def extension_of(name: str) -> str:
+    """The part after the last dot, or "other" (as the statistics report it)"""
+    return name.split(".")[-1] if "." in name else "other"
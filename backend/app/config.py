@@ -5,17 +5,90 @@ from typing import Optional
 
 class Settings(BaseSettings):
     gemini_api_key: str
-    github_token: Optional[str] = ""  # Optional for public repos
+    github_token: Optional[str] = ""  # Optional; comma-separate to pool tokens
     environment: str = "development"
     frontend_url: str = "http://localhost:5173"
     backend_port: int = 8000
 
-    # Rate limiting
+    # Rate limiting (Gemini calls, shared by all agents and jobs)
     max_requests_per_minute: int = 10
+    max_tokens_per_minute: int = 250000
+    llm_max_concurrency: int = 8  # Upper bound for adaptive concurrency
+    llm_max_retries: int = 4  # Retries on 429/5xx, with jittered backoff
+
+    # Open GitHub/Gemini connections at startup (readiness waits for it)
+    warmup_enabled: bool = True
+    warmup_timeout_seconds: int = 10
+
+    # Time limits per request; unfinished levels are returned as pending
+    request_deadline_seconds: int = 300  # Also the most a request may ask for
+    llm_stage_timeout_seconds: int = 120  # Per LLM-backed pipeline stage
+
+    # Background job queue
+    job_workers: int = 4
+    job_queue_size: int = 100
+    job_retention: int = 1000  # Finished jobs kept for status lookups
+
+    # Batch generation (POST /api/v1/generate/batch)
+    batch_max_concurrency: int = 4  # Repos in flight across all batches
+    batch_max_repos: int = 500  # Per request
 
     # GitHub API
     github_api_base: str = "https://api.github.com"
     max_file_size_mb: int = 1  # Skip files larger than this
+    # "auto", "git_trees", "contents" or "archive"
+    tree_ingestion_mode: str = "auto"
+    tree_max_depth: int = 3
+    archive_auto_threshold_files: int = 500  # "auto" switches to archive above this
+    archive_max_mb: int = 200  # Abort tarball downloads larger than this
+    github_max_connections: int = 20  # Pooled connections per host
+    github_timeout_seconds: int = 30
+    github_quota_max_wait_seconds: int = 900  # Wait this long for a reset, then fail
+
+    # Conditional-request (ETag) cache for GitHub responses
+    github_cache_enabled: bool = True
+    github_cache_path: str = ".cache/github_http.sqlite3"
+    github_cache_max_mb: int = 256
+
+    # Prompt packing for code analysis
+    prompt_budget_tokens: int = 6000  # Source material per analysis prompt
+    prompt_file_max_tokens: int = 2000  # Longer files/sections are cut
+    prompt_max_summary_calls: int = 4  # Map calls for material over budget
+    source_max_files: int = 24  # Key files fetched for analysis
+
+    # Extra stack/project-type rules (JSON, same format as the built-ins)
+    detection_rules_path: Optional[str] = None
+
+    # Static analysis of fetched files (process pool, memoized by blob SHA)
+    static_analysis_workers: int = 0  # 0 = one per CPU
+    static_analysis_cache_enabled: bool = True
+    static_analysis_cache_path: str = ".cache/static_analysis.sqlite3"
+    static_analysis_cache_max_mb: int = 64
+
+    # Content-addressed cache for Gemini responses
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = ".cache/llm_responses.sqlite3"
+    llm_cache_max_mb: int = 128
+    llm_cache_memory_entries: int = 512
+    llm_cache_ttl_hours: int = 168
+
+    # Incremental regeneration from the previous run's artifacts
+    incremental_enabled: bool = True
+    artifact_store_path: str = ".cache/artifacts.sqlite3"
+    artifact_store_max_mb: int = 512
+
+    # Stored documentation versions (GET /api/v1/docs/{owner}/{repo})
+    doc_store_enabled: bool = True
+    doc_store_path: str = ".cache/docs.sqlite3"
+    doc_store_max_mb: int = 512
+    docs_max_age_seconds: int = 300  # Re-check the default branch after this
+    docs_stale_while_revalidate_seconds: int = 86400
+
+    # Observability (GET /metrics, GET /api/v1/traces)
+    metrics_enabled: bool = True
+    event_loop_lag_interval_seconds: float = 0.5
+    trace_retention: int = 200  # Recent request traces kept in memory
+    trace_log_slow_seconds: float = 30.0  # Log slower traces (0 = never)
 
     class Config:
         env_file = ".env"
@@ -1,7 +1,13 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import documentation
+from .routes import documentation, jobs, observability
 from .config import get_settings
+from .analysis.engine import get_static_analyzer
+from .mcp_servers.github_client import close_github_clients
+from .utils.metrics import monitor_event_loop
+from .utils.tracing import TracingMiddleware
+import asyncio
 import logging
 
 # Configure logging
@@ -9,14 +15,56 @@ logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 
+settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build shared resources once for the lifetime of the process
+
+    PITFALL: Constructing the orchestrator per request re-creates every
+    client and re-configures the model on the hot path
+    SOLUTION: Build one orchestrator at startup and warm its connections
+    in the background; /api/v1/ready reports 503 until that finishes
+    """
+    app.state.warmup = None
+    orchestrator = jobs.get_orchestrator()
+    jobs.get_job_manager().start()
+
+    async def warm_up():
+        if settings.warmup_enabled:
+            app.state.warmup = await orchestrator.warm_up(
+                settings.warmup_timeout_seconds
+            )
+        else:
+            app.state.warmup = {}
+
+    warmup_task = asyncio.create_task(warm_up())
+    lag_monitor = None
+    if settings.metrics_enabled:
+        lag_monitor = asyncio.create_task(
+            monitor_event_loop(settings.event_loop_lag_interval_seconds)
+        )
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        if lag_monitor is not None:
+            lag_monitor.cancel()
+        await jobs.get_job_manager().stop()
+        # Release pooled GitHub connections and analysis workers
+        await close_github_clients()
+        get_static_analyzer().close()
+
+
 app = FastAPI(
     title="Smart Documentation Agent API",
     description="Multi-agent system for generating adaptive documentation",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-settings = get_settings()
-
 # CORS configuration (CRITICAL for local development)
 app.add_middleware(
     CORSMiddleware,
@@ -24,10 +72,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
+# Root span per request; everything the request runs nests under it
+app.add_middleware(TracingMiddleware)
 
 # Include routers
 app.include_router(documentation.router)
+app.include_router(jobs.router)
+app.include_router(observability.router)
 
 
 @app.get("/")
@@ -0,0 +1,393 @@
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from .http_cache import get_http_cache
+from .quota import QuotaTracker
+from ..config import get_settings
+from ..utils import metrics, tracing
+import asyncio
+import hashlib
+import json
+import logging
+import aiohttp
+
+
+class _Reservation:
+    """Calls a budget() block reserved on one client and hasn't made yet"""
+
+    __slots__ = ("client", "left")
+
+    def __init__(self, client: "GitHubClient", calls: int):
+        self.client = client
+        self.left = calls
+
+
+# The active budget() block: pooled calls go to its token, and each call
+# made on it is taken off its reservation
+_active_budget: ContextVar[Optional[_Reservation]] = ContextVar(
+    "github_active_budget", default=None
+)
+
+
+class GitHubAPIError(Exception):
+    """Non-success response from the GitHub API"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class GitHubRateLimitError(GitHubAPIError):
+    """GitHub refused the request because the rate limit is exhausted"""
+
+
+def endpoint_name(path: str) -> str:
+    """Low-cardinality label for an API path, such as git/trees or contents"""
+    if path.startswith("http://") or path.startswith("https://"):
+        return "raw"
+    parts = path.strip("/").split("/")
+    if parts[0] != "repos" or len(parts) < 3:
+        return parts[0] or "root"
+    if len(parts) == 3:
+        return "repo"
+    if parts[3] == "git" and len(parts) > 4:
+        return f"git/{parts[4]}"
+    return parts[3]
+
+
+class GitHubClient:
+    """
+    Async GitHub REST transport shared by every request in the process
+
+    PITFALL: Synchronous clients block the event loop, and a new
+    ClientSession per call throws away keep-alive connections
+    SOLUTION: One pooled aiohttp session per event loop with bounded
+    per-host concurrency
+    """
+
+    def __init__(self, token: Optional[str] = None):
+        settings = get_settings()
+        self.token = token
+        self.api_base = settings.github_api_base.rstrip("/")
+        self.max_connections = settings.github_max_connections
+        self.timeout = settings.github_timeout_seconds
+        self.max_quota_wait = settings.github_quota_max_wait_seconds
+        self.quota = QuotaTracker()
+        self.logger = logging.getLogger(__name__)
+        self.cache = get_http_cache()
+        self._cache_identity = hashlib.sha256((token or "").encode()).hexdigest()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, recreating it if the event loop changed"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            headers = {
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+                "User-Agent": "smart-docs-agent",
+            }
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections * 2,
+                limit_per_host=self.max_connections,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            self._session = aiohttp.ClientSession(
+                headers=headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._loop = loop
+        return self._session
+
+    def _url(self, path: str) -> str:
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.api_base}/{path.lstrip('/')}"
+
+    async def get_json(
+        self, path: str, params: Optional[Dict] = None, use_cache: bool = True
+    ) -> Any:
+        """GET an API path and decode the JSON body"""
+        return json.loads(await self._get(path, params, use_cache=use_cache))
+
+    async def get_text(
+        self, path: str, params: Optional[Dict] = None, accept: Optional[str] = None
+    ) -> str:
+        """GET an API path or absolute URL and return the body as text"""
+        return await self._get(path, params, accept)
+
+    async def _get(
+        self,
+        path: str,
+        params: Optional[Dict] = None,
+        accept: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> str:
+        """GET with conditional-request caching when the cache is enabled"""
+        session = self._get_session()
+        url = self._url(path)
+        headers = {"Accept": accept} if accept else {}
+
+        cache = self.cache if use_cache else None
+        cache_key, cached = None, None
+        if cache is not None:
+            query = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+            cache_key = cache.key(self._cache_identity, f"{url}?{query}", accept or "")
+            cached = await cache.lookup(cache_key)
+            headers.update(cache.validator_headers(cached))
+
+        await self.wait_for_quota()
+        with self._traced(path) as span:
+            async with session.get(url, params=params, headers=headers) as response:
+                span.set(status=response.status)
+                self.quota.update(response.headers)
+                self._spend_reservation()
+                if response.status == 304 and cached is not None:
+                    cache.record(hit=True)
+                    return cached["body"]
+
+                await self._raise_for_status(response)
+                body = await response.text()
+
+        if cache is not None:
+            cache.record(hit=False)
+            await cache.store_response(
+                cache_key,
+                body,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
+        return body
+
+    @asynccontextmanager
+    async def stream(
+        self, path: str, params: Optional[Dict] = None
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """GET a large body (e.g. an archive) without buffering it in memory"""
+        session = self._get_session()
+        # Only bound the idle time between chunks, not the whole transfer
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+        # PITFALL: The sock_read timer outlives the body, so a pooled
+        # connection failed the next request that reused it once the timer
+        # fired ("Timeout on reading data from socket")
+        # SOLUTION: Don't keep streamed connections alive
+        headers = {"Connection": "close"}
+        await self.wait_for_quota()
+        with self._traced(path) as span:
+            async with session.get(
+                self._url(path), params=params, headers=headers, timeout=timeout
+            ) as response:
+                span.set(status=response.status)
+                self.quota.update(response.headers)
+                self._spend_reservation()
+                await self._raise_for_status(response)
+                yield response
+
+    @contextmanager
+    def _traced(self, path: str) -> Iterator[tracing.Span]:
+        """A span and request metrics for one API call (set status on it)"""
+        endpoint = endpoint_name(path)
+        with tracing.span("github.request", endpoint=endpoint) as span:
+            try:
+                yield span
+            finally:
+                status = str(span.attributes.get("status", "error"))
+                metrics.GITHUB_REQUESTS.inc(endpoint=endpoint, status=status)
+                metrics.GITHUB_DURATION.observe(span.elapsed(), endpoint=endpoint)
+
+    async def _raise_for_status(self, response: aiohttp.ClientResponse):
+        if response.status < 400:
+            return
+
+        try:
+            message = (await response.json(content_type=None)).get("message", "")
+        except Exception:
+            message = response.reason or ""
+
+        if response.status == 429 or (
+            response.status == 403
+            and response.headers.get("X-RateLimit-Remaining") == "0"
+        ):
+            reset_at = response.headers.get("X-RateLimit-Reset")
+            self.quota.exhaust(float(reset_at) if reset_at else None)
+            raise GitHubRateLimitError(response.status, message)
+        raise GitHubAPIError(
+            response.status, f"GitHub API error {response.status}: {message}"
+        )
+
+    async def wait_for_quota(self, calls: int = 1, reserved: bool = False):
+        """
+        Sleep until the window resets if it can't cover `calls` more calls
+
+        PITFALL: Failing a job because the hourly quota is nearly spent,
+        although it refills within minutes
+        SOLUTION: Wait for the reset instead, up to max_quota_wait seconds;
+        only longer waits fail. reserved=True also counts calls other
+        fetches have reserved.
+        """
+        left = self.quota.available() if reserved else self.quota.calls_left()
+        if left is None or left >= calls:
+            return
+        wait = self.quota.seconds_until_reset()
+        if wait <= 0:
+            return
+        if wait > self.max_quota_wait:
+            raise GitHubRateLimitError(
+                403, f"GitHub quota exhausted, resets in {int(wait)}s"
+            )
+        self.logger.warning(
+            f"GitHub quota low ({left} left, {calls} needed), "
+            f"waiting {int(wait)}s for reset"
+        )
+        await asyncio.sleep(wait + 1)
+
+    @asynccontextmanager
+    async def budget(self, calls: int):
+        """
+        Reserve quota for a multi-call fetch, waiting for a reset if needed
+
+        PITFALL: Calls made under the budget lower X-RateLimit-Remaining
+        while still being reserved, so concurrent fetches near the limit
+        counted them twice and waited for a reset they didn't need
+        SOLUTION: Each call made inside the block (and tasks it starts)
+        releases one reserved call once its response is in
+        """
+        await self.wait_for_quota(calls, reserved=True)
+        reservation = _Reservation(self, calls)
+        self.quota.reserved += calls
+        token = _active_budget.set(reservation)
+        try:
+            yield
+        finally:
+            _active_budget.reset(token)
+            self.quota.reserved -= reservation.left
+
+    def _spend_reservation(self):
+        """A call just counted against remaining; stop reserving it as well"""
+        reservation = _active_budget.get()
+        if reservation is not None and reservation.client is self and reservation.left:
+            reservation.left -= 1
+            self.quota.reserved -= 1
+
+    def rate_limit_remaining(self) -> Optional[int]:
+        return self.quota.calls_left()
+
+    async def warm_up(self):
+        """Resolve DNS and open a pooled TLS connection before real traffic"""
+        # /rate_limit doesn't count against the quota
+        await self.get_json("/rate_limit", use_cache=False)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+class GitHubClientPool:
+    """
+    Spreads requests over several tokens by remaining quota
+
+    Same interface as GitHubClient. Each call goes to the token with the
+    most unreserved calls left; the ETag cache is shared across the pool.
+    """
+
+    def __init__(self, clients: List[GitHubClient]):
+        self.clients = clients
+        self.logger = logging.getLogger(__name__)
+        identity = hashlib.sha256(
+            ",".join(sorted(c.token or "" for c in clients)).encode()
+        ).hexdigest()
+        for client in clients:
+            client._cache_identity = identity
+
+    def _pick(self) -> GitHubClient:
+        reservation = _active_budget.get()
+        if reservation is not None and reservation.client in self.clients:
+            return reservation.client
+
+        def headroom(client: GitHubClient) -> float:
+            available = client.quota.available()
+            # Unknown quota: try it, that's how we learn it
+            return float("inf") if available is None else available
+
+        best = max(self.clients, key=headroom)
+        if headroom(best) <= 0:
+            # Everything is spent: the token that resets first waits least
+            best = min(self.clients, key=lambda c: c.quota.seconds_until_reset())
+        return best
+
+    async def get_json(
+        self, path: str, params: Optional[Dict] = None, use_cache: bool = True
+    ) -> Any:
+        return await self._pick().get_json(path, params, use_cache=use_cache)
+
+    async def get_text(
+        self, path: str, params: Optional[Dict] = None, accept: Optional[str] = None
+    ) -> str:
+        return await self._pick().get_text(path, params, accept)
+
+    @asynccontextmanager
+    async def stream(
+        self, path: str, params: Optional[Dict] = None
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        async with self._pick().stream(path, params) as response:
+            yield response
+
+    @asynccontextmanager
+    async def budget(self, calls: int):
+        """
+        Reserve `calls` on the token with the most headroom
+
+        PITFALL: The reservation lowers that token's headroom, so picking
+        per call sent the budgeted calls to another token
+        SOLUTION: Calls made inside the block (and tasks it starts) stay on
+        the reserved token
+        """
+        async with self._pick().budget(calls):
+            yield
+
+    def rate_limit_remaining(self) -> Optional[int]:
+        known = [c.rate_limit_remaining() for c in self.clients]
+        known = [left for left in known if left is not None]
+        return sum(known) if known else None
+
+    def quota(self) -> List[Dict]:
+        return [client.quota.snapshot() for client in self.clients]
+
+    async def warm_up(self):
+        # Seeds every token's quota from the /rate_limit headers
+        await asyncio.gather(*(client.warm_up() for client in self.clients))
+
+    async def close(self):
+        for client in self.clients:
+            await client.close()
+
+
+_clients: Dict[Optional[str], GitHubClientPool] = {}
+
+
+def get_github_client(token: Optional[str] = None) -> GitHubClientPool:
+    """
+    Return the process-wide client for a token
+
+    token may list several comma-separated tokens to pool their quotas.
+    """
+    if token not in _clients:
+        tokens = [t.strip() for t in (token or "").split(",") if t.strip()]
+        _clients[token] = GitHubClientPool(
+            [GitHubClient(t) for t in tokens] or [GitHubClient(None)]
+        )
+    return _clients[token]
+
+
+async def close_github_clients():
+    """Close every pooled client session (call on application shutdown)"""
+    for client in _clients.values():
+        await client.close()
@@ -1,138 +1,562 @@
-from github import Github, RateLimitExceededException
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+from .github_client import GitHubAPIError, GitHubRateLimitError, get_github_client
+from .http_cache import start_request_stats
+from ..analysis.tree_index import TreeIndex, is_code_file, worth_reading
+from ..config import get_settings
+import asyncio
+import hashlib
+import io
 import logging
-import aiohttp
+import tarfile
+
+INGESTION_MODES = ("auto", "git_trees", "contents", "archive")
+RATE_LIMIT_MESSAGE = (
+    "GitHub API rate limit exceeded. Please try again later or add a GitHub token."
+)
+COMPARE_MAX_FILES = 300  # The compare API lists at most this many files
 
 
 class GitHubMCP:
     """MCP Server for GitHub API interactions"""
 
     def __init__(self, token: Optional[str] = None):
-        self.github = Github(token) if token else Github()
+        settings = get_settings()
+        self.client = get_github_client(token)
+        self.ingestion_mode = settings.tree_ingestion_mode
+        self.max_depth = settings.tree_max_depth
+        self.archive_threshold = settings.archive_auto_threshold_files
+        self.archive_max_bytes = settings.archive_max_mb * 1024 * 1024
         self.logger = logging.getLogger(__name__)
 
-    async def fetch_repo_structure(self, repo_url: str) -> Dict:
+    async def resolve_head(self, repo_url: str) -> Dict:
+        """
+        Resolve the default branch of a repo to its current commit SHA
+
+        Both calls go through the ETag cache, so an unchanged repo costs
+        two free 304s.
+        """
+        owner, repo_name = parse_repo_url(repo_url)
+        repo = await self.client.get_json(f"/repos/{owner}/{repo_name}")
+        branch = repo["default_branch"]
+        sha = await self.client.get_text(
+            f"/repos/{owner}/{repo_name}/commits/{quote(branch)}",
+            accept="application/vnd.github.sha",
+        )
+        return {
+            "repo_url": normalize_repo_url(repo_url),
+            "owner": owner,
+            "repo": repo_name,
+            "default_branch": branch,
+            "sha": sha.strip(),
+        }
+
+    async def fetch_repo_structure(
+        self,
+        repo_url: str,
+        ingestion_mode: Optional[str] = None,
+        ref: Optional[str] = None,
+    ) -> Dict:
         """
         Fetch repository structure with error handling
 
         PITFALL: GitHub API rate limits (60/hour without auth, 5000/hour with auth)
         SOLUTION: Implement caching and selective file fetching
         """
+        cache_stats = start_request_stats()
+        repo_data, readme_content = await asyncio.gather(
+            self.fetch_repo_tree(repo_url, ingestion_mode, ref),
+            self.fetch_readme(repo_url, ref),
+        )
+        repo_data["readme"] = readme_content
+        repo_data["http_cache"] = cache_stats
+        return repo_data
+
+    async def fetch_repo_tree(
+        self,
+        repo_url: str,
+        ingestion_mode: Optional[str] = None,
+        ref: Optional[str] = None,
+    ) -> Dict:
+        """Fetch repo metadata and file tree (everything except the README)"""
+        mode = ingestion_mode or self.ingestion_mode
+        if mode not in INGESTION_MODES:
+            raise ValueError(f"Unknown ingestion mode: {mode}")
+
         try:
             # Extract owner/repo from URL
-            parts = repo_url.rstrip("/").split("/")
-            owner, repo_name = parts[-2], parts[-1]
+            owner, repo_name = parse_repo_url(repo_url)
 
-            repo = self.github.get_repo(f"{owner}/{repo_name}")
+            repo = await self.client.get_json(f"/repos/{owner}/{repo_name}")
 
-            # Check rate limit before proceeding
-            rate_limit = self.github.get_rate_limit()
-            if rate_limit.core.remaining < 10:
-                raise Exception(
-                    f"GitHub API rate limit low: {rate_limit.core.remaining} remaining"
+            # Fetch file tree (limit depth to avoid huge repos)
+            # Pin to the resolved commit when given so all reads see one snapshot
+            ref = ref or repo["default_branch"]
+            if mode == "contents":
+                tree_task = self._get_tree_recursive(
+                    owner, repo_name, ref, max_depth=self.max_depth
+                )
+            elif mode == "archive":
+                tree_task = self._get_tree_from_archive(
+                    owner, repo_name, ref, max_depth=self.max_depth
+                )
+            else:
+                tree_task = self._get_tree_from_git_trees(
+                    owner, repo_name, ref, max_depth=self.max_depth
                 )
 
-            # Fetch file tree (limit depth to avoid huge repos)
-            contents = self._get_tree_recursive(repo, max_depth=3)
+            # Waits for the quota window to reset rather than failing
+            async with self.client.budget(self.estimate_calls(mode, repo)):
+                tree = await tree_task
+
+            file_contents: Dict[str, str] = {}
+            if mode == "archive":
+                contents, file_contents = tree
+            else:
+                contents = tree
 
-            # Fetch README content if available
-            readme_content = await self._fetch_readme(repo)
+            # Indexed once here; analysis queries the index, not the dicts
+            index = await asyncio.to_thread(TreeIndex.from_contents, contents)
+
+            # Large trees: one tarball beats hundreds of per-file fetches
+            readable = sum(1 for _ in index.readable())
+            if mode == "auto" and readable > self.archive_threshold:
+                self.logger.info("Large tree detected, switching to archive ingestion")
+                mode = "archive"
+                try:
+                    _, file_contents = await self._get_tree_from_archive(
+                        owner, repo_name, ref, max_depth=self.max_depth
+                    )
+                except GitHubRateLimitError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"Archive ingestion failed: {str(e)}")
 
             return {
-                "name": repo.name,
-                "description": repo.description or "No description available",
-                "language": repo.language or "Unknown",
-                "stars": repo.stargazers_count,
+                "name": repo["name"],
+                "description": repo.get("description") or "No description available",
+                "language": repo.get("language") or "Unknown",
+                "stars": repo.get("stargazers_count", 0),
+                "ref": ref,
                 "contents": contents,
-                "readme": readme_content,
-                "rate_limit_remaining": rate_limit.core.remaining,
+                "index": index,
+                "file_contents": file_contents,
+                "ingestion_mode": mode,
+                "rate_limit_remaining": self.client.rate_limit_remaining(),
             }
 
-        except RateLimitExceededException:
+        except GitHubRateLimitError:
             self.logger.error("GitHub API rate limit exceeded")
-            raise Exception(
-                "GitHub API rate limit exceeded. Please try again later or add a GitHub token."
-            )
+            raise Exception(RATE_LIMIT_MESSAGE)
         except Exception as e:
             self.logger.error(f"Error fetching repo: {str(e)}")
             raise
 
-    def _get_tree_recursive(
-        self, repo, path="", max_depth=3, current_depth=0
+    def estimate_calls(self, mode: str, repo: Dict) -> int:
+        """
+        Rough number of API calls a tree fetch will make
+
+        Used to reserve quota up front. Git Trees and archives take one or
+        two calls; the contents API takes one per directory, which we guess
+        from the repo size (in KB) that the metadata call returns.
+        """
+        if mode == "contents":
+            return min(200, max(5, repo.get("size", 0) // 50))
+        if mode == "archive":
+            return 1
+        # Git Trees, plus a possible archive download in auto mode
+        return 2
+
+    async def fetch_readme(
+        self, repo_url: str, ref: Optional[str] = None
+    ) -> Optional[str]:
+        """Fetch the README for a repo, or None if it has none"""
+        owner, repo_name = parse_repo_url(repo_url)
+        try:
+            return await self._fetch_readme(owner, repo_name, ref)
+        except GitHubRateLimitError:
+            self.logger.error("GitHub API rate limit exceeded")
+            raise Exception(RATE_LIMIT_MESSAGE)
+
+    async def fetch_files(
+        self, repo_url: str, paths: List[str], ref: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Fetch several files concurrently, skipping any that fail
+
+        Goes through the contents API (raw media type) rather than
+        download_url so repeat runs are served by the ETag cache.
+        """
+        owner, repo_name = parse_repo_url(repo_url)
+
+        async def fetch(path: str):
+            try:
+                return path, await self.client.get_text(
+                    f"/repos/{owner}/{repo_name}/contents/{quote(path)}",
+                    params={"ref": ref} if ref else None,
+                    accept="application/vnd.github.raw",
+                )
+            except GitHubRateLimitError:
+                raise
+            except Exception as e:
+                self.logger.info(f"Skipping {path}: {str(e)}")
+                return path, None
+
+        try:
+            async with self.client.budget(len(paths)):
+                fetched = await asyncio.gather(*(fetch(path) for path in paths))
+        except GitHubRateLimitError:
+            self.logger.error("GitHub API rate limit exceeded")
+            raise Exception(RATE_LIMIT_MESSAGE)
+        return {path: text for path, text in fetched if text is not None}
+
+    async def compare_commits(
+        self, repo_url: str, base: str, head: str
+    ) -> Optional[List[Dict]]:
+        """
+        Files changed between two commits, or None if the diff is unusable
+
+        PITFALL: Re-fetching and re-analyzing a whole repo because one
+        commit landed
+        SOLUTION: One compare call tells us which files changed. None means
+        "assume everything changed" (base no longer reachable after a force
+        push, or more files than the compare API lists).
+        """
+        owner, repo_name = parse_repo_url(repo_url)
+        try:
+            data = await self.client.get_json(
+                f"/repos/{owner}/{repo_name}/compare/{base}...{head}"
+            )
+        except GitHubAPIError as e:
+            self.logger.warning(f"Could not compare {base}...{head}: {e}")
+            return None
+
+        files = data.get("files") or []
+        if data.get("status") not in ("ahead", "identical"):
+            return None
+        if len(files) >= COMPARE_MAX_FILES:
+            return None
+        return [
+            {
+                "filename": f["filename"],
+                "status": f.get("status"),
+                "previous_filename": f.get("previous_filename"),
+            }
+            for f in files
+        ]
+
+    def is_readme(self, path: str) -> bool:
+        return "/" not in path and path.lower().startswith("readme")
+
+    def affects_documentation(self, change: Dict) -> bool:
+        """
+        Whether a changed file can alter the tree, README or analysis
+
+        Edits to files we never look at (non-code files, or anything below
+        max_depth) are irrelevant. Adds, removes and renames within depth
+        can change the directory layout, so they always count.
+        """
+        paths = [change["filename"]]
+        if change.get("previous_filename"):
+            paths.append(change["previous_filename"])
+
+        for path in paths:
+            if self.is_readme(path):
+                return True
+            if path.count("/") >= self.max_depth:
+                continue
+            if change.get("status") != "modified":
+                return True
+            if self._is_code_file(path.rsplit("/", 1)[-1]):
+                return True
+        return False
+
+    async def _get_tree_recursive(
+        self,
+        owner: str,
+        repo_name: str,
+        ref: str,
+        path="",
+        max_depth=3,
+        current_depth=0,
     ) -> List[Dict]:
         """
         Recursively get file tree with depth limit
 
         PITFALL: Large repos can cause timeouts
         SOLUTION: Limit depth and skip binary/large files
+
+        Every listing is read at ref, so a push during the walk can't mix
+        two commits into one tree.
         """
         if current_depth >= max_depth:
             return []
 
         files = []
         try:
-            contents = repo.get_contents(path)
+            contents = await self.client.get_json(
+                f"/repos/{owner}/{repo_name}/contents/{quote(path)}",
+                params={"ref": ref},
+            )
+            directories = [item for item in contents if item["type"] == "dir"]
+            children = await asyncio.gather(
+                *(
+                    self._get_tree_recursive(
+                        owner,
+                        repo_name,
+                        ref,
+                        item["path"],
+                        max_depth,
+                        current_depth + 1,
+                    )
+                    for item in directories
+                )
+            )
+            children_by_path = {
+                item["path"]: child for item, child in zip(directories, children)
+            }
+
             for content in contents:
-                if content.type == "dir":
+                if content["type"] == "dir":
                     files.append(
                         {
-                            "name": content.name,
-                            "path": content.path,
+                            "name": content["name"],
+                            "path": content["path"],
                             "type": "directory",
-                            "children": self._get_tree_recursive(
-                                repo, content.path, max_depth, current_depth + 1
-                            ),
+                            "children": children_by_path[content["path"]],
                         }
                     )
                 else:
-                    # Skip non-code files and large files
-                    if self._is_code_file(content.name) and content.size < 1_000_000:
-                        files.append(
-                            {
-                                "name": content.name,
-                                "path": content.path,
-                                "type": "file",
-                                "size": content.size,
-                                "download_url": content.download_url,
-                            }
-                        )
+                    # Every file is listed (manifests and lockfiles identify
+                    # the stack); which ones to read is decided at fetch time
+                    files.append(
+                        {
+                            "name": content["name"],
+                            "path": content["path"],
+                            "type": "file",
+                            "size": content["size"],
+                            # Blob SHA: what the index digest (and so the
+                            # stage memo keys) sees of a same-size edit
+                            "sha": content["sha"],
+                            "download_url": content["download_url"],
+                        }
+                    )
         except Exception as e:
             self.logger.warning(f"Error accessing path {path}: {str(e)}")
 
         return files
 
-    def _is_code_file(self, filename: str) -> bool:
-        """Filter for code files only"""
-        code_extensions = {
-            ".py",
-            ".js",
-            ".jsx",
-            ".ts",
-            ".tsx",
-            ".java",
-            ".cpp",
-            ".c",
-            ".h",
-            ".go",
-            ".rs",
-            ".rb",
-            ".php",
-            ".swift",
-            ".kt",
-            ".md",
-            ".json",
-            ".yaml",
-            ".yml",
-            ".toml",
+    async def _get_tree_from_git_trees(
+        self, owner: str, repo_name: str, ref: str, max_depth=3
+    ) -> List[Dict]:
+        """
+        Get file tree with a single recursive Git Trees call
+
+        PITFALL: One contents call per directory burns the rate limit
+        SOLUTION: Fetch the whole tree at once and apply the depth limit locally
+        """
+        entries = await self._fetch_tree_entries(owner, repo_name, ref, "", max_depth)
+        return self._build_nested_tree(entries, owner, repo_name, ref, max_depth)
+
+    async def _fetch_tree_entries(
+        self, owner: str, repo_name: str, tree_sha: str, prefix: str, max_depth: int
+    ) -> List[Dict]:
+        """
+        Fetch flat tree entries below prefix, falling back on truncation
+
+        PITFALL: GitHub truncates recursive trees above ~100k entries
+        SOLUTION: List the truncated level only and fetch each subtree separately
+        """
+        depth = prefix.count("/") if prefix else 0
+        if depth >= max_depth:
+            return []
+
+        tree_path = f"/repos/{owner}/{repo_name}/git/trees/{quote(tree_sha)}"
+        try:
+            tree = await self.client.get_json(tree_path, params={"recursive": "1"})
+            if not tree.get("truncated"):
+                return [
+                    self._tree_entry(element, prefix)
+                    for element in tree["tree"]
+                    if (prefix + element["path"]).count("/") < max_depth
+                ]
+
+            self.logger.warning(
+                f"Git tree for '{prefix or '/'}' truncated, fetching subtrees"
+            )
+            tree = await self.client.get_json(tree_path)
+        except GitHubRateLimitError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"Error accessing tree {prefix or '/'}: {str(e)}")
+            return []
+
+        entries = [self._tree_entry(element, prefix) for element in tree["tree"]]
+        subtrees = await asyncio.gather(
+            *(
+                self._fetch_tree_entries(
+                    owner, repo_name, entry["sha"], entry["path"] + "/", max_depth
+                )
+                for entry in entries
+                if entry["type"] == "tree"
+            )
+        )
+        for subtree in subtrees:
+            entries.extend(subtree)
+        return entries
+
+    def _tree_entry(self, element: Dict, prefix: str) -> Dict:
+        """Normalize a Git tree element to a path relative to the repo root"""
+        return {
+            "path": prefix + element["path"],
+            "type": element["type"],
+            "size": element.get("size") or 0,
+            "sha": element["sha"],
         }
-        return any(filename.endswith(ext) for ext in code_extensions)
 
-    async def _fetch_readme(self, repo) -> Optional[str]:
+    def _build_nested_tree(
+        self, entries: List[Dict], owner: str, repo_name: str, ref: str, max_depth=3
+    ) -> List[Dict]:
+        """Rebuild the nested contents structure from flat tree entries"""
+        root: List[Dict] = []
+        directories = {"": root}
+
+        # Parents sort before their children, so each directory exists first
+        for entry in sorted(entries, key=lambda e: e["path"].count("/")):
+            path = entry["path"]
+            if path.count("/") >= max_depth:
+                continue
+
+            parent, _, name = path.rpartition("/")
+            siblings = directories.get(parent)
+            if siblings is None:
+                continue
+
+            if entry["type"] == "tree":
+                children: List[Dict] = []
+                directories[path] = children
+                siblings.append(
+                    {
+                        "name": name,
+                        "path": path,
+                        "type": "directory",
+                        "children": children,
+                    }
+                )
+            elif entry["type"] == "blob":
+                siblings.append(
+                    {
+                        "name": name,
+                        "path": path,
+                        "type": "file",
+                        "size": entry["size"],
+                        "sha": entry["sha"],
+                        "download_url": (
+                            f"https://raw.githubusercontent.com/{owner}/"
+                            f"{repo_name}/{quote(ref)}/{quote(path)}"
+                        ),
+                    }
+                )
+
+        return root
+
+    async def _get_tree_from_archive(
+        self, owner: str, repo_name: str, ref: str, max_depth=3
+    ) -> Tuple[List[Dict], Dict[str, str]]:
+        """
+        Get file tree and file contents from a single tarball download
+
+        PITFALL: Buffering a whole archive in memory doesn't scale
+        SOLUTION: Stream-extract in a worker thread, listing non-code and
+        oversized members without reading their data
+        """
+        loop = asyncio.get_running_loop()
+        async with self.client.stream(
+            f"/repos/{owner}/{repo_name}/tarball/{quote(ref)}"
+        ) as response:
+            stream = _ResponseStream(response.content, loop, self.archive_max_bytes)
+            entries, file_contents = await asyncio.to_thread(
+                self._extract_archive, stream, max_depth
+            )
+
+        contents = self._build_nested_tree(entries, owner, repo_name, ref, max_depth)
+        return contents, file_contents
+
+    def _extract_archive(
+        self, stream: io.RawIOBase, max_depth: int
+    ) -> Tuple[List[Dict], Dict[str, str]]:
+        """Read tree entries and code file contents from a streamed tarball"""
+        entries: List[Dict] = []
+        file_contents: Dict[str, str] = {}
+        directories = set()
+
+        with tarfile.open(fileobj=io.BufferedReader(stream), mode="r|gz") as archive:
+            for member in archive:
+                # Members are prefixed with a single "<owner>-<repo>-<sha>/" folder
+                _, _, path = member.name.partition("/")
+                path = path.rstrip("/")
+                if not path or path.count("/") >= max_depth:
+                    continue
+
+                # Parent directories aren't guaranteed to precede their files
+                parent = path.rpartition("/")[0]
+                while parent and parent not in directories:
+                    directories.add(parent)
+                    entries.append(
+                        {"path": parent, "type": "tree", "size": 0, "sha": ""}
+                    )
+                    parent = parent.rpartition("/")[0]
+
+                if member.isdir():
+                    if path not in directories:
+                        directories.add(path)
+                        entries.append(
+                            {"path": path, "type": "tree", "size": 0, "sha": ""}
+                        )
+                    continue
+
+                if not member.isfile():
+                    continue
+
+                # List every file, but only read the ones analysis can use
+                name = path.rpartition("/")[2]
+                if not worth_reading(name, member.size):
+                    entries.append(
+                        {"path": path, "type": "blob", "size": member.size, "sha": None}
+                    )
+                    continue
+
+                data = archive.extractfile(member).read()
+                entries.append(
+                    {
+                        "path": path,
+                        "type": "blob",
+                        "size": member.size,
+                        "sha": _git_blob_sha(data),
+                    }
+                )
+                file_contents[path] = data.decode("utf-8", errors="replace")
+
+        entries.sort(key=lambda e: e["path"])
+        return entries, file_contents
+
+    def _is_code_file(self, filename: str) -> bool:
+        """Filter for code files (and manifests) worth reading"""
+        return is_code_file(filename)
+
+    async def _fetch_readme(
+        self, owner: str, repo_name: str, ref: Optional[str] = None
+    ) -> Optional[str]:
         """Fetch README content if it exists"""
         try:
-            readme = repo.get_readme()
-            # Decode content (it's base64 encoded)
-            return readme.decoded_content.decode("utf-8")
+            # The raw media type returns the decoded file instead of base64 JSON
+            return await self.client.get_text(
+                f"/repos/{owner}/{repo_name}/readme",
+                params={"ref": ref} if ref else None,
+                accept="application/vnd.github.raw",
+            )
+        except GitHubRateLimitError:
+            raise
         except Exception as e:
             self.logger.info(f"No README found or error fetching: {str(e)}")
             return None
@@ -144,9 +568,58 @@ class GitHubMCP:
         PITFALL: Binary files or extremely large files
         SOLUTION: Check content type and size before fetching
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.get(download_url) as response:
-                if response.status == 200:
-                    return await response.text()
-                else:
-                    raise Exception(f"Failed to fetch file: {response.status}")
+        try:
+            return await self.client.get_text(download_url)
+        except GitHubAPIError as e:
+            raise Exception(f"Failed to fetch file: {e.status}")
+
+
+def parse_repo_url(repo_url: str) -> Tuple[str, str]:
+    """Extract (owner, repo) from a GitHub URL"""
+    path = repo_url.split("?", 1)[0].split("#", 1)[0].rstrip("/")
+    parts = path.split("/")
+    repo_name = parts[-1]
+    if repo_name.endswith(".git"):
+        repo_name = repo_name[: -len(".git")]
+    return parts[-2], repo_name
+
+
+def normalize_repo_url(repo_url: str) -> str:
+    """Canonical form used to recognise the same repo across requests"""
+    owner, repo_name = parse_repo_url(repo_url)
+    return f"https://github.com/{owner.lower()}/{repo_name.lower()}"
+
+
+def _git_blob_sha(data: bytes) -> str:
+    """Same SHA GitHub reports for a blob, so archive files match tree entries"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class _ResponseStream(io.RawIOBase):
+    """
+    Blocking file object over an aiohttp body, for use from a worker thread
+
+    Each read hands the chunk request back to the event loop, so the
+    archive is never held in memory as a whole.
+    """
+
+    def __init__(self, content, loop: asyncio.AbstractEventLoop, max_bytes: int):
+        self.content = content
+        self.loop = loop
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = asyncio.run_coroutine_threadsafe(
+            self.content.read(len(buffer)), self.loop
+        ).result()
+        self.bytes_read += len(data)
+        if self.bytes_read > self.max_bytes:
+            raise Exception(
+                f"Repository archive exceeds {self.max_bytes // (1024 * 1024)} MB"
+            )
+        buffer[: len(data)] = data
+        return len(data)
@@ -0,0 +1,91 @@
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Optional
+from ..config import get_settings
+from ..utils.disk_cache import DiskCache
+from ..utils.metrics import record_cache_lookup
+import asyncio
+import hashlib
+import json
+
+# Hit/miss counters for the request currently being served
+_request_stats: ContextVar[Optional[Dict]] = ContextVar(
+    "github_cache_stats", default=None
+)
+
+
+class ConditionalRequestCache:
+    """
+    Persistent ETag / Last-Modified cache for GitHub GET responses
+
+    PITFALL: Refetching unchanged repo metadata, trees and READMEs burns
+    the hourly rate limit
+    SOLUTION: Replay validators as If-None-Match / If-Modified-Since;
+    GitHub answers 304 for unchanged resources and 304s are free
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.store = DiskCache(path, max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, identity: str, url: str, accept: str) -> str:
+        """Cache key scoped to the caller so private responses don't leak"""
+        return hashlib.sha256(f"{identity}\n{url}\n{accept}".encode()).hexdigest()
+
+    async def lookup(self, key: str) -> Optional[Dict]:
+        raw = await asyncio.to_thread(self.store.get, key)
+        return json.loads(raw) if raw is not None else None
+
+    async def store_response(
+        self, key: str, body: str, etag: Optional[str], last_modified: Optional[str]
+    ):
+        """Keep a response body only if GitHub gave us a validator for it"""
+        if not etag and not last_modified:
+            return
+        entry = {"etag": etag, "last_modified": last_modified, "body": body}
+        await asyncio.to_thread(self.store.set, key, json.dumps(entry).encode())
+
+    def validator_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record(self, hit: bool):
+        record_cache_lookup("github_http", hit)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["hits" if hit else "misses"] += 1
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size_bytes": self.store.total_bytes(),
+        }
+
+
+def start_request_stats() -> Dict:
+    """Start counting cache hits/misses for the current request context"""
+    stats = {"hits": 0, "misses": 0}
+    _request_stats.set(stats)
+    return stats
+
+
+@lru_cache()
+def get_http_cache() -> Optional[ConditionalRequestCache]:
+    settings = get_settings()
+    if not settings.github_cache_enabled:
+        return None
+    return ConditionalRequestCache(
+        settings.github_cache_path, settings.github_cache_max_mb * 1024 * 1024
+    )
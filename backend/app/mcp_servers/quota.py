@@ -0,0 +1,74 @@
+from typing import Dict, Mapping, Optional
+import time
+
+
+class QuotaTracker:
+    """
+    Rate-limit state for one GitHub token, learned from response headers
+
+    PITFALL: Asking /rate_limit before every fetch costs a round trip and
+    is stale by the time the fetch runs
+    SOLUTION: Every response already carries X-RateLimit-* headers; keep
+    the latest values and let callers reserve calls against them
+    """
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.reserved = 0
+
+    def update(self, headers: Mapping[str, str]):
+        # Search and GraphQL have their own budgets
+        if headers.get("X-RateLimit-Resource", "core") != "core":
+            return
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_at = float(headers["X-RateLimit-Reset"])
+            limit = int(headers.get("X-RateLimit-Limit", remaining))
+        except (KeyError, ValueError):
+            return
+
+        # Responses can arrive out of order; within one window the lowest
+        # count is the freshest
+        if self.reset_at == reset_at and self.remaining is not None:
+            remaining = min(remaining, self.remaining)
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = reset_at
+
+    def exhaust(self, reset_at: Optional[float] = None):
+        """Record a rate-limit rejection"""
+        self.remaining = 0
+        if reset_at:
+            self.reset_at = reset_at
+
+    def _current(self) -> Optional[int]:
+        if self.remaining is None:
+            return None
+        if self.reset_at is not None and time.time() >= self.reset_at:
+            # The window rolled over since we last heard
+            return self.limit
+        return self.remaining
+
+    def calls_left(self) -> Optional[int]:
+        """Calls left in this window, or None if no response was seen yet"""
+        return self._current()
+
+    def available(self) -> Optional[int]:
+        """Calls left that nobody has reserved yet (None if unknown)"""
+        current = self._current()
+        return None if current is None else current - self.reserved
+
+    def seconds_until_reset(self) -> float:
+        if self.reset_at is None:
+            return 0.0
+        return max(0.0, self.reset_at - time.time())
+
+    def snapshot(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "remaining": self.calls_left(),
+            "reserved": self.reserved,
+            "reset_in_seconds": round(self.seconds_until_reset()),
+        }
@@ -1,10 +1,71 @@
 from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+Level = Literal["beginner", "intermediate", "advanced"]
 
 
 class DocumentationRequest(BaseModel):
     repo_url: str = Field(..., description="GitHub repository URL")
+    ingestion_mode: Optional[
+        Literal["auto", "git_trees", "contents", "archive"]
+    ] = Field(
+        None, description="How to fetch the repository (defaults to server setting)"
+    )
+    bypass_cache: bool = Field(
+        False, description="Regenerate instead of serving cached LLM responses"
+    )
+    levels: Optional[List[Level]] = Field(
+        None, description="Documentation levels to generate (default: all three)"
+    )
+    metadata_fields: Optional[List[str]] = Field(
+        None,
+        description='Metadata to return, e.g. ["commit_sha", "analysis.statistics"]'
+        " (default: all)",
+    )
+    deadline_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Return the levels finished by then, the rest as pending"
+        " (default and maximum: the server's limit)",
+    )
 
     class Config:
         json_schema_extra = {
             "example": {"repo_url": "https://github.com/username/repo-name"}
         }
+
+
+class BatchDocumentationRequest(BaseModel):
+    repo_urls: List[str] = Field(
+        ..., min_length=1, description="GitHub repository URLs to document"
+    )
+    ingestion_mode: Optional[
+        Literal["auto", "git_trees", "contents", "archive"]
+    ] = Field(None, description="How to fetch the repositories")
+    bypass_cache: bool = Field(
+        False, description="Regenerate instead of serving cached LLM responses"
+    )
+    levels: Optional[List[Level]] = Field(
+        None, description="Documentation levels to generate (default: all three)"
+    )
+    metadata_fields: Optional[List[str]] = Field(
+        None,
+        description='Metadata to return, e.g. ["commit_sha", "analysis.statistics"]'
+        " (default: all)",
+    )
+    deadline_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Per repository: return the levels finished by then, the"
+        " rest as pending (default and maximum: the server's limit)",
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "repo_urls": [
+                    "https://github.com/username/repo-one",
+                    "https://github.com/username/repo-two",
+                ]
+            }
+        }
@@ -1,9 +1,39 @@
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 
 class DocumentationResponse(BaseModel):
     success: bool
     repo_name: str
     documentation: Dict[str, str]  # {beginner: str, intermediate: str, advanced: str}
+    pending_levels: List[str] = []  # Requested, not finished before the deadline
     metadata: Optional[Dict] = None
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    repo_url: str
+    status: str  # queued, running, succeeded, failed, cancelled
+    stage: Optional[str] = None  # fetching, analyzing, generating, done
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    queue_wait_seconds: float
+    result: Optional[DocumentationResponse] = None
+    error: Optional[str] = None
+
+
+class JobQueueStats(BaseModel):
+    workers: int
+    queue_depth: int
+    queue_capacity: int
+    running: int
+    completed: int
+    failed: int
+    cancelled: int = 0
+    avg_wait_seconds: float
+    max_wait_seconds: float
+    oldest_queued_seconds: float
+    llm_limiter: Optional[Dict] = None
+    github_quota: Optional[List[Dict]] = None
+    batch: Optional[Dict] = None
@@ -1,49 +1,67 @@
-from fastapi import APIRouter, HTTPException
-from ..models.request_models import DocumentationRequest
-from ..models.response_models import DocumentationResponse
-from ..agents.orchestrator import AgentOrchestrator
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import AsyncIterator, Awaitable, Dict, List, Literal, Optional
 from ..config import get_settings
+from ..mcp_servers.github_mcp import normalize_repo_url
+from ..models.request_models import (
+    BatchDocumentationRequest,
+    DocumentationRequest,
+    Level,
+)
+from ..models.response_models import DocumentationResponse
+from ..utils.doc_store import DocStore, get_doc_store
+from ..utils.job_queue import QueueFullError
+from .jobs import (
+    get_batch_runner,
+    get_job_manager,
+    get_orchestrator,
+    submit_job,
+    validate_repo_url,
+)
+import asyncio
+import json
 import logging
+import time
 
 router = APIRouter(prefix="/api/v1", tags=["documentation"])
 logger = logging.getLogger(__name__)
 
+# Background refreshes of stored docs, one per repo at a time
+_revalidations: Dict[str, asyncio.Task] = {}
+
 
 @router.post("/generate", response_model=DocumentationResponse)
-async def generate_documentation(request: DocumentationRequest):
+async def generate_documentation(request: DocumentationRequest, http_request: Request):
     """
     Generate documentation for a GitHub repository
 
     PITFALL: Long-running requests can timeout
     SOLUTION: Return immediately with job ID, process in background
 
-    For MVP: Synchronous processing (simpler)
-    For Production: Use background tasks or job queue
+    This endpoint is a synchronous wrapper: it queues a job on the shared
+    worker pool and waits for it. Use POST /api/v1/jobs to poll instead.
+    If the client disconnects first, the job is cancelled.
     """
 
-    settings = get_settings()
-
-    # Validate GitHub URL
-    if not request.repo_url.startswith("https://github.com/"):
-        raise HTTPException(status_code=400, detail="Invalid GitHub URL")
+    job = submit_job(request)
+    manager = get_job_manager()
 
     try:
-        # Initialize orchestrator
-        orchestrator = AgentOrchestrator(
-            gemini_api_key=settings.gemini_api_key,
-            github_token=settings.github_token if settings.github_token else None,
-        )
-
-        # Generate documentation
-        result = await orchestrator.generate_documentation(request.repo_url)
+        if not await _unless_disconnected(http_request, manager.wait(job)):
+            manager.cancel(job)
+            logger.info(f"Client disconnected, cancelled job {job.id}")
+            # Nobody reads this; 499 is the nginx convention for it
+            return Response(status_code=499)
 
-        if not result["success"]:
-            raise HTTPException(status_code=500, detail=result.get("error"))
+        if job.status != "succeeded":
+            raise HTTPException(status_code=500, detail=job.error)
 
+        result = job.result
         return DocumentationResponse(
             success=True,
             repo_name=result["repo_name"],
             documentation=result["documentation"],
+            pending_levels=result.get("pending_levels", []),
             metadata=result.get("metadata"),
         )
 
@@ -54,7 +72,220 @@ async def generate_documentation(request: DocumentationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generate/batch")
+async def generate_documentation_batch(request: BatchDocumentationRequest):
+    """
+    Generate documentation for many repositories, streamed as NDJSON
+
+    PITFALL: Hundreds of separate /generate calls for an org compete for
+    the same GitHub and Gemini quotas with nothing coordinating them
+    SOLUTION: One request schedules every repo under the global batch
+    concurrency limit, on the shared orchestrator and caches
+
+    Each line is a repo's result as soon as it finishes (in completion
+    order, with its "index" in repo_urls): the /generate payload, or
+    {"success": false, "error"} for that repo alone. The last line is
+    {"summary": {...}}.
+    """
+    settings = get_settings()
+    if len(request.repo_urls) > settings.batch_max_repos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.batch_max_repos} repositories per batch",
+        )
+    options = request.model_dump(exclude={"repo_urls"})
+
+    async def lines() -> AsyncIterator[str]:
+        succeeded = failed = 0
+        started = time.perf_counter()
+        async for result in get_batch_runner().stream(
+            request.repo_urls, options, normalize=normalize_repo_url
+        ):
+            if result.get("success"):
+                succeeded += 1
+            else:
+                failed += 1
+            yield json.dumps(result) + "\n"
+        summary = {
+            "total": len(request.repo_urls),
+            "succeeded": succeeded,
+            "failed": failed,
+            "duration_seconds": round(time.perf_counter() - started, 3),
+        }
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/generate/stream")
+async def stream_documentation(
+    repo_url: str,
+    ingestion_mode: Optional[
+        Literal["auto", "git_trees", "contents", "archive"]
+    ] = None,
+    bypass_cache: bool = False,
+    levels: Optional[List[Level]] = Query(None),
+    metadata_fields: Optional[List[str]] = Query(None),
+    deadline_seconds: Optional[float] = Query(None, gt=0),
+):
+    """
+    Stream documentation generation as Server-Sent Events
+
+    Events: "stage" while fetching/analyzing, "token" with
+    {level, text} as each documentation level is generated,
+    "level_complete", and finally "complete" (the same payload as
+    /generate) or "error". GET so browsers can use EventSource directly;
+    repeat levels/metadata_fields to select several. Closing the stream
+    cancels the generation.
+    """
+    validate_repo_url(repo_url)
+    orchestrator = get_orchestrator()
+
+    async def event_stream() -> AsyncIterator[str]:
+        async for event in orchestrator.stream_documentation(
+            repo_url,
+            ingestion_mode=ingestion_mode,
+            bypass_cache=bypass_cache,
+            levels=levels,
+            metadata_fields=metadata_fields,
+            deadline_seconds=deadline_seconds,
+        ):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/docs/{owner}/{repo}")
+async def get_stored_documentation(
+    owner: str, repo: str, request: Request, commit: Optional[str] = None
+):
+    """
+    Serve previously generated documentation, with HTTP caching
+
+    PITFALL: Viewing a repo's docs again re-ran the whole pipeline
+    SOLUTION: Serve the stored version with an ETag (If-None-Match gets a
+    304) and Cache-Control. The latest version is stale-while-revalidate:
+    once older than DOCS_MAX_AGE_SECONDS it is still served instantly,
+    while a background job regenerates it if the default branch moved
+
+    ?commit=<sha> serves one stored version; those never change, so they
+    are not revalidated. 404 if nothing was generated yet (POST /generate).
+    """
+    store = get_doc_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Documentation store disabled")
+    settings = get_settings()
+    repo_url = normalize_repo_url(f"https://github.com/{owner}/{repo}")
+
+    if commit is None:
+        pointer = await store.latest(repo_url)
+        if pointer is None:
+            raise HTTPException(status_code=404, detail="No documentation stored")
+        age = time.time() - pointer["checked_at"]
+        stale = age >= settings.docs_max_age_seconds
+        if stale:
+            _revalidate(repo_url, pointer["commit_sha"])
+        headers = {
+            "Cache-Control": (
+                f"public, max-age={max(0, int(settings.docs_max_age_seconds - age))}, "
+                f"stale-while-revalidate={settings.docs_stale_while_revalidate_seconds}"
+            ),
+            "X-Docs-Status": "stale" if stale else "fresh",
+        }
+    else:
+        pointer = None
+        headers = {"Cache-Control": "public, max-age=86400"}
+
+    if pointer is not None:
+        headers.update(_version_headers(pointer))
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+    record = await store.get(repo_url, pointer["commit_sha"] if pointer else commit)
+    if record is None:
+        raise HTTPException(status_code=404, detail="No documentation stored")
+    headers.update(_version_headers(record))
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=record["result"], headers=headers)
+
+
+async def _unless_disconnected(request: Request, waiter: Awaitable) -> bool:
+    """Await waiter; False if the client disconnected first"""
+
+    async def disconnected():
+        # The body is already read, so the next message is the disconnect
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    wait_task = asyncio.ensure_future(waiter)
+    watch_task = asyncio.create_task(disconnected())
+    try:
+        done, _ = await asyncio.wait(
+            {wait_task, watch_task}, return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        wait_task.cancel()
+        watch_task.cancel()
+    return wait_task in done
+
+
+def _version_headers(record: Dict) -> Dict[str, str]:
+    return {"ETag": DocStore.etag(record), "X-Commit-SHA": record["commit_sha"]}
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison
+    return "*" in candidates or etag in [tag.removeprefix("W/") for tag in candidates]
+
+
+def _revalidate(repo_url: str, commit_sha: str):
+    """Refresh the stored docs in the background, at most once per repo"""
+    if repo_url in _revalidations:
+        return
+    task = asyncio.create_task(_refresh_documentation(repo_url, commit_sha))
+    _revalidations[repo_url] = task
+    task.add_done_callback(lambda task: _revalidations.pop(repo_url, None))
+
+
+async def _refresh_documentation(repo_url: str, commit_sha: str):
+    """Regenerate through the job queue if the default branch moved"""
+    try:
+        head = await get_orchestrator().github_mcp.resolve_head(repo_url)
+        if head["sha"] == commit_sha:
+            await get_doc_store().touch(repo_url, commit_sha)
+            return
+        # The finished job stores the new version as the latest
+        job = get_job_manager().submit(repo_url)
+        await get_job_manager().wait(job)
+    except QueueFullError:
+        logger.info(f"Queue full, serving stale documentation for {repo_url}")
+    except Exception as e:
+        logger.warning(f"Could not revalidate documentation for {repo_url}: {e}")
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "smart-docs-agent"}
+
+
+@router.get("/ready")
+async def readiness_check(request: Request):
+    """Readiness probe: 503 until the startup warm-up has finished"""
+    warmup = getattr(request.app.state, "warmup", None)
+    if warmup is None:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready", "warmup": warmup}
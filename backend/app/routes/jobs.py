@@ -0,0 +1,107 @@
+from fastapi import APIRouter, HTTPException
+from functools import lru_cache
+from typing import Dict
+from ..models.request_models import DocumentationRequest
+from ..models.response_models import JobQueueStats, JobStatusResponse
+from ..agents.orchestrator import AgentOrchestrator, request_budget
+from ..config import get_settings
+from ..utils.batch_runner import BatchRunner
+from ..utils.job_queue import Job, JobManager, QueueFullError
+from ..utils.rate_limiter import get_llm_rate_limiter
+import logging
+
+router = APIRouter(prefix="/api/v1", tags=["jobs"])
+logger = logging.getLogger(__name__)
+
+
+@lru_cache()
+def get_orchestrator() -> AgentOrchestrator:
+    """The application-wide orchestrator, built once and shared"""
+    settings = get_settings()
+    return AgentOrchestrator(
+        gemini_api_key=settings.gemini_api_key,
+        github_token=settings.github_token if settings.github_token else None,
+    )
+
+
+async def run_documentation_job(job: Job) -> Dict:
+    """Worker entry point: run the agent pipeline for one job"""
+    options = dict(job.options)
+    # The deadline runs from submission; time spent queued counts against it
+    budget = request_budget(options.pop("deadline_seconds", None))
+    return await get_orchestrator().generate_documentation(
+        job.repo_url,
+        deadline_seconds=max(0.0, budget - job.queue_wait_seconds),
+        progress=job.set_stage,
+        **options,
+    )
+
+
+@lru_cache()
+def get_job_manager() -> JobManager:
+    settings = get_settings()
+    return JobManager(
+        run_documentation_job,
+        workers=settings.job_workers,
+        max_queue=settings.job_queue_size,
+        retention=settings.job_retention,
+    )
+
+
+async def run_batch_repo(repo_url: str, options: Dict) -> Dict:
+    """Batch entry point: one repo on the shared orchestrator"""
+    if not repo_url.startswith("https://github.com/"):
+        raise ValueError("Invalid GitHub URL")
+    return await get_orchestrator().generate_documentation(repo_url, **options)
+
+
+@lru_cache()
+def get_batch_runner() -> BatchRunner:
+    return BatchRunner(
+        run_batch_repo, max_concurrency=get_settings().batch_max_concurrency
+    )
+
+
+def validate_repo_url(repo_url: str):
+    if not repo_url.startswith("https://github.com/"):
+        raise HTTPException(status_code=400, detail="Invalid GitHub URL")
+
+
+def submit_job(request: DocumentationRequest) -> Job:
+    """Validate and queue a request, mapping a full queue to 503"""
+    validate_repo_url(request.repo_url)
+    options = request.model_dump(exclude={"repo_url"})
+    try:
+        return get_job_manager().submit(request.repo_url, options)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.post("/jobs", response_model=JobStatusResponse, status_code=202)
+async def create_job(request: DocumentationRequest):
+    """
+    Queue documentation generation and return a job id immediately
+
+    Poll GET /api/v1/jobs/{job_id} for status, stage and result.
+    """
+    job = submit_job(request)
+    return job.to_dict()
+
+
+@router.get("/jobs/stats", response_model=JobQueueStats)
+async def job_stats():
+    """Queue depth, worker utilisation, queue wait times and API quotas"""
+    return dict(
+        get_job_manager().stats(),
+        llm_limiter=get_llm_rate_limiter().stats(),
+        github_quota=get_orchestrator().github_mcp.client.quota(),
+        batch=get_batch_runner().stats(),
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
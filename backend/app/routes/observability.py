@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from ..config import get_settings
+from ..utils import metrics
+from ..utils.tracing import get_trace_buffer
+from .jobs import get_batch_runner, get_job_manager, get_orchestrator
+
+router = APIRouter(tags=["observability"])
+
+
+def refresh_gauges():
+    """Point-in-time values that are cheaper to read on scrape than to track"""
+    jobs = get_job_manager().stats()
+    metrics.JOB_QUEUE_DEPTH.set(jobs["queue_depth"])
+    metrics.JOBS_RUNNING.set(jobs["running"])
+    metrics.BATCH_WAITING.set(get_batch_runner().stats()["waiting"])
+    # Tokens are identified by position, never by value
+    for i, quota in enumerate(get_orchestrator().github_mcp.client.quota()):
+        if quota["remaining"] is not None:
+            metrics.GITHUB_QUOTA_REMAINING.set(quota["remaining"], token=str(i))
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format)"""
+    if not get_settings().metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    refresh_gauges()
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@router.get("/api/v1/traces")
+async def list_traces(
+    min_duration: float = Query(0.0, ge=0, description="Only traces this slow (s)"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Recent request traces, slowest first"""
+    return {"traces": get_trace_buffer().recent(min_duration, limit)}
+
+
+@router.get("/api/v1/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    One request's spans as a tree (trace ids come from X-Trace-Id)
+
+    Stage spans under the request show which stage dominated it; GitHub
+    and Gemini calls nest under the stage that made them.
+    """
+    trace = get_trace_buffer().get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found or expired")
+    return trace.to_dict()
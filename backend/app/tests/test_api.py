@@ -1,6 +1,10 @@
+import asyncio
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.routes import documentation, jobs
+from app.utils.doc_store import DocStore
 
 client = TestClient(app)
 
@@ -39,5 +43,107 @@ def test_generate_documentation_missing_url():
     assert response.status_code == 422  # Unprocessable Entity
 
 
+def test_stream_documentation_invalid_url():
+    """Test that the streaming endpoint validates URLs before streaming"""
+    response = client.get(
+        "/api/v1/generate/stream", params={"repo_url": "https://example.com/x"}
+    )
+    assert response.status_code == 400
+
+
+def test_create_job_invalid_url():
+    """Test that the job endpoint validates URLs before queueing"""
+    response = client.post(
+        "/api/v1/jobs", json={"repo_url": "https://example.com/not-github"}
+    )
+    assert response.status_code == 400
+
+
+def test_get_unknown_job():
+    """Test that unknown job ids return 404"""
+    response = client.get("/api/v1/jobs/does-not-exist")
+    assert response.status_code == 404
+
+
+def test_readiness_waits_for_warm_up(monkeypatch):
+    """Test that /ready is 503 until the lifespan warm-up has run"""
+    assert client.get("/api/v1/ready").status_code == 503
+
+    async def warm_up(timeout):
+        return {"github": "ok", "gemini": "ok"}
+
+    monkeypatch.setattr(jobs.get_orchestrator(), "warm_up", warm_up)
+    with TestClient(app) as started:
+        response = started.get("/api/v1/ready")
+    assert response.status_code == 200
+    assert response.json()["warmup"] == {"github": "ok", "gemini": "ok"}
+
+
+def test_batch_streams_ndjson_with_isolated_failures(monkeypatch):
+    """Test that a batch yields one line per repo plus a summary"""
+
+    async def generate(repo_url, **options):
+        if repo_url.endswith("broken"):
+            raise RuntimeError("boom")
+        return {"success": True, "repo_name": repo_url.rsplit("/", 1)[-1]}
+
+    monkeypatch.setattr(jobs.get_orchestrator(), "generate_documentation", generate)
+    response = client.post(
+        "/api/v1/generate/batch",
+        json={
+            "repo_urls": [
+                "https://github.com/org/one",
+                "https://github.com/org/broken",
+                "https://example.com/not-github",
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["index"]: line for line in lines[:-1]}
+    assert results[0]["success"] and results[0]["repo_name"] == "one"
+    assert results[1] == dict(results[1], success=False, error="boom")
+    assert "Invalid GitHub URL" in results[2]["error"]
+    assert lines[-1]["summary"]["succeeded"] == 1
+    assert lines[-1]["summary"]["failed"] == 2
+
+
+def test_stored_docs_are_served_with_etag_and_revalidated(tmp_path, monkeypatch):
+    """Test ETag/304 on stored docs and background refresh once stale"""
+    store = DocStore(str(tmp_path / "docs.sqlite3"), 1024 * 1024)
+    revalidated = []
+    monkeypatch.setattr(documentation, "get_doc_store", lambda: store)
+    monkeypatch.setattr(
+        documentation, "_revalidate", lambda *args: revalidated.append(args)
+    )
+    assert client.get("/api/v1/docs/org/repo").status_code == 404
+
+    result = {"success": True, "repo_name": "repo", "documentation": {}}
+    asyncio.run(store.put("https://github.com/org/repo", "abc123", result))
+    response = client.get("/api/v1/docs/org/repo")
+    assert response.status_code == 200
+    assert response.json() == result
+    assert response.headers["x-commit-sha"] == "abc123"
+    assert "stale-while-revalidate" in response.headers["cache-control"]
+    assert response.headers["x-docs-status"] == "fresh"
+
+    etag = response.headers["etag"]
+    cached = client.get("/api/v1/docs/org/repo", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert (
+        client.get("/api/v1/docs/org/repo", params={"commit": "abc123"}).headers["etag"]
+        == etag
+    )
+    assert revalidated == []
+
+    monkeypatch.setattr(documentation.get_settings(), "docs_max_age_seconds", 0)
+    stale = client.get("/api/v1/docs/org/repo")
+    assert stale.status_code == 200
+    assert stale.headers["x-docs-status"] == "stale"
+    assert revalidated == [("https://github.com/org/repo", "abc123")]
+
+
 # Note: Full integration tests would require API keys and network access
 # For CI/CD, you would mock the agents and MCP servers
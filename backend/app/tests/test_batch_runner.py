@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from app.utils.batch_runner import BatchRunner
+
+
+@pytest.mark.asyncio
+async def test_batch_respects_the_global_concurrency_cap():
+    active = 0
+    peak = 0
+
+    async def run(repo_url, options):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return {"success": True}
+
+    runner = BatchRunner(run, max_concurrency=2)
+    urls = [f"https://github.com/org/repo{i}" for i in range(6)]
+    # Two batches at once still share the same two slots
+    first, second = await asyncio.gather(
+        collect(runner.stream(urls[:3])), collect(runner.stream(urls[3:]))
+    )
+
+    assert peak == 2
+    assert len(first) == len(second) == 3
+    assert runner.stats()["completed"] == 6
+
+
+@pytest.mark.asyncio
+async def test_results_stream_in_completion_order_and_duplicates_run_once():
+    calls = []
+
+    async def run(repo_url, options):
+        calls.append(repo_url)
+        await asyncio.sleep(0.05 if repo_url.endswith("slow") else 0)
+        return {"success": True, "options": options}
+
+    runner = BatchRunner(run, max_concurrency=4)
+    urls = [
+        "https://github.com/org/slow",
+        "https://github.com/org/fast",
+        "https://github.com/Org/Fast",
+    ]
+    results = await collect(
+        runner.stream(urls, {"bypass_cache": True}, normalize=str.lower)
+    )
+
+    assert sorted(calls) == [
+        "https://github.com/org/fast",
+        "https://github.com/org/slow",
+    ]
+    assert [r["index"] for r in results] == [1, 2, 0]
+    assert results[1]["repo_url"] == "https://github.com/Org/Fast"
+    assert results[0]["options"] == {"bypass_cache": True}
+
+
+@pytest.mark.asyncio
+async def test_stopping_the_stream_cancels_pending_repos():
+    started = []
+
+    async def run(repo_url, options):
+        started.append(repo_url)
+        await asyncio.sleep(0 if repo_url.endswith("0") else 10)
+        return {"success": True}
+
+    runner = BatchRunner(run, max_concurrency=1)
+    stream = runner.stream([f"https://github.com/org/r{i}" for i in range(3)])
+    first = await stream.__anext__()
+    await stream.aclose()
+    await asyncio.sleep(0)
+
+    assert first["index"] == 0
+    assert runner.stats()["running"] == 0
+    assert len(started) <= 2
+
+
+async def collect(stream):
+    return [item async for item in stream]
@@ -0,0 +1,44 @@
+import json
+import pytest
+from types import SimpleNamespace
+from benchmarks import bench_pipeline, bench_load
+
+
+@pytest.mark.asyncio
+async def test_small_scenario_makes_no_more_api_calls_than_its_baseline():
+    # No model latency: this guards call counts, timing needs a quiet machine
+    args = SimpleNamespace(
+        ttft=0.0, tokens_per_second=0.0, response_tokens=50, rpm=100000
+    )
+    report = await bench_pipeline.run_scenario("small", args)
+
+    baselines = json.loads(bench_pipeline.BASELINES_PATH.read_text())
+    config = bench_pipeline.fake_gemini_config(args)
+    assert bench_pipeline.compare({"small": report}, baselines, 0.25, config) == []
+    # The warm run is answered from stored artifacts and 304s
+    warm = report["runs"]["warm"]
+    assert warm["gemini_calls"] == 0
+    assert warm["github_calls"] == warm["github_not_modified"]
+
+
+def test_load_report_counts_errors_and_ignores_lag_outside_the_run():
+    records = [
+        {"kind": "small", "sent_at": 100.0, "latency": latency, "status": 200}
+        for latency in (1.0, 2.0, 3.0, 4.0)
+    ] + [{"kind": "medium", "sent_at": 101.0, "latency": 9.0, "status": 503}]
+    worker = {
+        "lag": [[99.0, 5.0], [100.5, 0.002], [101.5, 0.010]],
+        "gemini": {"calls": 6, "max_concurrency": 3},
+    }
+    github = {"total": 10, "not_modified": 2, "rate_limited": 0, "by_kind": {}}
+
+    report = bench_load.summarize(2, records, [worker, worker], github, 100.0, 102.0)
+
+    assert report["error_rate"] == 0.2
+    assert report["errors"] == {"503": 1}
+    assert report["latency_seconds"]["p50"] == 2.0
+    assert report["latency_seconds"]["p99"] == 4.0
+    assert report["latency_by_kind"]["medium"]["count"] == 0
+    # The 5 s sample predates the load
+    assert report["loop_lag_ms"]["max"] == 10.0
+    assert report["gemini"] == {"calls": 12, "max_concurrency": 3}
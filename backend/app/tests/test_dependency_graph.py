@@ -0,0 +1,110 @@
+import pytest
+from app.agents.code_analyzer import CodeAnalyzerAgent
+from app.analysis.imports import DependencyGraph, extract_imports
+
+PYTHON_FILES = {
+    "app/main.py": "from .core import engine\nfrom app.utils import helpers\nimport os\n",
+    "app/core/__init__.py": "",
+    "app/core/engine.py": "from ..utils.helpers import slugify\nfrom . import models\n",
+    "app/core/models.py": "from app.utils import helpers\n",
+    "app/utils/__init__.py": "",
+    "app/utils/helpers.py": "import re\n",
+    "scripts/unused.py": "print('hi')\n",
+}
+
+
+def file(path, size=100):
+    return {"type": "file", "name": path.rsplit("/", 1)[-1], "path": path, "size": size}
+
+
+def test_python_imports_resolve_to_repo_files():
+    graph = DependencyGraph(PYTHON_FILES)
+    graph.add_files(PYTHON_FILES)
+
+    assert graph.imports["app/main.py"] == {
+        "app/core/__init__.py",
+        "app/core/engine.py",
+        "app/utils/__init__.py",
+        "app/utils/helpers.py",
+    }
+    assert "app/core/models.py" in graph.imports["app/core/engine.py"]
+    assert len(graph.imported_by["app/utils/helpers.py"]) == 3
+
+
+def test_ranking_favours_entry_points_and_shared_modules():
+    graph = DependencyGraph(PYTHON_FILES)
+    graph.add_files(PYTHON_FILES)
+    ranked = [item["path"] for item in graph.top_k(3, entry_points={"app/main.py"})]
+
+    assert "app/utils/helpers.py" in ranked
+    assert "scripts/unused.py" not in ranked
+    assert graph.top_k(10, {"app/main.py"})[-1]["path"] == "scripts/unused.py"
+
+
+def test_js_go_and_rust_imports():
+    paths = [
+        "src/index.ts",
+        "src/api/client.ts",
+        "src/components/index.tsx",
+        "cmd/server/main.go",
+        "internal/db/db.go",
+        "internal/db/db_test.go",
+        "src/lib.rs",
+        "src/net/mod.rs",
+        "src/net/socket.rs",
+    ]
+    graph = DependencyGraph(paths)
+
+    ts = "import { get } from './api/client'\nimport React from 'react'\nconst c = require('@/components')"
+    assert extract_imports("src/index.ts", ts) == [
+        "./api/client",
+        "react",
+        "@/components",
+    ]
+    graph.add_file("src/index.ts", ts)
+    assert graph.imports["src/index.ts"] == {
+        "src/api/client.ts",
+        "src/components/index.tsx",
+    }
+
+    go = (
+        'package main\n\nimport (\n\t"fmt"\n\tdb "github.com/acme/app/internal/db"\n)\n'
+    )
+    graph.add_file("cmd/server/main.go", go)
+    assert graph.imports["cmd/server/main.go"] == {"internal/db/db.go"}
+
+    graph.add_file("src/lib.rs", "pub mod net;\nuse crate::net::socket::Socket;\n")
+    assert graph.imports["src/lib.rs"] == {"src/net/mod.rs", "src/net/socket.rs"}
+
+
+@pytest.mark.asyncio
+async def test_key_file_selection_follows_imports():
+    contents = [
+        file("README.md"),
+        file("requirements.txt"),
+        file("app/main.py"),
+        file("app/core/__init__.py", 0),
+        file("app/core/engine.py", 50),
+        file("app/core/models.py", 50),
+        file("app/utils/__init__.py", 0),
+        file("app/utils/helpers.py", 10),
+        file("scripts/unused.py", 9000),
+        file("tests/fixtures/big_fixture.py", 20000),
+    ]
+    texts = dict(PYTHON_FILES, **{"requirements.txt": "fastapi\n"})
+    fetched = []
+
+    async def fetch(paths):
+        fetched.append(list(paths))
+        return {p: texts.get(p, "") for p in paths}
+
+    analyzer = CodeAnalyzerAgent("test-key")
+    selection = await analyzer._select_key_files({"contents": contents}, fetch, 6)
+
+    # Manifests and entry points seed the graph, imports pick the rest
+    assert fetched[0] == ["requirements.txt", "app/main.py", "app/core/__init__.py"]
+    assert list(selection["files"])[:2] == ["requirements.txt", "app/main.py"]
+    assert "app/core/engine.py" in selection["files"]
+    assert "app/utils/helpers.py" in selection["files"]
+    assert "tests/fixtures/big_fixture.py" not in selection["files"]
+    assert selection["key_files"][0]["path"] == "app/main.py"
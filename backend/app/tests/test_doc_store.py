@@ -0,0 +1,113 @@
+import pytest
+from types import SimpleNamespace
+from app.agents.orchestrator import AgentOrchestrator
+from app.routes import documentation
+from app.utils.doc_store import DocStore
+
+REPO = "https://github.com/org/repo"
+
+
+@pytest.mark.asyncio
+async def test_versions_are_kept_per_commit_with_a_latest_pointer(tmp_path):
+    store = DocStore(str(tmp_path / "docs.sqlite3"), 1024 * 1024)
+    assert await store.latest(REPO) is None
+
+    first = await store.put(REPO, "aaa", {"documentation": {"beginner": "v1"}})
+    second = await store.put(REPO, "bbb", {"documentation": {"beginner": "v2"}})
+
+    assert (await store.latest(REPO))["commit_sha"] == "bbb"
+    old = await store.get(REPO, "aaa")
+    assert old["result"]["documentation"]["beginner"] == "v1"
+    assert DocStore.etag(old) == DocStore.etag(first) != DocStore.etag(second)
+
+    # Touching an outdated commit must not move the pointer back
+    await store.touch(REPO, "aaa")
+    assert (await store.latest(REPO))["commit_sha"] == "bbb"
+    await store.touch(REPO, "bbb")
+    assert (await store.latest(REPO))["checked_at"] > second["checked_at"]
+
+
+@pytest.mark.asyncio
+async def test_a_late_run_for_an_older_head_does_not_move_latest_back(tmp_path):
+    store = DocStore(str(tmp_path / "docs.sqlite3"), 1024 * 1024)
+
+    # bbb was resolved after aaa, but aaa's run finishes last
+    await store.put(REPO, "bbb", {"documentation": {"beginner": "new"}}, 200.0)
+    latest = await store.put(REPO, "aaa", {"documentation": {"beginner": "old"}}, 100.0)
+
+    assert latest["commit_sha"] == "bbb"
+    assert (await store.latest(REPO))["commit_sha"] == "bbb"
+    # The older version is still kept under its own commit
+    assert (await store.get(REPO, "aaa"))["result"]["documentation"] == {
+        "beginner": "old"
+    }
+    # Newer heads (and regenerations of the same one) still advance it
+    await store.put(REPO, "ccc", {}, 300.0)
+    assert (await store.latest(REPO))["commit_sha"] == "ccc"
+
+
+@pytest.mark.asyncio
+async def test_refresh_regenerates_only_when_the_branch_moved(tmp_path, monkeypatch):
+    store = DocStore(str(tmp_path / "docs.sqlite3"), 1024 * 1024)
+    pointer = await store.put(REPO, "aaa", {})
+    head = {"sha": "aaa"}
+    submitted = []
+
+    async def resolve_head(repo_url):
+        return dict(head, repo_url=repo_url)
+
+    async def wait(job):
+        return job
+
+    orchestrator = SimpleNamespace(
+        github_mcp=SimpleNamespace(resolve_head=resolve_head)
+    )
+    manager = SimpleNamespace(submit=submitted.append, wait=wait)
+    monkeypatch.setattr(documentation, "get_orchestrator", lambda: orchestrator)
+    monkeypatch.setattr(documentation, "get_job_manager", lambda: manager)
+    monkeypatch.setattr(documentation, "get_doc_store", lambda: store)
+
+    await documentation._refresh_documentation(REPO, "aaa")
+    assert submitted == []
+    assert (await store.latest(REPO))["checked_at"] > pointer["checked_at"]
+
+    head["sha"] = "bbb"
+    await documentation._refresh_documentation(REPO, "aaa")
+    assert submitted == [REPO]
+
+
+def run_result(timings, **documentation):
+    return {
+        "success": True,
+        "documentation": documentation,
+        "metadata": {"analysis": {"complexity": "low"}, "timings": timings},
+    }
+
+
+@pytest.mark.asyncio
+async def test_publishing_skips_failed_levels_and_keeps_unchanged_etags(tmp_path):
+    orchestrator = AgentOrchestrator("test-key")
+    orchestrator.docs = store = DocStore(str(tmp_path / "docs.sqlite3"), 1024 * 1024)
+
+    # Nothing but failures: no version to serve
+    await orchestrator._publish(
+        REPO, "aaa", run_result(1, advanced="# Error"), ["advanced"]
+    )
+    assert await store.latest(REPO) is None
+
+    await orchestrator._publish(
+        REPO, "aaa", run_result(1, beginner="b", advanced="# Error"), ["advanced"]
+    )
+    first = await store.get(REPO, "aaa")
+    assert first["result"]["documentation"] == {"beginner": "b"}
+
+    # A reused run republishes the same docs with new bookkeeping
+    await orchestrator._publish(REPO, "aaa", run_result(2, beginner="b"))
+    pointer = await store.latest(REPO)
+    assert DocStore.etag(pointer) == DocStore.etag(first)
+    assert pointer["checked_at"] > first["generated_at"]
+
+    await orchestrator._publish(REPO, "aaa", run_result(3, advanced="a"))
+    latest = await store.get(REPO, "aaa")
+    assert latest["result"]["documentation"] == {"beginner": "b", "advanced": "a"}
+    assert DocStore.etag(latest) != DocStore.etag(first)
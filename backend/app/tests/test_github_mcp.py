@@ -0,0 +1,247 @@
+import asyncio
+import os
+import io
+import tarfile
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.agents.pipeline import PipelineScheduler, Stage
+from app.analysis.tree_index import TreeIndex
+from app.mcp_servers.github_client import GitHubClient
+from app.mcp_servers.github_mcp import GitHubMCP
+
+
+class FakeClient:
+    """Serves Git Trees from a flat listing, optionally truncating the root"""
+
+    def __init__(self, entries, truncate_root=False):
+        self.entries = entries
+        self.truncate_root = truncate_root
+        self.calls = []
+
+    async def get_json(self, path, params=None):
+        recursive = bool(params and params.get("recursive"))
+        sha = path.rsplit("/", 1)[-1]
+        self.calls.append((sha, recursive))
+        prefix = "" if sha == "main" else sha + "/"
+        listing = [
+            dict(entry, path=entry["path"][len(prefix) :], sha=entry["path"])
+            for entry in self.entries
+            if entry["path"].startswith(prefix)
+            and (recursive or "/" not in entry["path"][len(prefix) :])
+        ]
+        truncated = recursive and self.truncate_root and sha == "main"
+        return {"tree": listing, "truncated": truncated}
+
+
+ENTRIES = [
+    {"path": "README.md", "type": "blob", "size": 120},
+    {"path": "logo.png", "type": "blob", "size": 2048},
+    {"path": "src", "type": "tree"},
+    {"path": "src/main.py", "type": "blob", "size": 500},
+    {"path": "src/pkg", "type": "tree"},
+    {"path": "src/pkg/core.py", "type": "blob", "size": 300},
+    {"path": "src/pkg/deep", "type": "tree"},
+    {"path": "src/pkg/deep/hidden.py", "type": "blob", "size": 10},
+]
+
+
+def make_mcp(client):
+    mcp = GitHubMCP()
+    mcp.client = client
+    return mcp
+
+
+@pytest.mark.asyncio
+async def test_git_trees_builds_nested_contents_with_one_call():
+    client = FakeClient(ENTRIES)
+    contents = await make_mcp(client)._get_tree_from_git_trees(
+        "owner", "name", "main", max_depth=3
+    )
+
+    assert client.calls == [("main", True)]
+    # Non-code files are listed too; reading is decided later
+    assert [item["name"] for item in contents] == ["README.md", "logo.png", "src"]
+
+    src = contents[2]
+    assert [item["name"] for item in src["children"]] == ["main.py", "pkg"]
+    pkg = src["children"][1]
+    assert pkg["children"][0]["path"] == "src/pkg/core.py"
+    # Depth limit applied locally, matching the contents walk
+    assert pkg["children"][1]["children"] == []
+    assert contents[0]["download_url"].endswith("/owner/name/main/README.md")
+
+
+@pytest.mark.asyncio
+async def test_git_trees_falls_back_to_subtrees_when_truncated():
+    client = FakeClient(ENTRIES, truncate_root=True)
+    contents = await make_mcp(client)._get_tree_from_git_trees(
+        "owner", "name", "main", max_depth=3
+    )
+
+    assert client.calls == [("main", True), ("main", False), ("src", True)]
+    assert contents == await make_mcp(FakeClient(ENTRIES))._get_tree_from_git_trees(
+        "owner", "name", "main", max_depth=3
+    )
+
+
+class FakeContentsClient:
+    """Serves contents listings from the same flat listing, per ref"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.refs = []
+
+    async def get_json(self, path, params=None):
+        self.refs.append((params or {}).get("ref"))
+        prefix = path.split("/contents/", 1)[1]
+        prefix = prefix + "/" if prefix else ""
+        return [
+            {
+                "name": entry["path"].rsplit("/", 1)[-1],
+                "path": entry["path"],
+                "type": "dir" if entry["type"] == "tree" else "file",
+                "size": entry.get("size", 0),
+                "sha": entry.get("sha", entry["path"]),
+                "download_url": f"https://raw/{entry['path']}",
+            }
+            for entry in self.entries
+            if entry["path"].startswith(prefix)
+            and "/" not in entry["path"][len(prefix) :]
+        ]
+
+
+@pytest.mark.asyncio
+async def test_contents_walk_reads_every_directory_at_the_commit():
+    client = FakeContentsClient(ENTRIES)
+    contents = await make_mcp(client)._get_tree_recursive(
+        "owner", "name", "abc123", max_depth=3
+    )
+
+    assert [item["name"] for item in contents] == ["README.md", "logo.png", "src"]
+    assert client.refs == ["abc123"] * 3  # root, src, src/pkg
+    pkg = contents[2]["children"][1]
+    assert pkg["children"][0]["path"] == "src/pkg/core.py"
+
+
+@pytest.mark.asyncio
+async def test_same_size_edit_in_contents_mode_invalidates_the_sources_memo():
+    async def run(entries, memo=None):
+        contents = await make_mcp(FakeContentsClient(entries))._get_tree_recursive(
+            "owner", "name", "abc123", max_depth=3
+        )
+        stages = [
+            Stage("tree", lambda r: {"index": TreeIndex.from_contents(contents)}),
+            Stage(
+                "sources",
+                lambda r: r["tree"]["index"].digest,
+                ["tree"],
+                inputs=lambda r: r["tree"]["index"],
+            ),
+        ]
+        return await PipelineScheduler(stages).run(memo=memo)
+
+    first = await run(ENTRIES)
+    memo = {"sources": {"key": first["keys"]["sources"], "value": "stale"}}
+    assert (await run(ENTRIES, memo))["reused"] == ["sources"]
+
+    # Same path, same size, new blob
+    edited = [
+        dict(entry, sha="edited") if entry["path"] == "src/main.py" else entry
+        for entry in ENTRIES
+    ]
+    again = await run(edited, memo)
+    assert again["reused"] == []
+    assert again["results"]["sources"] != "stale"
+
+
+def make_tarball(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for path, data in files.items():
+            info = tarfile.TarInfo(f"owner-name-abc123/{path}")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_archive_ingestion_streams_tree_and_contents():
+    tarball = make_tarball(
+        {
+            "src/main.py": b"import os\n\nprint(os.name)\n",
+            "src/big.py": b"x" * 1_000_001,
+            "logo.png": b"\x89PNG",
+            "README.md": b"# Demo\n",
+        }
+    )
+
+    async def handler(request):
+        return web.Response(body=tarball, content_type="application/x-gzip")
+
+    app = web.Application()
+    app.router.add_get("/repos/owner/name/tarball/main", handler)
+    async with TestServer(app) as server:
+        client = GitHubClient()
+        client.api_base = str(server.make_url("")).rstrip("/")
+        contents, file_contents = await make_mcp(client)._get_tree_from_archive(
+            "owner", "name", "main", max_depth=3
+        )
+        await client.close()
+
+    # Every file is listed, only code files under 1 MB are read
+    assert [item["name"] for item in contents] == ["README.md", "logo.png", "src"]
+    assert [item["name"] for item in contents[2]["children"]] == ["big.py", "main.py"]
+    assert set(file_contents) == {"README.md", "src/main.py"}
+    assert file_contents["src/main.py"].startswith("import os")
+    # Same blob SHA that `git hash-object` reports
+    assert contents[0]["sha"] == "0805455a24b6c68fbc38d0fa5d121f735984285d"
+
+
+def test_only_changes_the_pipeline_reads_affect_documentation():
+    mcp = make_mcp(FakeClient([]))
+    mcp.max_depth = 3
+
+    def affects(filename, status="modified", previous=None):
+        change = {"filename": filename, "status": status}
+        if previous:
+            change["previous_filename"] = previous
+        return mcp.affects_documentation(change)
+
+    assert affects("src/app.py")
+    assert affects("README.rst")
+    assert affects("docs/logo.png", status="added")  # may add a directory
+    assert affects("assets/new.png", status="renamed", previous="README.md")
+    assert not affects("docs/logo.png")
+    assert not affects("a/b/c/too_deep.py")
+
+
+@pytest.mark.asyncio
+async def test_requests_after_an_archive_download_reuse_no_stale_timeout():
+    # Big enough to arrive in many chunks (random, so gzip can't shrink it)
+    tarball = make_tarball(
+        {"src/main.py": b"print(1)\n", "data.bin": os.urandom(4 << 20)}
+    )
+
+    async def archive(request):
+        return web.Response(body=tarball, content_type="application/x-gzip")
+
+    async def repo(request):
+        return web.json_response({"default_branch": "main"})
+
+    app = web.Application()
+    app.router.add_get("/repos/owner/name", repo)
+    app.router.add_get("/repos/owner/name/tarball/main", archive)
+    async with TestServer(app) as server:
+        client = GitHubClient()
+        client.api_base = str(server.make_url("")).rstrip("/")
+        client.timeout = 0.2
+        mcp = make_mcp(client)
+        # The archive reuses this request's pooled connection
+        await client.get_json("/repos/owner/name", use_cache=False)
+        await mcp._get_tree_from_archive("owner", "name", "main")
+        await asyncio.sleep(0.4)  # Past the archive's idle read timeout
+        repo_info = await client.get_json("/repos/owner/name", use_cache=False)
+        await client.close()
+
+    assert repo_info == {"default_branch": "main"}
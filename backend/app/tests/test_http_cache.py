@@ -0,0 +1,57 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.mcp_servers.github_client import GitHubClient
+from app.mcp_servers.http_cache import ConditionalRequestCache, start_request_stats
+from app.utils.disk_cache import DiskCache
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=10)
+    cache.set("a", b"aaaa")
+    cache.set("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"  # "b" is now least recently used
+
+    cache.set("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    assert cache.total_bytes() <= 10
+
+
+def test_disk_cache_expires_entries(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=100)
+    cache.set("stale", b"x", ttl=-1)
+    cache.set("fresh", b"y", ttl=60)
+    assert cache.get("stale") is None
+    assert cache.get("fresh") == b"y"
+
+
+@pytest.mark.asyncio
+async def test_client_replays_etag_and_serves_304_from_cache(tmp_path):
+    seen_validators = []
+
+    async def handler(request):
+        seen_validators.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.json_response({"name": "demo"}, headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/repos/o/demo", handler)
+    async with TestServer(app) as server:
+        client = GitHubClient()
+        client.api_base = str(server.make_url("")).rstrip("/")
+        client.cache = ConditionalRequestCache(
+            str(tmp_path / "github.sqlite3"), 1024 * 1024
+        )
+        stats = start_request_stats()
+
+        first = await client.get_json("/repos/o/demo")
+        second = await client.get_json("/repos/o/demo")
+        await client.close()
+
+    assert first == second == {"name": "demo"}
+    assert seen_validators == [None, '"v1"']
+    assert stats == {"hits": 1, "misses": 1}
@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from app.utils.job_queue import JobManager, QueueFullError
+
+
+@pytest.mark.asyncio
+async def test_workers_bound_concurrency_and_record_stage():
+    active = 0
+    peak = 0
+    release = asyncio.Event()
+
+    async def runner(job):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        job.set_stage("generating")
+        await release.wait()
+        active -= 1
+        return {"success": True, "repo_name": job.repo_url}
+
+    manager = JobManager(runner, workers=2, max_queue=10)
+    jobs = [manager.submit(f"https://github.com/o/r{i}") for i in range(5)]
+    await asyncio.sleep(0.01)
+
+    assert manager.stats()["running"] == 2
+    assert manager.stats()["queue_depth"] == 3
+    assert jobs[0].stage == "generating"
+
+    release.set()
+    for job in jobs:
+        await manager.wait(job)
+    await manager.stop()
+
+    assert peak == 2
+    assert all(job.status == "succeeded" for job in jobs)
+    assert manager.stats()["completed"] == 5
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_and_failures_are_recorded():
+    async def runner(job):
+        raise RuntimeError("boom")
+
+    manager = JobManager(runner, workers=1, max_queue=1)
+    first = manager.submit("https://github.com/o/a")
+    with pytest.raises(QueueFullError):
+        manager.submit("https://github.com/o/b")
+
+    await manager.wait(first)
+    await manager.stop()
+
+    assert first.status == "failed"
+    assert first.error == "boom"
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_running_jobs_and_skips_queued_ones():
+    stopped = asyncio.Event()
+    ran = []
+
+    async def runner(job):
+        ran.append(job.repo_url)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            stopped.set()
+            raise
+
+    manager = JobManager(runner, workers=1, max_queue=10)
+    running = manager.submit("https://github.com/o/a")
+    queued = manager.submit("https://github.com/o/b")
+    await asyncio.sleep(0.01)
+
+    assert manager.cancel(queued) and manager.cancel(running)
+    await asyncio.wait_for(manager.wait(running), timeout=1)
+    assert stopped.is_set()
+    assert running.status == queued.status == "cancelled"
+    assert not manager.cancel(running)
+
+    # The worker survives and moves on to the next job
+    after = manager.submit("https://github.com/o/c")
+    await asyncio.sleep(0.01)
+    assert ran == ["https://github.com/o/a", "https://github.com/o/c"]
+    assert manager.stats()["cancelled"] == 2
+    manager.cancel(after)
+    await manager.stop()
@@ -0,0 +1,85 @@
+from app.agents.orchestrator import (
+    _merge_results,
+    _pipeline_targets,
+    _result_stages,
+    _without_stages,
+    select_result,
+)
+
+RESULT = {
+    "success": True,
+    "repo_name": "repo",
+    "documentation": {"beginner": "b", "advanced": "a"},
+    "metadata": {
+        "commit_sha": "abc",
+        "analysis": {"statistics": {"total_files": 3}, "complexity": "low"},
+        "context": {"best_practices": {}},
+    },
+}
+
+
+def test_targets_skip_llm_stages_nobody_asked_for():
+    targets = _pipeline_targets(("beginner",), ["commit_sha"])
+    assert set(targets) == {"tree", "readme", "beginner"}
+
+    targets = _pipeline_targets(("advanced",), ["analysis.statistics", "context"])
+    assert {"statistics", "doc_standards", "best_practices"} <= set(targets)
+    assert "complexity" not in targets and "beginner" not in targets
+    # No selection means the full metadata, as before
+    assert {"complexity", "insights", "doc_standards"} <= set(
+        _pipeline_targets(("beginner",), None)
+    )
+
+
+def test_select_result_trims_levels_and_metadata():
+    selected = select_result(
+        RESULT, ["advanced"], ["commit_sha", "analysis.statistics"]
+    )
+    assert selected["documentation"] == {"advanced": "a"}
+    assert selected["metadata"] == {
+        "commit_sha": "abc",
+        "analysis": {"statistics": {"total_files": 3}},
+    }
+    assert select_result(RESULT, ["beginner"], None)["metadata"] == RESULT["metadata"]
+    # Levels that missed the deadline are reported, not silently dropped
+    partial = select_result(RESULT, ["beginner", "intermediate"], [])
+    assert partial["documentation"] == {"beginner": "b"}
+    assert partial["pending_levels"] == ["intermediate"]
+    failure = {"success": False, "error": "boom", "documentation": None}
+    assert select_result(failure, ["beginner"], []) == failure
+
+
+def test_later_levels_merge_into_the_stored_result():
+    newer = {
+        "success": True,
+        "repo_name": "repo",
+        "documentation": {"intermediate": "i"},
+        "metadata": {"commit_sha": "abc", "analysis": {"structure": {}}},
+    }
+    merged = _merge_results(RESULT, newer)
+
+    assert merged["documentation"] == {
+        "beginner": "b",
+        "advanced": "a",
+        "intermediate": "i",
+    }
+    assert set(merged["metadata"]["analysis"]) == {
+        "statistics",
+        "complexity",
+        "structure",
+    }
+    assert {"beginner", "advanced", "intermediate", "structure"} <= _result_stages(
+        merged
+    )
+    assert "intermediate" not in _result_stages(RESULT)
+
+
+def test_failed_stages_are_left_out_of_the_stored_result():
+    stored = _without_stages(RESULT, ["advanced", "complexity", "doc_standards"])
+
+    assert stored["documentation"] == {"beginner": "b"}
+    assert stored["metadata"]["analysis"] == {"statistics": {"total_files": 3}}
+    assert stored["metadata"]["commit_sha"] == "abc"
+    # So the next run for this commit retries them
+    assert {"advanced", "complexity"}.isdisjoint(_result_stages(stored))
+    assert _without_stages(RESULT, []) is RESULT
@@ -0,0 +1,57 @@
+import pytest
+from types import SimpleNamespace
+from app.agents.gemini_client import GeminiClient
+from app.utils.llm_cache import LLMResponseCache, llm_cache_bypass
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        return SimpleNamespace(text=f"answer #{self.calls}")
+
+
+def make_cache(tmp_path, memory_entries=8, ttl=3600):
+    return LLMResponseCache(
+        str(tmp_path / "llm.sqlite3"), 1024 * 1024, memory_entries, ttl
+    )
+
+
+def test_key_depends_on_model_prompt_and_config(tmp_path):
+    cache = make_cache(tmp_path)
+    base = cache.key("gemini-2.5-flash", "prompt", {"temperature": 0.2})
+    assert base == cache.key("gemini-2.5-flash", "prompt", {"temperature": 0.2})
+    assert base != cache.key("gemini-2.5-pro", "prompt", {"temperature": 0.2})
+    assert base != cache.key("gemini-2.5-flash", "prompt!", {"temperature": 0.2})
+    assert base != cache.key("gemini-2.5-flash", "prompt", {"temperature": 0.9})
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_memory_eviction(tmp_path):
+    cache = make_cache(tmp_path, memory_entries=1)
+    await cache.set("a", "first")
+    await cache.set("b", "second")  # pushes "a" out of memory
+
+    assert await cache.get("a") == "first"
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_serves_repeats_from_cache_unless_bypassed(tmp_path):
+    client = GeminiClient("test-key")
+    client.model = FakeModel()
+    client.cache = make_cache(tmp_path)
+
+    assert await client.generate("same prompt") == "answer #1"
+    assert await client.generate("same prompt") == "answer #1"
+
+    token = llm_cache_bypass.set(True)
+    try:
+        assert await client.generate("same prompt") == "answer #2"
+    finally:
+        llm_cache_bypass.reset(token)
+
+    assert await client.generate("same prompt") == "answer #2"
+    assert client.model.calls == 2
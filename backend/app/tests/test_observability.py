@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from app.agents.gemini_client import GeminiClient
+from app.main import app
+from app.utils import metrics, tracing
+
+client = TestClient(app)
+
+
+class FakeModel:
+    async def generate_content_async(self, prompt):
+        return SimpleNamespace(
+            text="generated docs",
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=12, candidates_token_count=34
+            ),
+        )
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram(
+        "test_seconds", "Test latency", ("stage",), buckets=(0.1, 1.0)
+    )
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value, stage="tree")
+
+    lines = histogram.render().splitlines()
+    assert lines[:2] == [
+        "# HELP test_seconds Test latency",
+        "# TYPE test_seconds histogram",
+    ]
+    assert 'test_seconds_bucket{stage="tree",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="tree",le="1"} 3' in lines
+    assert 'test_seconds_bucket{stage="tree",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="tree"} 4' in lines
+
+    with pytest.raises(ValueError):
+        histogram.observe(1.0, level="beginner")
+
+
+def test_metric_types_must_implement_samples():
+    class Unfinished(metrics._Metric):
+        kind = "gauge"
+
+    with pytest.raises(TypeError):
+        Unfinished("test_unfinished", "Never finished")
+
+
+@pytest.mark.asyncio
+async def test_spans_in_concurrent_tasks_nest_under_the_request():
+    async def stage(name):
+        with tracing.span("pipeline.stage", stage=name):
+            await asyncio.sleep(0)
+            with tracing.span("github.request", endpoint="contents"):
+                pass
+
+    with tracing.span("http.request", path="/test") as root:
+        await asyncio.gather(stage("readme"), stage("tree"))
+
+    trace = tracing.get_trace_buffer().get(root.trace_id)
+    assert trace is not None and trace.root is root
+    tree = trace.to_dict()
+    assert [s["name"] for s in tree["spans"]] == ["http.request"]
+    stages = tree["spans"][0]["children"]
+    assert sorted(s["attributes"]["stage"] for s in stages) == ["readme", "tree"]
+    assert all(s["children"][0]["name"] == "github.request" for s in stages)
+
+
+@pytest.mark.asyncio
+async def test_gemini_calls_are_attributed_to_the_enclosing_stage():
+    gemini = GeminiClient("test-key")
+    gemini.model = FakeModel()
+    gemini.cache = None
+    labels = {"agent": "doc_generator", "level": "advanced"}
+    before = metrics.LLM_TOKENS.value(kind="response", **labels)
+    calls_before = metrics.LLM_CALLS.value(outcome="ok", **labels)
+
+    with tracing.span("pipeline.stage", stage="advanced", **labels) as stage:
+        assert await gemini.generate("explain the architecture") == "generated docs"
+
+    assert metrics.LLM_CALLS.value(outcome="ok", **labels) == calls_before + 1
+    assert metrics.LLM_TOKENS.value(kind="response", **labels) == before + 34
+    call = [s for s in stage.trace.spans if s.name == "gemini.generate"][0]
+    assert call.parent is stage
+
+
+def test_requests_get_a_trace_id_and_show_up_in_metrics():
+    response = client.get("/")
+    trace_id = response.headers["x-trace-id"]
+
+    trace = client.get(f"/api/v1/traces/{trace_id}").json()
+    assert trace["spans"][0]["attributes"]["handler"] == "root"
+    assert client.get("/api/v1/traces/unknown").status_code == 404
+
+    scrape = client.get("/metrics")
+    assert scrape.status_code == 200
+    assert scrape.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "x-trace-id" not in scrape.headers  # scrapes aren't traced
+    assert (
+        'docagent_http_requests_total{method="GET",handler="root",status="200"}'
+        in scrape.text
+    )
+    assert "docagent_job_queue_depth 0" in scrape.text
@@ -0,0 +1,180 @@
+import asyncio
+import time
+import pytest
+from app.agents.pipeline import Fallback, PipelineScheduler, Stage
+
+
+async def sleep_then(value, delay):
+    await asyncio.sleep(delay)
+    return value
+
+
+def deadline_in(seconds):
+    return time.perf_counter() + seconds
+
+
+@pytest.mark.asyncio
+async def test_stage_starts_when_its_own_dependencies_finish():
+    started = []
+    scheduler = PipelineScheduler(
+        [
+            Stage("fast", lambda r: sleep_then("f", 0.01)),
+            Stage("slow", lambda r: sleep_then("s", 0.2)),
+            Stage("after_fast", lambda r: r["fast"] + "!", ["fast"]),
+            Stage("after_both", lambda r: r["fast"] + r["slow"], ["fast", "slow"]),
+        ]
+    )
+    run = await scheduler.run(on_start=started.append)
+
+    assert run["results"]["after_fast"] == "f!"
+    assert run["results"]["after_both"] == "fs"
+    # after_fast did not wait for the slow stage
+    assert started.index("after_fast") < started.index("after_both")
+    assert run["timings"]["after_fast"]["start"] < 0.1
+    assert run["timings"]["slow"]["duration"] >= 0.2
+    assert run["timings"]["total"]["duration"] >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_remaining_stages():
+    cancelled = asyncio.Event()
+
+    async def long_running(results):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def failing(results):
+        raise RuntimeError("boom")
+
+    scheduler = PipelineScheduler([Stage("long", long_running), Stage("bad", failing)])
+    with pytest.raises(RuntimeError):
+        await scheduler.run()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_targets_run_only_what_they_depend_on():
+    started = []
+    stages = [
+        Stage("tree", lambda r: "t"),
+        Stage("stats", lambda r: r["tree"] + "s", ["tree"]),
+        Stage("llm", lambda r: r["tree"] + "l", ["tree"]),
+        Stage("beginner", lambda r: r["stats"] + "b", ["stats"]),
+        Stage("advanced", lambda r: r["llm"] + "a", ["llm"]),
+    ]
+    run = await PipelineScheduler(stages, targets=["beginner"]).run(
+        on_start=started.append
+    )
+
+    assert run["results"] == {"tree": "t", "stats": "ts", "beginner": "tsb"}
+    assert started == ["tree", "stats", "beginner"]
+    with pytest.raises(ValueError):
+        PipelineScheduler(stages, targets=["missing"])
+
+
+def test_rejects_cycles_and_unknown_dependencies():
+    with pytest.raises(ValueError):
+        PipelineScheduler([Stage("a", None, ["b"]), Stage("b", None, ["a"])])
+    with pytest.raises(ValueError):
+        PipelineScheduler([Stage("a", None, ["missing"])])
+
+
+@pytest.mark.asyncio
+async def test_memoized_stages_reuse_outputs_when_inputs_unchanged():
+    calls = []
+
+    def stages(source):
+        def record(name, value):
+            calls.append(name)
+            return value
+
+        return [
+            Stage("source", lambda r: source),
+            Stage(
+                "length",
+                lambda r: record("length", len(r["source"]["text"])),
+                ["source"],
+            ),
+            Stage(
+                "title",
+                lambda r: record("title", r["source"]["title"].upper()),
+                ["source"],
+                inputs=lambda r: r["source"]["title"],
+            ),
+        ]
+
+    first = await PipelineScheduler(
+        stages({"title": "a", "text": "xx", "ref": "sha1"})
+    ).run()
+    memo = {
+        name: {"key": key, "value": first["results"][name]}
+        for name, key in first["keys"].items()
+    }
+
+    # Only the text changed (the ref is volatile and ignored)
+    calls.clear()
+    second = await PipelineScheduler(
+        stages({"title": "a", "text": "xxx", "ref": "sha2"})
+    ).run(memo=memo)
+
+    assert calls == ["length"]
+    assert second["reused"] == ["title"]
+    assert second["results"] == {
+        "source": {"title": "a", "text": "xxx", "ref": "sha2"},
+        "length": 3,
+        "title": "A",
+    }
+
+
+@pytest.mark.asyncio
+async def test_stages_past_their_timeout_or_the_deadline_are_pending():
+    loop_time = asyncio.get_running_loop().time
+    stages = [
+        Stage("tree", lambda r: "t"),
+        Stage("hung", lambda r: sleep_then("h", 10), ["tree"], timeout=0.05),
+        Stage("after_hung", lambda r: r["hung"] + "!", ["hung"]),
+        Stage("slow", lambda r: sleep_then("s", 10), ["tree"]),
+        Stage("quick", lambda r: sleep_then("q", 0.01), ["tree"]),
+    ]
+    started = loop_time()
+    run = await PipelineScheduler(stages).run(deadline=deadline_in(0.2))
+
+    assert loop_time() - started < 1
+    assert run["results"] == {"tree": "t", "quick": "q"}
+    assert run["pending"] == ["hung", "after_hung", "slow"]
+
+
+@pytest.mark.asyncio
+async def test_timeouts_raised_inside_a_stage_still_fail_the_run():
+    async def github_timeout(results):
+        raise asyncio.TimeoutError()
+
+    scheduler = PipelineScheduler([Stage("tree", github_timeout, timeout=10)])
+    with pytest.raises(asyncio.TimeoutError):
+        await scheduler.run(deadline=deadline_in(10))
+
+
+@pytest.mark.asyncio
+async def test_fallbacks_feed_later_stages_but_are_never_memoized():
+    stages = [
+        Stage("tree", lambda r: "t"),
+        Stage("llm", lambda r: Fallback("Error: quota", "quota"), ["tree"]),
+        Stage("advanced", lambda r: r["llm"] + "!", ["llm"]),
+        Stage("stats", lambda r: r["tree"] + "s", ["tree"]),
+    ]
+    run = await PipelineScheduler(stages).run()
+
+    assert run["results"]["advanced"] == "Error: quota!"
+    assert run["failed"] == ["llm", "advanced"]
+    assert set(run["keys"]) == {"stats"}
+
+    # A later run with the same inputs computes them again
+    memo = {name: {"key": key, "value": "stored"} for name, key in run["keys"].items()}
+    stages[1] = Stage("llm", lambda r: "ok", ["tree"])
+    again = await PipelineScheduler(stages).run(memo=memo)
+    assert again["reused"] == ["stats"]
+    assert again["results"]["advanced"] == "ok!"
+    assert again["failed"] == []
@@ -0,0 +1,68 @@
+import pytest
+from app.agents.prompt_packer import PromptPacker, estimate_tokens, truncate_to_tokens
+
+
+def file(path, size=100):
+    return {"type": "file", "name": path.rsplit("/", 1)[-1], "path": path, "size": size}
+
+
+def test_selects_manifests_then_entry_points_then_source():
+    contents = [
+        file("README.md"),
+        file("docs.md"),
+        file("src/util.py", 5000),
+        file("src/main.py"),
+        file("package.json"),
+        {
+            "type": "directory",
+            "name": "lib",
+            "path": "lib",
+            "children": [file("lib/helpers.py", 200)],
+        },
+    ]
+    paths = PromptPacker().select_files(contents, limit=4)
+    assert paths == ["package.json", "src/main.py", "src/util.py", "lib/helpers.py"]
+
+
+def test_truncation_respects_the_token_estimate():
+    text = "\n".join("line number %d of the file" % i for i in range(500))
+    cut = truncate_to_tokens(text, 100)
+    assert estimate_tokens(cut) <= 110
+    assert cut.endswith("[...truncated]")
+
+
+@pytest.mark.asyncio
+async def test_small_repo_fits_without_summary_calls():
+    calls = []
+
+    async def summarize(prompt):
+        calls.append(prompt)
+        return "summary"
+
+    context = await PromptPacker(budget_tokens=1000).build_context(
+        "# Demo\nIntro\n## Usage\nRun it", {"main.py": "print('hi')"}, summarize
+    )
+    assert calls == []
+    assert context["map_calls"] == 0
+    assert "print('hi')" in context["text"]
+    assert context["included"] == ["README: Demo", "README: Usage", "main.py"]
+
+
+@pytest.mark.asyncio
+async def test_large_repo_uses_a_bounded_number_of_summary_calls():
+    calls = []
+
+    async def summarize(prompt):
+        calls.append(prompt)
+        return "summary of chunk"
+
+    sources = {f"src/module_{i}.py": "x = 1\n" * 400 for i in range(30)}
+    packer = PromptPacker(budget_tokens=1000, max_map_calls=3, max_file_tokens=300)
+    context = await packer.build_context("# Demo\nIntro", sources, summarize)
+
+    assert len(calls) == 3
+    assert context["map_calls"] == 3
+    # The README intro outranks source files for the verbatim half
+    assert context["included"][0] == "README: Demo"
+    assert "summary of chunk" in context["text"]
+    assert estimate_tokens(context["text"]) <= 1100
@@ -0,0 +1,159 @@
+import asyncio
+import time
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.mcp_servers.github_client import (
+    GitHubClient,
+    GitHubClientPool,
+    GitHubRateLimitError,
+)
+from app.mcp_servers.quota import QuotaTracker
+
+
+def rate_headers(remaining, reset_at, limit=5000):
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(int(reset_at)),
+        "X-RateLimit-Resource": "core",
+    }
+
+
+def test_tracker_reads_headers_and_reservations():
+    tracker = QuotaTracker()
+    assert tracker.available() is None
+
+    reset_at = time.time() + 600
+    tracker.update(rate_headers(40, reset_at))
+    tracker.update(rate_headers(42, reset_at))  # late, stale response
+    tracker.update(
+        dict(rate_headers(1, reset_at), **{"X-RateLimit-Resource": "search"})
+    )
+    assert tracker.calls_left() == 40
+
+    tracker.reserved = 15
+    assert tracker.available() == 25
+
+    # Once the window has passed, the full limit is back
+    tracker.update(rate_headers(0, time.time() - 1))
+    assert tracker.calls_left() == 5000
+
+
+async def quota_server(remaining, reset_in):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.path)
+        headers = rate_headers(remaining, time.time() + reset_in)
+        return web.json_response({"ok": True}, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/repos/o/r", handler)
+    return TestServer(app), calls
+
+
+def make_client(server, max_wait=900):
+    client = GitHubClient()
+    client.cache = None
+    client.api_base = str(server.make_url("")).rstrip("/")
+    client.max_quota_wait = max_wait
+    return client
+
+
+@pytest.mark.asyncio
+async def test_exhausted_quota_waits_for_reset_instead_of_failing():
+    server, calls = await quota_server(remaining=0, reset_in=1)
+    async with server:
+        client = make_client(server)
+        await client.get_json("/repos/o/r")
+        started = time.monotonic()
+        await client.get_json("/repos/o/r")
+        waited = time.monotonic() - started
+        await client.close()
+
+    assert len(calls) == 2
+    assert waited >= 1
+
+
+@pytest.mark.asyncio
+async def test_waits_longer_than_the_limit_fail():
+    server, _ = await quota_server(remaining=3, reset_in=3600)
+    async with server:
+        client = make_client(server, max_wait=60)
+        await client.get_json("/repos/o/r")
+        with pytest.raises(GitHubRateLimitError):
+            async with client.budget(10):
+                pass
+        # Small fetches still fit in what is left
+        async with client.budget(3):
+            assert client.quota.available() == 0
+        await client.close()
+
+
+def test_pool_prefers_the_token_with_most_headroom():
+    low, high = GitHubClient("a"), GitHubClient("b")
+    pool = GitHubClientPool([low, high])
+    reset_at = time.time() + 600
+    low.quota.update(rate_headers(10, reset_at))
+    high.quota.update(rate_headers(900, reset_at))
+
+    assert pool._pick() is high
+    high.quota.reserved = 895
+    assert pool._pick() is low
+    assert pool.rate_limit_remaining() == 910
+    # Both tokens share one ETag cache namespace
+    assert low._cache_identity == high._cache_identity
+
+
+async def pick(pool):
+    await asyncio.sleep(0)
+    return pool._pick()
+
+
+@pytest.mark.asyncio
+async def test_pool_sends_budgeted_calls_to_the_reserved_token():
+    a, b = GitHubClient("a"), GitHubClient("b")
+    pool = GitHubClientPool([a, b])
+    reset_at = time.time() + 600
+    a.quota.update(rate_headers(100, reset_at))
+    b.quota.update(rate_headers(80, reset_at))
+    outside = GitHubClientPool([GitHubClient("c")])
+
+    async with pool.budget(50):
+        assert a.quota.reserved == 50
+        # a now has less headroom than b, but the fetch is budgeted on a
+        assert pool._pick() is a
+        picks = await asyncio.gather(*(pick(pool) for _ in range(5)))
+        assert all(client is a for client in picks)
+        # Other pools are not affected
+        assert outside._pick() is outside.clients[0]
+    assert a.quota.reserved == 0
+
+
+@pytest.mark.asyncio
+async def test_overlapping_budgets_that_fit_the_quota_do_not_wait():
+    remaining = 10
+    reset_at = time.time() + 3600
+
+    async def handler(request):
+        nonlocal remaining
+        remaining -= 1
+        return web.json_response({}, headers=rate_headers(remaining, reset_at))
+
+    app = web.Application()
+    app.router.add_get("/repos/o/r", handler)
+    async with TestServer(app) as server:
+        client = make_client(server, max_wait=60)
+        await client.get_json("/repos/o/r")  # learn the quota: 9 left
+
+        async with client.budget(5):
+            for _ in range(3):
+                await client.get_json("/repos/o/r")
+            # 6 left, 2 of them still reserved: room for a 4-call fetch
+            assert client.quota.available() == 4
+            async with client.budget(4):
+                await asyncio.gather(*(client.get_json("/repos/o/r") for _ in range(4)))
+            assert client.quota.reserved == 2
+        assert client.quota.reserved == 0
+        await client.close()
@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from app.utils.rate_limiter import (
+    AdaptiveRateLimiter,
+    TokenBucket,
+    is_retryable_error,
+    start_call_stats,
+)
+
+
+class Throttled(Exception):
+    code = 429
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+def test_token_bucket_reports_wait_until_refilled():
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+    assert bucket.wait_time(2) == 0
+    bucket.take(2)
+    assert 0.9 < bucket.wait_time(1) <= 1.0
+
+
+def test_retryable_errors():
+    assert is_retryable_error(Throttled())
+    assert is_retryable_error(asyncio.TimeoutError())
+    assert not is_retryable_error(BadRequest())
+
+
+@pytest.mark.asyncio
+async def test_retries_throttling_and_halves_concurrency():
+    limiter = AdaptiveRateLimiter(600, 10**6, max_concurrency=8, base_delay=0.01)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Throttled()
+        return "ok"
+
+    stats = start_call_stats()
+    assert await limiter.call(flaky, tokens=10) == "ok"
+    assert len(attempts) == 3
+    assert stats["calls"] == 3 and stats["retries"] == 2
+    # Two throttles halve the limit twice; the success adds a little back
+    assert 2 <= limiter.limit < 3
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_fail_immediately():
+    limiter = AdaptiveRateLimiter(600, 10**6)
+
+    async def bad():
+        raise BadRequest()
+
+    with pytest.raises(BadRequest):
+        await limiter.call(bad)
+    assert limiter.retries == 0
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_queues_extra_calls():
+    limiter = AdaptiveRateLimiter(6000, 10**6, max_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def work():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+
+    stats = start_call_stats()
+    await asyncio.gather(*(limiter.call(work) for _ in range(6)))
+    assert peak == 2
+    assert stats["max_queue_seconds"] >= 0.03
+
+
+@pytest.mark.asyncio
+async def test_request_bucket_spaces_out_calls():
+    # 120/minute with a burst of 60: the 61st call waits ~0.5s
+    limiter = AdaptiveRateLimiter(120, 10**6, max_concurrency=100)
+
+    async def noop():
+        return None
+
+    started = asyncio.get_running_loop().time()
+    await asyncio.gather(*(limiter.call(noop) for _ in range(61)))
+    assert asyncio.get_running_loop().time() - started >= 0.45
+
+
+@pytest.mark.asyncio
+async def test_held_slots_bound_results_consumed_after_the_call():
+    limiter = AdaptiveRateLimiter(6000, 10**6, max_concurrency=2)
+    reading = 0
+    peak = 0
+
+    async def open_stream():
+        return "stream"
+
+    async def consume():
+        nonlocal reading, peak
+        async with limiter.hold(open_stream) as stream:
+            assert stream == "stream"
+            reading += 1
+            peak = max(peak, reading)
+            await asyncio.sleep(0.02)
+            reading -= 1
+
+    await asyncio.gather(*(consume() for _ in range(5)))
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_closing_a_held_result_early_frees_the_slot():
+    limiter = AdaptiveRateLimiter(6000, 10**6, max_concurrency=1)
+
+    async def open_stream():
+        return None
+
+    async def chunks():
+        async with limiter.hold(open_stream):
+            for i in range(3):
+                yield i
+
+    stream = chunks()
+    assert await stream.__anext__() == 0
+    assert limiter.in_flight == 1
+    await stream.aclose()
+    assert limiter.in_flight == 0
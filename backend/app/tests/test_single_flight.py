@@ -0,0 +1,156 @@
+import asyncio
+import time
+import pytest
+from app.agents.orchestrator import AgentOrchestrator
+from app.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_run_and_its_events():
+    flight = SingleFlight()
+    runs = 0
+    release = asyncio.Event()
+
+    async def pipeline(broadcast):
+        nonlocal runs
+        runs += 1
+        broadcast("fetching")
+        await release.wait()
+        return {"success": True}
+
+    seen = [[], [], []]
+    callers = [
+        asyncio.create_task(flight.do("repo@sha", pipeline, listener=events.append))
+        for events in seen
+    ]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*callers)
+
+    assert runs == 1
+    assert results == [{"success": True}] * 3
+    assert seen[0] == ["fetching"]
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_run():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def pipeline(broadcast):
+        await release.wait()
+        return "done"
+
+    leaver = asyncio.create_task(flight.do("key", pipeline))
+    stayer = asyncio.create_task(flight.do("key", pipeline))
+    await asyncio.sleep(0.01)
+
+    leaver.cancel()
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await stayer == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await leaver
+
+
+@pytest.mark.asyncio
+async def test_run_is_cancelled_once_every_caller_left():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def pipeline(broadcast):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    caller = asyncio.create_task(flight.do("key", pipeline))
+    await started.wait()
+    caller.cancel()
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_joiners_share_only_matching_runs_and_keep_their_own_deadline():
+    orchestrator = AgentOrchestrator("test-key")
+    release = asyncio.Event()
+    runs = []
+
+    async def resolve_head(repo_url, deadline):
+        return {"repo_url": repo_url, "sha": "abc", "resolved_at": 0.0}
+
+    async def run_pipeline(repo_url, sha, ingestion_mode, bypass_cache, *args, **kw):
+        runs.append((ingestion_mode, bypass_cache))
+        await release.wait()
+        return {"success": True, "documentation": {"beginner": "b"}, "metadata": {}}
+
+    orchestrator._resolve_head = resolve_head
+    orchestrator._run_pipeline = run_pipeline
+
+    def generate(**options):
+        return asyncio.create_task(
+            orchestrator.generate_documentation(
+                "https://github.com/org/repo", levels=["beginner"], **options
+            )
+        )
+
+    first = generate(deadline_seconds=10)
+    hurried = generate(deadline_seconds=0.05)
+    bypassing = generate(deadline_seconds=10, bypass_cache=True)
+    archive = generate(deadline_seconds=10, ingestion_mode="archive")
+
+    timed_out = await asyncio.wait_for(hurried, timeout=1)
+    assert timed_out["success"] is False
+    assert timed_out["pending_levels"] == ["beginner"]
+
+    # The hurried caller left; the run it joined keeps going for the first
+    release.set()
+    results = await asyncio.gather(first, bypassing, archive)
+    assert all(result["documentation"] == {"beginner": "b"} for result in results)
+    assert sorted(runs, key=str) == sorted(
+        [(None, False), (None, True), ("archive", False)], key=str
+    )
+
+
+@pytest.mark.asyncio
+async def test_a_later_deadline_starts_its_own_run_instead_of_joining():
+    orchestrator = AgentOrchestrator("test-key")
+    deadlines = []
+
+    async def resolve_head(repo_url, deadline):
+        return {"repo_url": repo_url, "sha": "abc", "resolved_at": 0.0}
+
+    async def run_pipeline(repo_url, sha, mode, bypass, targets, deadline, *args, **kw):
+        deadlines.append(deadline)
+        # Runs until just before its deadline, with whatever it got done
+        await asyncio.sleep(max(0.0, deadline - time.perf_counter() - 0.1))
+        done = {"beginner": "b"} if len(deadlines) > 1 else {}
+        return {"success": True, "documentation": done, "metadata": {}}
+
+    orchestrator._resolve_head = resolve_head
+    orchestrator._run_pipeline = run_pipeline
+
+    def generate(deadline_seconds):
+        return asyncio.create_task(
+            orchestrator.generate_documentation(
+                "https://github.com/org/repo",
+                levels=["beginner"],
+                deadline_seconds=deadline_seconds,
+            )
+        )
+
+    hurried = generate(0.05)
+    await asyncio.sleep(0)
+    patient = generate(1.3)
+    hurried_result, patient_result = await asyncio.gather(hurried, patient)
+
+    assert len(deadlines) == 2 and deadlines[1] - deadlines[0] > 1
+    assert hurried_result["pending_levels"] == ["beginner"]
+    assert patient_result["documentation"] == {"beginner": "b"}
+    assert patient_result["pending_levels"] == []
@@ -0,0 +1,124 @@
+import json
+import pytest
+from app.analysis.stacks import StackDetector, load_rules, primary
+from app.analysis.tree_index import TreeIndex
+from app.mcp_servers.github_mcp import GitHubMCP
+
+
+def index_of(*paths):
+    index = TreeIndex()
+    for path in paths:
+        index.insert(path, is_dir=False, size=100)
+    return index
+
+
+def git_tree(*paths):
+    """A recursive git trees listing, with parent directories"""
+    entries = {}
+    for path in paths:
+        parts = path.split("/")
+        for depth in range(1, len(parts)):
+            entries["/".join(parts[:depth])] = {"type": "tree"}
+        entries[path] = {"type": "blob", "size": 100}
+    return [dict(entry, path=path, sha=path) for path, entry in sorted(entries.items())]
+
+
+@pytest.mark.parametrize(
+    "paths, stack, manifest",
+    [
+        (
+            ("go.mod", "go.sum", "main.go", "internal/server/server.go", "LICENSE"),
+            "Go",
+            "go.mod",
+        ),
+        (
+            (
+                "pom.xml",
+                "mvnw",
+                ".mvn/wrapper/maven-wrapper.properties",
+                "src/main/java/com/acme/App.java",
+            ),
+            "Java/Maven",
+            "pom.xml",
+        ),
+        (("requirements.txt", "app.py", "Procfile"), "Python", "requirements.txt"),
+    ],
+)
+def test_manifests_reach_the_detector_through_the_tree_builder(paths, stack, manifest):
+    # One source file each: only the manifests and lockfiles can tell
+    contents = GitHubMCP()._build_nested_tree(git_tree(*paths), "o", "r", "sha", 3)
+    report = StackDetector(load_rules()).detect(TreeIndex.from_contents(contents))
+    stacks = {found["name"]: found for found in report["stacks"]}
+
+    assert stack in stacks
+    assert manifest in stacks[stack]["evidence"]
+
+
+def test_monorepo_with_nested_manifests_is_detected():
+    index = index_of(
+        "pnpm-workspace.yaml",
+        "packages/web/package.json",
+        "packages/web/tsconfig.json",
+        "packages/web/src/App.tsx",
+        "packages/web/src/main.tsx",
+        "packages/api/package.json",
+        "packages/api/src/server.ts",
+        "packages/shared/package.json",
+        "tools/codegen/pyproject.toml",
+    )
+    report = StackDetector(load_rules()).detect(index)
+    stacks = {stack["name"]: stack for stack in report["stacks"]}
+
+    # Nothing at the top level said Node, yet every stack is found
+    assert {"Node.js/JavaScript", "TypeScript", "React", "Python"} <= set(stacks)
+    assert stacks["Node.js/JavaScript"]["evidence"][0].endswith("package.json")
+    assert report["project_types"][0]["name"] == "Monorepo"
+    assert report["project_types"][0]["confidence"] > 0.9
+    assert primary(report["stacks"], ("framework", "platform")) == "React"
+
+
+def test_confidence_grows_with_evidence_and_root_scope_is_respected():
+    detector = StackDetector(load_rules())
+    weak = detector.detect(index_of("scripts/a.py", "scripts/b.py", "scripts/c.py"))
+    strong = detector.detect(
+        index_of("pyproject.toml", "requirements.txt", "src/app/main.py")
+    )
+
+    assert weak["stacks"][0]["name"] == "Python"
+    assert weak["stacks"][0]["confidence"] < strong["stacks"][0]["confidence"]
+    # "src" only counts as an application layout at the top level
+    nested = detector.detect(index_of("vendor/src/x.c"))
+    assert nested["project_types"] == []
+    assert strong["project_types"][0]["name"] == "Application"
+
+
+def test_extra_rules_extend_and_override_without_code_changes(tmp_path):
+    extra = tmp_path / "rules.json"
+    extra.write_text(
+        json.dumps(
+            {
+                "stacks": [
+                    {
+                        "name": "Bazel",
+                        "kind": "tooling",
+                        "signals": [
+                            {"file": ["WORKSPACE", "BUILD.bazel"], "weight": 0.9}
+                        ],
+                    },
+                    {
+                        "name": "Python",
+                        "kind": "platform",
+                        "signals": [{"extension": "pyx", "weight": 0.8}],
+                    },
+                ]
+            }
+        )
+    )
+    detector = StackDetector(load_rules(str(extra)))
+    report = detector.detect(index_of("WORKSPACE", "src/fast.pyx", "setup.py"))
+
+    names = [stack["name"] for stack in report["stacks"]]
+    assert "Bazel" in names
+    # The override replaced the built-in Python rule (setup.py no longer counts)
+    python = next(stack for stack in report["stacks"] if stack["name"] == "Python")
+    assert python["evidence"] == ["src/fast.pyx"]
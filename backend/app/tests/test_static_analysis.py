@@ -0,0 +1,136 @@
+import pytest
+from app.analysis.engine import StaticAnalyzer, summarize
+from app.analysis.metrics import analyze_file
+from app.utils.disk_cache import DiskCache
+
+PYTHON_SOURCE = '''"""Module docstring"""
+import os
+
+__all__ = ["run"]
+
+
+def run(items):
+    # Keep only truthy items
+    for item in items:
+        if item and os.path.exists(item):
+            yield item
+
+
+class _Helper:
+    pass
+'''
+
+TS_SOURCE = """// Entry point
+export function greet(name: string) {
+  const url = "http://example.com"; // not a comment start above
+  if (name) {
+    return `hi ${name}`;
+  }
+  return name ? name : "anon";
+}
+
+/* block
+   comment */
+export class Greeter {}
+"""
+
+GO_SOURCE = """package main
+
+// Exported helper
+func Run(n int) int {
+	if n > 0 && n < 10 {
+		return n
+	}
+	return 0
+}
+
+func helper() {}
+"""
+
+RUST_SOURCE = """/// Docs
+pub fn longest<'a>(x: &'a str, y: &'a str) -> &'a str {
+    if x.len() > y.len() { x } else { y }
+}
+
+struct Point { x: i32 }
+"""
+
+
+def test_python_metrics_come_from_the_ast():
+    metrics = analyze_file("app/run.py", PYTHON_SOURCE)
+    assert metrics["language"] == "Python"
+    assert metrics["comment_lines"] == 2
+    assert metrics["sloc"] == 8
+    assert metrics["functions"] == 1
+    assert metrics["classes"] == 1
+    # 1 + for + if + and
+    assert metrics["complexity"] == 4
+    assert metrics["public_api"] == 1
+
+
+def test_c_style_metrics_ignore_comment_markers_in_strings():
+    metrics = analyze_file("src/greet.ts", TS_SOURCE)
+    assert metrics["language"] == "TypeScript"
+    assert metrics["comment_lines"] == 3
+    assert metrics["sloc"] == 8
+    assert metrics["functions"] == 1
+    assert metrics["classes"] == 1
+    assert metrics["public_api"] == 2
+    # 1 + if + ternary
+    assert metrics["complexity"] == 3
+
+
+def test_go_and_rust_metrics():
+    go = analyze_file("main.go", GO_SOURCE)
+    assert (go["functions"], go["public_api"], go["complexity"]) == (2, 1, 3)
+
+    rust = analyze_file("src/lib.rs", RUST_SOURCE)
+    # Lifetimes are not character literals
+    assert rust["sloc"] == 4
+    assert (rust["functions"], rust["classes"], rust["public_api"]) == (1, 1, 1)
+    assert rust["complexity"] == 2
+
+
+@pytest.mark.asyncio
+async def test_metrics_are_memoized_by_blob_sha(tmp_path):
+    cache = DiskCache(str(tmp_path / "metrics.sqlite3"), 1024 * 1024)
+    analyzer = StaticAnalyzer(workers=1, cache=cache)
+    files = {"app/run.py": ("sha1", PYTHON_SOURCE), "main.go": ("sha2", GO_SOURCE)}
+
+    first = await analyzer.analyze(files)
+    assert first["analyzed_files"] == 2
+    assert first["cached_files"] == 0
+
+    # Same blobs under new content: the memoized metrics win
+    second = await analyzer.analyze({p: (sha, "") for p, (sha, _) in files.items()})
+    assert second["cached_files"] == 2
+    assert second["sloc"] == first["sloc"]
+    assert second["most_complex_files"][0]["path"] == "app/run.py"
+
+
+@pytest.mark.asyncio
+async def test_large_batches_run_in_the_process_pool():
+    analyzer = StaticAnalyzer(workers=2)
+    files = {f"src/m{i}.py": (None, PYTHON_SOURCE) for i in range(40)}
+    try:
+        summary = await analyzer.analyze(files)
+    finally:
+        analyzer.close()
+    assert summary["analyzed_files"] == 40
+    assert summary["sloc"] == 40 * 8
+    assert summary["languages"]["Python"]["files"] == 40
+
+
+def test_summary_counts_only_analyzed_source_files():
+    per_file = {
+        "app/run.py": analyze_file("app/run.py", PYTHON_SOURCE),
+        "README.md": analyze_file("README.md", "# Title\n\nSome text\n"),
+        "broken.py": {"language": "Python", "error": "unreadable"},
+    }
+    summary = summarize(per_file)
+    alone = summarize({"app/run.py": per_file["app/run.py"]})
+
+    assert summary["analyzed_files"] == 1
+    assert summary["sloc"] == alone["sloc"] == 8
+    assert summary["comment_ratio"] == alone["comment_ratio"]
+    assert set(summary["languages"]) == {"Python"}
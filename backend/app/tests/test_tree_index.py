@@ -0,0 +1,73 @@
+from app.agents.code_analyzer import CodeAnalyzerAgent
+from app.analysis.tree_index import TreeIndex
+
+CONTENTS = [
+    {"type": "file", "name": "package.json", "path": "package.json", "size": 120},
+    {
+        "type": "directory",
+        "name": "src",
+        "path": "src",
+        "children": [
+            {
+                "type": "file",
+                "name": "index.ts",
+                "path": "src/index.ts",
+                "size": 500,
+                "sha": "abc",
+            },
+            {
+                "type": "directory",
+                "name": "lib",
+                "path": "src/lib",
+                "children": [
+                    {
+                        "type": "file",
+                        "name": "index.ts",
+                        "path": "src/lib/index.ts",
+                        "size": 250,
+                    },
+                ],
+            },
+        ],
+    },
+    {"type": "directory", "name": "tests", "path": "tests", "children": []},
+]
+
+
+def test_index_answers_lookups_without_walking_the_tree():
+    index = TreeIndex.from_contents(CONTENTS)
+
+    assert index.file_count == 3
+    assert sorted(index.paths()) == ["package.json", "src/index.ts", "src/lib/index.ts"]
+    assert sorted(index.with_name("index.ts")) == ["src/index.ts", "src/lib/index.ts"]
+    assert index.extension_counts() == {"json": 1, "ts": 2}
+    assert index.sha("src/index.ts") == "abc"
+    assert index.find("src/missing.ts") is None
+    assert sorted(index.top_level(directories=True)) == ["src", "tests"]
+    # Path components are stored once
+    first, second = index.by_name["index.ts"]
+    assert index.names[first] is index.names[second]
+
+
+def test_digest_tracks_content():
+    same = TreeIndex.from_contents(CONTENTS).digest
+    assert TreeIndex.from_contents(CONTENTS).digest == same
+
+    changed = TreeIndex.from_contents(CONTENTS)
+    changed.insert("src/new.ts", is_dir=False, size=1)
+    assert changed.digest != same
+
+
+def test_analysis_reads_the_index():
+    analyzer = CodeAnalyzerAgent("test-key")
+    repo_data = {"contents": CONTENTS, "language": "TypeScript"}
+    repo_data["index"] = TreeIndex.from_contents(CONTENTS)
+
+    stats = analyzer._compute_statistics(repo_data)
+    assert stats["total_files"] == 3
+    assert stats["estimated_lines"] == 120 // 50 + 500 // 50 + 250 // 50
+
+    structure = analyzer._analyze_structure(repo_data)
+    assert structure["has_tests"] is True
+    assert structure["detected_framework"] == "Node.js/JavaScript"
+    assert structure["project_type"] == "Application"
@@ -0,0 +1,47 @@
+from functools import lru_cache
+from typing import Dict, Optional
+from ..config import get_settings
+from .disk_cache import DiskCache
+import asyncio
+import json
+import zlib
+
+
+class ArtifactStore:
+    """
+    Last processed commit and pipeline artifacts, per repository
+
+    PITFALL: Every regeneration starts from scratch even when the previous
+    run already did most of the work for an almost identical commit
+    SOLUTION: Keep the last commit SHA, each stage's input key and output,
+    and the final result, so the next run can diff against it
+
+    Records are JSON, compressed, in a size-bounded DiskCache.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.disk = DiskCache(path, max_bytes)
+
+    def key(self, repo_url: str, ingestion_mode: Optional[str]) -> str:
+        # Trees differ per ingestion mode, so each mode has its own record
+        return f"{repo_url}#{ingestion_mode or 'default'}"
+
+    async def load(self, key: str) -> Optional[Dict]:
+        raw = await asyncio.to_thread(self.disk.get, key)
+        if raw is None:
+            return None
+        return json.loads(zlib.decompress(raw))
+
+    async def save(self, key: str, record: Dict):
+        raw = zlib.compress(json.dumps(record).encode("utf-8"))
+        await asyncio.to_thread(self.disk.set, key, raw)
+
+
+@lru_cache()
+def get_artifact_store() -> Optional[ArtifactStore]:
+    settings = get_settings()
+    if not settings.incremental_enabled:
+        return None
+    return ArtifactStore(
+        settings.artifact_store_path, settings.artifact_store_max_mb * 1024 * 1024
+    )
@@ -0,0 +1,117 @@
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+BatchRun = Callable[[str, Dict], Awaitable[Dict]]
+
+
+class BatchRunner:
+    """
+    Generates documentation for many repos under one global concurrency cap
+
+    PITFALL: Documenting an org one /generate call at a time (or all at
+    once) either takes forever or bursts past the GitHub and Gemini quotas
+    SOLUTION: Every batch, from every client, draws from the same pool of
+    slots; repos share the orchestrator and its HTTP pools, caches and
+    rate limiters, and each result is yielded the moment it's ready
+    """
+
+    def __init__(self, run: BatchRun, max_concurrency: int = 4):
+        self.run = run
+        self.max_concurrency = max_concurrency
+        self.logger = logging.getLogger(__name__)
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _bind_loop(self):
+        # Semaphores belong to one event loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def stream(
+        self,
+        repo_urls: List[str],
+        options: Optional[Dict] = None,
+        normalize: Callable[[str], str] = lambda url: url,
+    ) -> AsyncIterator[Dict]:
+        """
+        Yield {"index", "repo_url", ...result} per repo as each finishes
+
+        A failing repo yields {"success": False, "error"} and the batch goes
+        on. Repos listed twice are generated once. Stopping the iteration
+        (e.g. the client disconnected) cancels the repos still pending.
+        """
+        self._bind_loop()
+        options = options or {}
+        indices: Dict[str, List[int]] = {}
+        for index, url in enumerate(repo_urls):
+            try:
+                key = normalize(url)
+            except Exception:
+                key = url  # Reported as that repo's error when it runs
+            indices.setdefault(key, []).append(index)
+
+        tasks = {
+            asyncio.create_task(self._run_one(repo_urls[positions[0]], options)): key
+            for key, positions in indices.items()
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    result = task.result()
+                    for index in indices[tasks[task]]:
+                        yield dict(result, index=index, repo_url=repo_urls[index])
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _run_one(self, repo_url: str, options: Dict) -> Dict:
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        started = time.perf_counter()
+        try:
+            result = await self.run(repo_url, options)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # One repo's failure must not end the batch
+            self.logger.error(f"Batch repo {repo_url} failed: {str(e)}")
+            result = {"success": False, "error": str(e)}
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+        if result.get("success"):
+            self.completed += 1
+        else:
+            self.failed += 1
+        return dict(
+            result,
+            repo_url=repo_url,
+            duration_seconds=round(time.perf_counter() - started, 3),
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
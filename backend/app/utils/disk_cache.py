@@ -0,0 +1,122 @@
+from typing import Optional
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Size-bounded key/value store backed by SQLite
+
+    PITFALL: An unbounded on-disk cache eventually fills the volume
+    SOLUTION: Track entry sizes and evict least-recently-used entries
+    once the total passes max_bytes
+
+    Methods are blocking; call them through asyncio.to_thread from async code.
+    """
+
+    def __init__(self, path: str, max_bytes: int, default_ttl: Optional[float] = None):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                expires_at REAL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored value, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """Store a value and evict old entries if the store is over budget"""
+        if len(value) > self.max_bytes:
+            return
+
+        ttl = ttl if ttl is not None else self.default_ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access, expires_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, expires_at),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used until under budget"""
+        self._conn.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),),
+        )
+        excess = self._total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+
+        freed = 0
+        rows = self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC, rowid ASC"
+        ).fetchall()
+        for key, size in rows:
+            if freed >= excess:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            freed += size
+        self.logger.debug(f"Evicted {freed} bytes from {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
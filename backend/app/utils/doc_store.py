@@ -0,0 +1,108 @@
+from functools import lru_cache
+from typing import Dict, Optional
+from ..config import get_settings
+from .disk_cache import DiskCache
+import asyncio
+import json
+import time
+import zlib
+
+
+class DocStore:
+    """
+    Generated documentation per repository and commit, plus the latest
+
+    PITFALL: Docs are returned once and lost, so viewing a repo again
+    re-runs the whole pipeline
+    SOLUTION: Keep every generated version under (repo, commit SHA) and a
+    small "latest" pointer per repo. The pointer carries what an HTTP
+    revalidation needs (commit, generation time, when the branch was last
+    checked), so a 304 never reads the docs themselves
+
+    Records are JSON, compressed, in a size-bounded DiskCache; old
+    versions age out least-recently-used first.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.disk = DiskCache(path, max_bytes)
+
+    async def latest(self, repo_url: str) -> Optional[Dict]:
+        """
+        {"commit_sha", "generated_at", "checked_at", "resolved_at"} of the
+        newest version
+        """
+        return await self._load(f"latest:{repo_url}")
+
+    async def get(self, repo_url: str, commit_sha: str) -> Optional[Dict]:
+        """{"commit_sha", "generated_at", "result"} stored for one commit"""
+        return await self._load(f"docs:{repo_url}@{commit_sha}")
+
+    async def put(
+        self,
+        repo_url: str,
+        commit_sha: str,
+        result: Dict,
+        resolved_at: Optional[float] = None,
+    ) -> Dict:
+        """
+        Store a version and make it the latest; returns the latest pointer
+
+        resolved_at is when commit_sha was read as the branch head (default:
+        now). A run for an older head can finish after one for a newer
+        head, so the pointer only moves to versions resolved no earlier
+        than the one it points at.
+        """
+        now = time.time()
+        resolved_at = now if resolved_at is None else resolved_at
+        await self._save(
+            f"docs:{repo_url}@{commit_sha}",
+            {"commit_sha": commit_sha, "generated_at": now, "result": result},
+        )
+        current = await self.latest(repo_url)
+        if (
+            current is not None
+            and current["commit_sha"] != commit_sha
+            and current.get("resolved_at", current["generated_at"]) > resolved_at
+        ):
+            return current
+        pointer = {
+            "commit_sha": commit_sha,
+            "generated_at": now,
+            "checked_at": now,
+            "resolved_at": resolved_at,
+        }
+        await self._save(f"latest:{repo_url}", pointer)
+        return pointer
+
+    async def touch(self, repo_url: str, commit_sha: str):
+        """Record that the default branch was still at commit_sha just now"""
+        pointer = await self.latest(repo_url)
+        # A newer version may have landed while the branch was checked
+        if pointer is None or pointer["commit_sha"] != commit_sha:
+            return
+        await self._save(f"latest:{repo_url}", dict(pointer, checked_at=time.time()))
+
+    @staticmethod
+    def etag(record: Dict) -> str:
+        # Regenerating the same commit produces new text, so the ETag
+        # covers the generation time as well as the commit
+        generated = int(record["generated_at"] * 1000)
+        return f'"{record["commit_sha"]}-{generated:x}"'
+
+    async def _load(self, key: str) -> Optional[Dict]:
+        raw = await asyncio.to_thread(self.disk.get, key)
+        if raw is None:
+            return None
+        return json.loads(zlib.decompress(raw))
+
+    async def _save(self, key: str, record: Dict):
+        raw = zlib.compress(json.dumps(record).encode("utf-8"))
+        await asyncio.to_thread(self.disk.set, key, raw)
+
+
+@lru_cache()
+def get_doc_store() -> Optional[DocStore]:
+    settings = get_settings()
+    if not settings.doc_store_enabled:
+        return None
+    return DocStore(settings.doc_store_path, settings.doc_store_max_mb * 1024 * 1024)
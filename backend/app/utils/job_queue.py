@@ -0,0 +1,224 @@
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+from . import metrics, tracing
+import asyncio
+import logging
+import time
+import uuid
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+class Job:
+    """A documentation generation request and its progress"""
+
+    def __init__(self, repo_url: str, options: Optional[Dict] = None):
+        self.id = uuid.uuid4().hex
+        self.repo_url = repo_url
+        self.options = options or {}
+        # queued -> running -> succeeded | failed | cancelled
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        # Workers run the job under the trace of the request that queued it
+        self.trace_parent = tracing.current_span()
+
+    def set_stage(self, stage: str):
+        self.stage = stage
+
+    @property
+    def queue_wait_seconds(self) -> float:
+        return (self.started_at or time.time()) - self.created_at
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "repo_url": self.repo_url,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_wait_seconds": round(self.queue_wait_seconds, 3),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Bounded in-process job queue drained by a fixed pool of workers
+
+    PITFALL: Running the whole pipeline inside the HTTP request lets
+    requests pile up until the proxy times them out
+    SOLUTION: Accept work into a bounded queue, return a job id, and let a
+    configurable number of workers process jobs in the background
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Job], Awaitable[Dict]],
+        workers: int = 4,
+        max_queue: int = 100,
+        retention: int = 1000,
+    ):
+        self.runner = runner
+        self.worker_count = workers
+        self.max_queue = max_queue
+        self.retention = retention
+        self.logger = logging.getLogger(__name__)
+        self.jobs: Dict[str, Job] = {}
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._recent_waits = deque(maxlen=100)
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        """Start workers on the running event loop (idempotent)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._loop = loop
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+
+    def submit(self, repo_url: str, options: Optional[Dict] = None) -> Job:
+        """Queue a job, raising QueueFullError instead of blocking"""
+        self.start()
+        job = Job(repo_url, options)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(
+                f"Job queue is full ({self.max_queue} pending), try again later"
+            )
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: Job) -> Job:
+        await job.done.wait()
+        return job
+
+    def cancel(self, job: Job) -> bool:
+        """
+        Stop a job whose result nobody wants any more
+
+        PITFALL: A client that gave up on /generate left its job running,
+        spending GitHub and Gemini quota on a response nobody would read
+        SOLUTION: Queued jobs are skipped; running ones have their task
+        cancelled, which cancels the in-flight GitHub and Gemini calls
+        """
+        if job.done.is_set():
+            return False
+        if job.status == "running" and not (job.task and job.task.cancel()):
+            return False  # Already finishing
+        was_queued = job.status == "queued"
+        job.status = "cancelled"
+        job.error = "Job cancelled"
+        self.cancelled += 1
+        if was_queued:
+            job.finished_at = time.time()
+            job.stage = "done"
+            job.done.set()
+        return True
+
+    def stats(self) -> Dict:
+        queued = [job for job in self.jobs.values() if job.status == "queued"]
+        waits = list(self._recent_waits)
+        return {
+            "workers": self.worker_count,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.max_queue,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "max_wait_seconds": round(max(waits), 3) if waits else 0.0,
+            "oldest_queued_seconds": round(
+                max((job.queue_wait_seconds for job in queued), default=0.0), 3
+            ),
+        }
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            if job.status == "cancelled":
+                self._queue.task_done()
+                continue
+            job.status = "running"
+            job.started_at = time.time()
+            self._recent_waits.append(job.queue_wait_seconds)
+            metrics.JOB_QUEUE_WAIT.observe(job.queue_wait_seconds)
+            if job.trace_parent is not None:
+                tracing.record_span(
+                    "job.queue_wait",
+                    job.created_at,
+                    job.queue_wait_seconds,
+                    parent=job.trace_parent,
+                )
+            self.running += 1
+            try:
+                with tracing.span("job.run", parent=job.trace_parent, job_id=job.id):
+                    # Its own task, so the job can be cancelled without the worker
+                    job.task = asyncio.create_task(self.runner(job))
+                    result = await job.task
+                if result.get("success"):
+                    job.status = "succeeded"
+                    job.result = result
+                    self.completed += 1
+                else:
+                    job.status = "failed"
+                    job.error = result.get("error")
+                    self.failed += 1
+            except asyncio.CancelledError:
+                if not asyncio.current_task().cancelling():
+                    continue  # Only the job was cancelled (see cancel)
+                job.status = "failed"
+                job.error = "Job cancelled"
+                raise
+            except Exception as e:
+                self.logger.error(f"Job {job.id} failed: {str(e)}")
+                job.status = "failed"
+                job.error = str(e)
+                self.failed += 1
+            finally:
+                self.running -= 1
+                job.finished_at = time.time()
+                job.stage = "done"
+                job.done.set()
+                self._queue.task_done()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        excess = len(self.jobs) - self.retention
+        if excess <= 0:
+            return
+        finished = [job.id for job in self.jobs.values() if job.done.is_set()]
+        for job_id in finished[:excess]:
+            del self.jobs[job_id]
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Optional
+from ..config import get_settings
+from .disk_cache import DiskCache
+from .metrics import record_cache_lookup
+import asyncio
+import hashlib
+import json
+import time
+
+# Set by the orchestrator when a request asks for fresh generations
+llm_cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of LLM responses shared by all agents
+
+    PITFALL: Identical prompts (e.g. doc standards for the same framework)
+    are regenerated on every run, costing seconds and quota
+    SOLUTION: Key responses on model, prompt and generation config, with a
+    small in-memory LRU in front of a size-bounded on-disk store
+    """
+
+    def __init__(self, path: str, max_bytes: int, memory_entries: int, ttl: float):
+        self.disk = DiskCache(path, max_bytes, default_ttl=ttl)
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(
+        self, model_name: str, prompt: str, generation_config: Optional[Dict] = None
+    ) -> str:
+        config = json.dumps(generation_config or {}, sort_keys=True)
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+        return hashlib.sha256(
+            f"{model_name}\n{prompt_hash}\n{config}".encode()
+        ).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look in memory first, then on disk (promoting disk hits to memory)"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            text, expires_at = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self.hits += 1
+                record_cache_lookup("llm", True)
+                return text
+            del self._memory[key]
+
+        raw = await asyncio.to_thread(self.disk.get, key)
+        if raw is None:
+            self.misses += 1
+            record_cache_lookup("llm", False)
+            return None
+
+        text = raw.decode("utf-8")
+        self._remember(key, text)
+        self.hits += 1
+        record_cache_lookup("llm", True)
+        return text
+
+    async def set(self, key: str, text: str):
+        self._remember(key, text)
+        await asyncio.to_thread(self.disk.set, key, text.encode("utf-8"))
+
+    def _remember(self, key: str, text: str):
+        self._memory[key] = (text, time.time() + self.ttl)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+
+@lru_cache()
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    settings = get_settings()
+    if not settings.llm_cache_enabled:
+        return None
+    return LLMResponseCache(
+        settings.llm_cache_path,
+        settings.llm_cache_max_mb * 1024 * 1024,
+        settings.llm_cache_memory_entries,
+        settings.llm_cache_ttl_hours * 3600,
+    )
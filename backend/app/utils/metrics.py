@@ -0,0 +1,280 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Sequence, Tuple
+import asyncio
+import math
+import time
+
+# Seconds; request-sized work vs whole pipeline stages and requests
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LONG_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Starlette appends "; charset=utf-8" to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"{self.name} takes labels {list(self.label_names)}, got {list(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        """(sample name, label names, label values, value) rows to render"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, label_names, label_values, value in self.samples():
+            labels = _format_labels(label_names, label_values)
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        return [
+            (self.name, self.label_names, key, value)
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = float(value)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        return [
+            (self.name, self.label_names, key, value)
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Iterable[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = {
+                "counts": [0] * len(self.buckets),
+                "sum": 0.0,
+                "count": 0,
+            }
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+                break
+        series["sum"] += value
+        series["count"] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._values.get(self._key(labels))
+        return series["count"] if series else 0
+
+    def samples(self):
+        out = []
+        bucket_labels = self.label_names + ("le",)
+        for key, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                out.append(
+                    (
+                        f"{self.name}_bucket",
+                        bucket_labels,
+                        key + (_format_value(bound),),
+                        cumulative,
+                    )
+                )
+            out.append((f"{self.name}_sum", self.label_names, key, series["sum"]))
+            out.append((f"{self.name}_count", self.label_names, key, series["count"]))
+        return out
+
+
+class Registry:
+    """
+    Process-wide metrics in the Prometheus text exposition format
+
+    PITFALL: Logging lines can't answer "what is p99 and where does it go"
+    SOLUTION: Counters, gauges and histograms updated in place on the hot
+    path (no locks: everything runs on the event loop), rendered on scrape
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _counter(name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labels))
+
+
+def _gauge(name: str, help_text: str, labels: Iterable[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labels))
+
+
+def _histogram(
+    name: str,
+    help_text: str,
+    labels: Iterable[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labels, buckets))
+
+
+HTTP_REQUESTS = _counter(
+    "docagent_http_requests_total",
+    "HTTP requests served",
+    ("method", "handler", "status"),
+)
+HTTP_DURATION = _histogram(
+    "docagent_http_request_duration_seconds",
+    "HTTP request latency, including streamed bodies",
+    ("method", "handler"),
+    LONG_BUCKETS,
+)
+GITHUB_REQUESTS = _counter(
+    "docagent_github_requests_total",
+    "GitHub API requests by endpoint and response status",
+    ("endpoint", "status"),
+)
+GITHUB_DURATION = _histogram(
+    "docagent_github_request_duration_seconds",
+    "GitHub API request latency (archives: until the body is read)",
+    ("endpoint",),
+)
+GITHUB_QUOTA_REMAINING = _gauge(
+    "docagent_github_quota_remaining",
+    "GitHub API calls left in the current window, per token",
+    ("token",),
+)
+LLM_CALLS = _counter(
+    "docagent_llm_calls_total",
+    "Gemini generate_content calls (cache misses) by agent, level and outcome",
+    ("agent", "level", "outcome"),
+)
+LLM_DURATION = _histogram(
+    "docagent_llm_call_duration_seconds",
+    "Gemini call latency, after admission, until the last token",
+    ("agent", "level"),
+    LONG_BUCKETS,
+)
+LLM_TOKENS = _counter(
+    "docagent_llm_tokens_total",
+    "Gemini tokens by agent, level and kind (prompt or response)",
+    ("agent", "level", "kind"),
+)
+LLM_ADMISSION_WAIT = _histogram(
+    "docagent_llm_admission_wait_seconds",
+    "Time Gemini calls waited for the rate limiter",
+    buckets=LONG_BUCKETS,
+)
+JOB_QUEUE_WAIT = _histogram(
+    "docagent_job_queue_wait_seconds",
+    "Time jobs spent queued before a worker picked them up",
+    buckets=LONG_BUCKETS,
+)
+JOB_QUEUE_DEPTH = _gauge("docagent_job_queue_depth", "Jobs waiting for a worker")
+JOBS_RUNNING = _gauge("docagent_jobs_running", "Jobs being processed")
+BATCH_WAITING = _gauge(
+    "docagent_batch_repos_waiting", "Batch repos waiting for a concurrency slot"
+)
+CACHE_LOOKUPS = _counter(
+    "docagent_cache_lookups_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ("cache", "result"),
+)
+STAGE_DURATION = _histogram(
+    "docagent_pipeline_stage_duration_seconds",
+    "Pipeline stage run time (stages reused from a previous run excluded)",
+    ("stage",),
+    LONG_BUCKETS,
+)
+EVENT_LOOP_LAG = _histogram(
+    "docagent_event_loop_lag_seconds",
+    "How late the event loop woke a periodic sleep",
+    buckets=LAG_BUCKETS,
+)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+async def monitor_event_loop(interval: float):
+    """
+    Observe event-loop lag until cancelled
+
+    Anything that blocks the loop (CPU work, sync I/O) delays this wakeup
+    by as long as it blocks, and every request in the process with it.
+    """
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - started - interval))
@@ -0,0 +1,275 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+from ..config import get_settings
+from . import metrics, tracing
+import asyncio
+import logging
+import random
+import time
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Per-request totals, set by the orchestrator (same pattern as the GitHub
+# cache stats)
+_call_stats: ContextVar[Optional[Dict]] = ContextVar("llm_call_stats", default=None)
+
+
+class TokenBucket:
+    """Refills at rate_per_minute, holding at most capacity units"""
+
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class AdaptiveRateLimiter:
+    """
+    Process-wide admission control for calls to a rate-limited API
+
+    PITFALL: Every agent calling the model directly lets concurrent jobs
+    burst past the quota; the 429s surface as broken documentation
+    SOLUTION: Admit calls through a request bucket and a token bucket,
+    retry 429/5xx with jittered exponential backoff, and adapt the number
+    of concurrent calls AIMD-style: grow it slowly while calls succeed at
+    normal latency, halve it on throttling errors, shrink it a little when
+    latency spikes
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_concurrency: int = 8,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        is_retryable: Optional[Callable[[Exception], bool]] = None,
+    ):
+        # Allow bursts of half a minute's allowance
+        self.requests = TokenBucket(
+            requests_per_minute, max(1, requests_per_minute / 2)
+        )
+        self.tokens = TokenBucket(tokens_per_minute, max(1, tokens_per_minute / 2))
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.is_retryable = is_retryable or is_retryable_error
+        self.logger = logging.getLogger(__name__)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.latency_ewma: Optional[float] = None
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._admission: Optional[asyncio.Lock] = None
+        self._slot_freed: Optional[asyncio.Event] = None
+
+    async def call(self, fn: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """Run fn once admitted, retrying retryable failures"""
+        async with self.hold(fn, tokens) as result:
+            return result
+
+    @asynccontextmanager
+    async def hold(
+        self, fn: Callable[[], Awaitable[T]], tokens: int = 0
+    ) -> AsyncIterator[T]:
+        """
+        Like call(), but keep the slot until the block exits
+
+        PITFALL: A streamed response is read long after the call that opened
+        it returns; freeing the slot then lets a burst of streams run past
+        the concurrency limit
+        SOLUTION: Admit and retry fn as call() does, then hold the slot while
+        the caller consumes the result
+        """
+        attempt = 0
+        while True:
+            await self._acquire(tokens)
+            started = time.monotonic()
+            try:
+                result = await fn()
+                break
+            except Exception as e:
+                retryable = self.is_retryable(e)
+                self._release(time.monotonic() - started, throttled=retryable)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                error = e
+            except BaseException:
+                # Cancelled calls free their slot without teaching us anything
+                self._release(time.monotonic() - started, False, observe=False)
+                raise
+
+            attempt += 1
+            self.retries += 1
+            self._record("retries", 1)
+            # Full jitter keeps retrying callers from moving in lockstep
+            delay = random.uniform(
+                0, min(self.max_delay, self.base_delay * 2**attempt)
+            )
+            self.logger.warning(
+                f"Retryable error ({type(error).__name__}), attempt {attempt}, "
+                f"retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+        error = None
+        completed = False
+        try:
+            yield result
+            completed = True
+        except Exception as e:
+            # Failures while reading are not retried, but still adapt the limit
+            error = e
+            completed = True
+            raise
+        finally:
+            self._release(
+                time.monotonic() - started,
+                throttled=error is not None and self.is_retryable(error),
+                observe=completed,
+            )
+
+    async def _acquire(self, tokens: int):
+        self._bind_loop()
+        queued = time.monotonic()
+        self.waiting += 1
+        try:
+            # One waiter at a time claims capacity, so callers are served
+            # in arrival order
+            async with self._admission:
+                await self._wait_for_slot()
+                while True:
+                    wait = max(
+                        self.requests.wait_time(1), self.tokens.wait_time(tokens)
+                    )
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                self.in_flight += 1
+        finally:
+            self.waiting -= 1
+
+        delay = time.monotonic() - queued
+        metrics.LLM_ADMISSION_WAIT.observe(delay)
+        if delay >= 0.01:
+            tracing.record_span("llm.admission", time.time() - delay, delay)
+        self.calls += 1
+        self._record("calls", 1)
+        self._record("queue_seconds", delay)
+        stats = _call_stats.get()
+        if stats is not None:
+            stats["max_queue_seconds"] = round(
+                max(stats["max_queue_seconds"], delay), 3
+            )
+        if delay > 1:
+            self.logger.info(f"LLM call waited {delay:.2f}s for admission")
+
+    def _bind_loop(self):
+        # Locks and events belong to one event loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._admission = asyncio.Lock()
+            self._slot_freed = asyncio.Event()
+            self.in_flight = 0
+
+    async def _wait_for_slot(self):
+        # Only the caller holding the admission lock waits here
+        while self.in_flight >= int(self.limit):
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+
+    def _release(self, latency: float, throttled: bool, observe: bool = True):
+        self.in_flight -= 1
+        self._slot_freed.set()
+        if not observe:
+            return
+
+        if throttled:
+            self.throttled += 1
+            self.limit = max(1.0, self.limit / 2)
+        elif self.latency_ewma is not None and latency > 3 * self.latency_ewma:
+            self.limit = max(1.0, self.limit * 0.9)
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+        if not throttled:
+            self.latency_ewma = (
+                latency
+                if self.latency_ewma is None
+                else 0.8 * self.latency_ewma + 0.2 * latency
+            )
+
+    def _record(self, field: str, amount: float):
+        stats = _call_stats.get()
+        if stats is not None:
+            stats[field] = round(stats[field] + amount, 3)
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "latency_ewma_seconds": round(self.latency_ewma or 0.0, 3),
+        }
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Throttling, transient server errors and timeouts"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    # google.api_core exceptions carry the HTTP status as .code
+    status = getattr(error, "code", None) or getattr(error, "status", None)
+    return status in RETRYABLE_STATUSES
+
+
+def start_call_stats() -> Dict:
+    """Start collecting call counts and queueing delay for this request"""
+    stats = {"calls": 0, "retries": 0, "queue_seconds": 0.0, "max_queue_seconds": 0.0}
+    _call_stats.set(stats)
+    return stats
+
+
+@lru_cache()
+def get_llm_rate_limiter() -> AdaptiveRateLimiter:
+    settings = get_settings()
+    return AdaptiveRateLimiter(
+        requests_per_minute=settings.max_requests_per_minute,
+        tokens_per_minute=settings.max_tokens_per_minute,
+        max_concurrency=settings.llm_max_concurrency,
+        max_retries=settings.llm_max_retries,
+    )
@@ -0,0 +1,104 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+import asyncio
+import logging
+
+Listener = Callable[[Any], None]
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task, deadline: Optional[float] = None):
+        self.task = task
+        self.deadline = deadline
+        self.waiters = 0
+        self.listeners: List[Listener] = []
+
+    def broadcast(self, event: Any):
+        for listener in list(self.listeners):
+            listener(event)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one shared run
+
+    PITFALL: Cancelling a shared task because one caller went away would
+    fail every other caller waiting on it
+    SOLUTION: Each caller awaits the run through asyncio.shield; the run is
+    only cancelled once the last interested caller has left
+
+    PITFALL: A caller with plenty of time joined a run started with a short
+    deadline and got its partial result
+    SOLUTION: Runs remember their deadline; a caller whose own deadline is
+    more than deadline_slack seconds later starts a fresh run instead
+    """
+
+    def __init__(self, cancel_when_abandoned: bool = True, deadline_slack: float = 1.0):
+        self.cancel_when_abandoned = cancel_when_abandoned
+        self.deadline_slack = deadline_slack
+        self.logger = logging.getLogger(__name__)
+        self._calls: Dict[Hashable, _Call] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[Listener], Awaitable[Any]],
+        listener: Optional[Listener] = None,
+        deadline: Optional[float] = None,
+    ) -> Any:
+        """
+        Run fn once per key, or join the run already in flight
+
+        fn receives a broadcast callable; events passed to it reach the
+        listener of every caller currently waiting on the run. deadline is
+        the one fn was built with (any clock, as long as callers agree).
+        """
+        call = self._calls.get(key)
+        if call is None or call.task.done() or not self._in_time(call, deadline):
+            call = self._start(key, fn, deadline)
+        else:
+            self.logger.info(f"Joining in-flight run for {key}")
+
+        call.waiters += 1
+        if listener is not None:
+            call.listeners.append(listener)
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if listener is not None:
+                call.listeners.remove(listener)
+            if (
+                self.cancel_when_abandoned
+                and call.waiters == 0
+                and not call.task.done()
+            ):
+                self.logger.info(f"All callers left, cancelling run for {key}")
+                call.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _in_time(self, call: _Call, deadline: Optional[float]) -> bool:
+        """Whether the run's deadline serves a caller with this one"""
+        if deadline is None or call.deadline is None:
+            return True
+        return deadline <= call.deadline + self.deadline_slack
+
+    def _start(
+        self,
+        key: Hashable,
+        fn: Callable[[Listener], Awaitable[Any]],
+        deadline: Optional[float] = None,
+    ) -> _Call:
+        # Replaces an earlier run under the same key; that one keeps going
+        # for its own callers
+        call = _Call(None, deadline)
+        call.task = asyncio.create_task(fn(call.broadcast))
+        self._calls[key] = call
+
+        def forget(_):
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+        call.task.add_done_callback(forget)
+        return call
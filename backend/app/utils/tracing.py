@@ -0,0 +1,291 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+from ..config import get_settings
+from . import metrics
+import logging
+import time
+import uuid
+
+# Spans kept per trace; a huge repo can make thousands of GitHub calls
+MAX_SPANS_PER_TRACE = 2000
+
+# Not worth a trace: scrapes and probes
+UNTRACED_PATHS = {"/metrics", "/api/v1/health", "/api/v1/ready"}
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+logger = logging.getLogger(__name__)
+
+
+class Trace:
+    """The finished spans of one request, sharing a trace id"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.spans: List["Span"] = []
+        self.dropped = 0
+        self.root: Optional["Span"] = None
+
+    def add(self, span: "Span"):
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def to_dict(self) -> Dict:
+        """The spans as a tree, children in start order"""
+        children: Dict[Optional[str], List["Span"]] = {}
+        for span in self.spans:
+            children.setdefault(span.parent_id, []).append(span)
+
+        def build(span: "Span") -> Dict:
+            node = span.to_dict()
+            kids = sorted(children.get(span.span_id, []), key=lambda s: s.start)
+            if kids:
+                node["children"] = [build(kid) for kid in kids]
+            return node
+
+        known = {span.span_id for span in self.spans}
+        roots = [s for s in self.spans if s.parent_id not in known]
+        return {
+            "trace_id": self.id,
+            "duration": self.root.duration if self.root else None,
+            "dropped_spans": self.dropped,
+            "spans": [build(span) for span in sorted(roots, key=lambda s: s.start)],
+        }
+
+    def summary(self) -> Dict:
+        root = self.root
+        return {
+            "trace_id": self.id,
+            "name": root.name if root else None,
+            "attributes": root.attributes if root else {},
+            "start": root.start if root else None,
+            "duration": root.duration if root else None,
+            "spans": len(self.spans),
+        }
+
+
+class Span:
+    """
+    One timed operation, nested under the span that was current when it began
+
+    Attributes are inherited for lookups (see attribute): a Gemini call
+    made inside a stage span tagged agent="doc_generator", level="advanced"
+    is attributed to that agent and level.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["Span"],
+        attributes: Dict[str, Any],
+        start: Optional[float] = None,
+    ):
+        self.name = name
+        self.parent = parent
+        self.trace = parent.trace if parent is not None else Trace()
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes)
+        self.start = time.time() if start is None else start
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self._clock = time.perf_counter()
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.id
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._clock
+
+    def attribute(self, key: str, default: Any = None) -> Any:
+        """This span's attribute, else the nearest ancestor's"""
+        span: Optional[Span] = self
+        while span is not None:
+            if key in span.attributes:
+                return span.attributes[key]
+            span = span.parent
+        return default
+
+    def end(self, duration: Optional[float] = None):
+        if self.duration is not None:
+            return
+        self.duration = self.elapsed() if duration is None else duration
+        self.trace.add(self)
+        if self.parent is None:
+            self.trace.root = self
+            get_trace_buffer().add(self.trace)
+
+    def to_dict(self) -> Dict:
+        node = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "start": round(self.start, 6),
+            "duration": round(self.duration or 0.0, 6),
+        }
+        if self.attributes:
+            node["attributes"] = self.attributes
+        if self.error:
+            node["error"] = self.error
+        return node
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def attribute(key: str, default: Any = None) -> Any:
+    """Look up an attribute on the current span or its ancestors"""
+    span = _current_span.get()
+    return span.attribute(key, default) if span is not None else default
+
+
+def start_span(name: str, parent: Optional[Span] = None, **attributes: Any) -> Span:
+    """
+    A span that is not made current; call .end() when done
+
+    For work that can't sit inside a `with` block in one task, such as an
+    async generator whose chunks are read by the caller.
+    """
+    return Span(name, parent or _current_span.get(), attributes)
+
+
+@contextmanager
+def span(name: str, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Span]:
+    """
+    Time a block as a child of the current span (or of `parent`)
+
+    Tasks created inside the block inherit it as their current span, so
+    concurrent work nests under the request that started it.
+    """
+    record = start_span(name, parent, **attributes)
+    token = _current_span.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        record.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        record.end()
+
+
+def record_span(
+    name: str,
+    start: float,
+    duration: float,
+    parent: Optional[Span] = None,
+    **attributes: Any,
+) -> Span:
+    """Add an already finished span (e.g. a queue wait) under the current one"""
+    record = Span(name, parent or _current_span.get(), attributes, start=start)
+    record.end(duration)
+    return record
+
+
+class TraceBuffer:
+    """
+    The most recent finished traces, for lookup by id
+
+    Slow ones are also logged with their slowest stages, so a p99 outlier
+    in the latency histogram can be explained from the logs alone.
+    """
+
+    def __init__(self, retention: int, slow_seconds: float):
+        self.retention = retention
+        self.slow_seconds = slow_seconds
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+
+    def add(self, trace: Trace):
+        self._traces[trace.id] = trace
+        while len(self._traces) > self.retention:
+            self._traces.popitem(last=False)
+
+        duration = trace.root.duration if trace.root else 0.0
+        if self.slow_seconds and duration >= self.slow_seconds:
+            stages = sorted(
+                (s for s in trace.spans if s.name == "pipeline.stage"),
+                key=lambda s: -(s.duration or 0.0),
+            )[:5]
+            slowest = ", ".join(
+                f"{s.attributes.get('stage')} {s.duration:.2f}s" for s in stages
+            )
+            logger.info(
+                f"Slow trace {trace.id}: {trace.root.name} {duration:.2f}s"
+                + (f"; slowest stages: {slowest}" if slowest else "")
+            )
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return self._traces.get(trace_id)
+
+    def recent(self, min_duration: float = 0.0, limit: int = 50) -> List[Dict]:
+        """Summaries of retained traces, slowest first"""
+        traces = [
+            trace.summary()
+            for trace in self._traces.values()
+            if trace.root is not None and trace.root.duration >= min_duration
+        ]
+        traces.sort(key=lambda t: -t["duration"])
+        return traces[:limit]
+
+
+@lru_cache()
+def get_trace_buffer() -> TraceBuffer:
+    settings = get_settings()
+    return TraceBuffer(settings.trace_retention, settings.trace_log_slow_seconds)
+
+
+class TracingMiddleware:
+    """
+    Open the root span of every HTTP request and record request metrics
+
+    Pure ASGI rather than BaseHTTPMiddleware, so the span's context reaches
+    the endpoint and streamed response bodies. The trace id is returned in
+    the X-Trace-Id header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        with span("http.request", method=scope["method"], path=scope["path"]) as root:
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-trace-id", root.trace_id.encode()))
+                    message = dict(message, headers=headers)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                # Set by the router once the request is matched
+                endpoint = scope.get("endpoint")
+                handler = getattr(endpoint, "__name__", None) or "unmatched"
+                root.set(handler=handler, status=status["code"])
+                metrics.HTTP_REQUESTS.inc(
+                    method=scope["method"],
+                    handler=handler,
+                    status=str(status["code"]),
+                )
+                metrics.HTTP_DURATION.observe(
+                    root.elapsed(),
+                    method=scope["method"],
+                    handler=handler,
+                )
@@ -0,0 +1,446 @@
+"""
+Load test of the HTTP service against local GitHub and Gemini stand-ins
+
+Run from backend/:  python -m benchmarks.bench_load --rate 2 --duration 60
+                    [--mix small=3,medium=1] [--workers 1 2 4]
+                    [--set JOB_WORKERS=8 ...] [--json results.json]
+
+Starts the real app under uvicorn (one server per --workers value, each
+with empty caches) and sends POST /api/v1/generate requests at --rate per
+second (Poisson arrivals by default) for --duration seconds. Requests pick
+a repository kind by --mix weight, then one of --distinct repositories of
+that kind, so repeats exercise the caches the way real traffic does.
+
+GitHub is benchmarks.fake_github (with a configurable quota) in this
+process; Gemini is benchmarks.fake_gemini inside each server worker, where
+a probe also samples event-loop lag: how late a 50 ms sleep wakes up.
+
+Reported per worker count: throughput, latency p50/p95/p99/max (overall
+and per kind), error rate by status, event-loop lag p50/p99/max, and the
+GitHub and Gemini calls the run made.
+"""
+
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from . import fixtures
+from .bench_pipeline import BACKEND_DIR, SCENARIOS, fake_gemini_config
+from .fake_gemini import FakeGemini
+from .fake_github import RATE_LIMIT, FakeGitHub
+import aiohttp
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+LAG_INTERVAL = 0.05
+STATS_FLUSH_SECONDS = 1.0
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+# Server side: uvicorn imports this factory in every worker process
+
+
+def create_app():
+    """
+    The real app with a fake Gemini and an event-loop lag probe
+
+    Configured by BENCH_* environment variables set by the load test; each
+    worker writes its samples to BENCH_STATS_DIR/<pid>.json.
+    """
+    gemini = FakeGemini(
+        time_to_first_token=float(os.environ.get("BENCH_GEMINI_TTFT", "0")),
+        tokens_per_second=float(os.environ.get("BENCH_GEMINI_TPS", "0")),
+        response_tokens=int(os.environ.get("BENCH_GEMINI_TOKENS", "400")),
+    )
+    gemini.install()
+
+    # Imported after the fake model is in place
+    from app.main import app
+
+    stats_path = Path(os.environ["BENCH_STATS_DIR"]) / f"{os.getpid()}.json"
+    inner = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        samples: List[List[float]] = []
+
+        def flush():
+            stats = {"lag": samples, "gemini": gemini.stats()}
+            stats_path.write_text(json.dumps(stats))
+
+        async def probe():
+            flushed = time.monotonic()
+            while True:
+                started = time.perf_counter()
+                await asyncio.sleep(LAG_INTERVAL)
+                lag = time.perf_counter() - started - LAG_INTERVAL
+                samples.append([time.time(), max(0.0, lag)])
+                if time.monotonic() - flushed >= STATS_FLUSH_SECONDS:
+                    flush()
+                    flushed = time.monotonic()
+
+        task = asyncio.create_task(probe())
+        try:
+            async with inner(app) as state:
+                yield state
+        finally:
+            task.cancel()
+            flush()
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+# Client side
+
+
+def build_repos(mix: Dict[str, float], distinct: int) -> Dict[str, List[Dict]]:
+    """`distinct` fixtures per kind in the mix, each a separate repository"""
+    repos = {}
+    for kind in mix:
+        spec = SCENARIOS[kind]
+        kind_repos = []
+        for i in range(distinct):
+            if "fixture" in spec:
+                fixture = dict(fixtures.load(spec["fixture"]))
+                fixture["repo"] = f"{fixture['repo']}-{i}"
+            else:
+                fixture = fixtures.synthesize(f"{kind}-{i}", spec["synthetic"], seed=i)
+            kind_repos.append(fixture)
+        repos[kind] = kind_repos
+    return repos
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Weights per repo kind, from e.g. small=3,medium=1"""
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in SCENARIOS:
+            raise argparse.ArgumentTypeError(
+                f"Unknown repo kind '{kind}' (choose from {', '.join(SCENARIOS)})"
+            )
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(base: str, server: asyncio.subprocess.Process, limit: float):
+    deadline = time.monotonic() + limit
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if server.returncode is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                async with session.get(f"{base}/api/v1/ready") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {limit:g}s")
+
+
+async def send_load(base: str, repos: Dict[str, List[Dict]], args) -> List[Dict]:
+    """Open-loop arrivals for args.duration seconds; one record per request"""
+    rng = random.Random(args.seed)
+    kinds = list(args.mix)
+    weights = [args.mix[kind] for kind in kinds]
+    records: List[Dict] = []
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+
+    async def one(session: aiohttp.ClientSession, kind: str, fixture: Dict):
+        record = {"kind": kind, "sent_at": time.time()}
+        payload = {
+            "repo_url": f"https://github.com/{fixture['owner']}/{fixture['repo']}"
+        }
+        started = time.perf_counter()
+        try:
+            async with session.post(
+                f"{base}/api/v1/generate", json=payload, timeout=timeout
+            ) as response:
+                await response.read()
+                record["status"] = response.status
+        except asyncio.TimeoutError:
+            record["status"] = "timeout"
+        except aiohttp.ClientError as e:
+            record["status"] = type(e).__name__
+        record["latency"] = time.perf_counter() - started
+        records.append(record)
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        tasks = []
+        started = time.perf_counter()
+        next_at = 0.0
+        while next_at < args.duration:
+            delay = next_at - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = rng.choices(kinds, weights)[0]
+            fixture = rng.choice(repos[kind])
+            tasks.append(asyncio.create_task(one(session, kind, fixture)))
+            if args.arrivals == "poisson":
+                next_at += rng.expovariate(args.rate)
+            else:
+                next_at += 1 / args.rate
+        await asyncio.gather(*tasks)
+    return records
+
+
+async def run_load(workers: int, repos: Dict[str, List[Dict]], args) -> Dict:
+    """One server with `workers` processes, fresh caches, one load run"""
+    github = FakeGitHub(
+        [fixture for kind_repos in repos.values() for fixture in kind_repos],
+        quota=args.github_quota,
+        quota_window=args.quota_window,
+    )
+    github_base = await github.start()
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    config = fake_gemini_config(args)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        stats_dir = Path(work_dir) / "stats"
+        stats_dir.mkdir()
+        env = dict(
+            os.environ,
+            GEMINI_API_KEY="benchmark",
+            GITHUB_TOKEN="",
+            GITHUB_API_BASE=github_base,
+            GITHUB_CACHE_PATH=f"{work_dir}/github.sqlite3",
+            LLM_CACHE_PATH=f"{work_dir}/llm.sqlite3",
+            ARTIFACT_STORE_PATH=f"{work_dir}/artifacts.sqlite3",
+            STATIC_ANALYSIS_CACHE_PATH=f"{work_dir}/analysis.sqlite3",
+            DOC_STORE_PATH=f"{work_dir}/docs.sqlite3",
+            BENCH_STATS_DIR=str(stats_dir),
+            BENCH_GEMINI_TTFT=str(config["time_to_first_token"]),
+            BENCH_GEMINI_TPS=str(config["tokens_per_second"]),
+            BENCH_GEMINI_TOKENS=str(config["response_tokens"]),
+        )
+        if args.rpm:
+            env["MAX_REQUESTS_PER_MINUTE"] = str(args.rpm)
+        for setting in args.set:
+            key, _, value = setting.partition("=")
+            env[key.upper()] = value
+
+        log_path = Path(work_dir) / "server.log"
+        with open(log_path, "wb") as log:
+            server = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "benchmarks.bench_load:create_app",
+                "--factory",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--workers",
+                str(workers),
+                "--log-level",
+                "warning",
+                cwd=BACKEND_DIR,
+                env=env,
+                stdout=log,
+                stderr=log,
+            )
+        try:
+            await wait_until_ready(base, server, args.startup_timeout)
+            github.reset_stats()
+            started = time.time()
+            records = await send_load(base, repos, args)
+            finished = time.time()
+        except BaseException:
+            tail = log_path.read_text(errors="replace")[-2000:]
+            print(f"Server log:\n{tail}", file=sys.stderr)
+            raise
+        finally:
+            if server.returncode is None:
+                server.send_signal(signal.SIGINT)
+                try:
+                    await asyncio.wait_for(server.wait(), 15)
+                except asyncio.TimeoutError:
+                    server.kill()
+                    await server.wait()
+            await github.stop()
+
+        worker_stats = [
+            json.loads(path.read_text()) for path in stats_dir.glob("*.json")
+        ]
+
+    return summarize(workers, records, worker_stats, github.stats(), started, finished)
+
+
+def summarize(
+    workers: int,
+    records: List[Dict],
+    worker_stats: List[Dict],
+    github: Dict,
+    started: float,
+    finished: float,
+) -> Dict:
+    ok = [r for r in records if r["status"] == 200]
+    errors: Dict[str, int] = {}
+    for record in records:
+        if record["status"] != 200:
+            errors[str(record["status"])] = errors.get(str(record["status"]), 0) + 1
+
+    def latency(selected: List[Dict]) -> Dict:
+        values = [r["latency"] for r in selected]
+        return {
+            "count": len(values),
+            **{f"p{pct}": percentile(values, pct) for pct in (50, 95, 99)},
+            "max": max(values, default=None),
+        }
+
+    # Lag while the load ran, across all worker processes
+    lag = [
+        sample
+        for stats in worker_stats
+        for at, sample in stats["lag"]
+        if started <= at <= finished
+    ]
+    gemini = [stats["gemini"] for stats in worker_stats]
+    elapsed = max(r["sent_at"] + r["latency"] for r in records) - started
+    return {
+        "workers": workers,
+        "requests": len(records),
+        "succeeded": len(ok),
+        "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+        "errors": errors,
+        "throughput_rps": len(ok) / elapsed if elapsed > 0 else 0.0,
+        "latency_seconds": latency(ok),
+        "latency_by_kind": {
+            kind: latency([r for r in ok if r["kind"] == kind])
+            for kind in sorted({r["kind"] for r in records})
+        },
+        "loop_lag_ms": {
+            "p50": (percentile(lag, 50) or 0.0) * 1000,
+            "p99": (percentile(lag, 99) or 0.0) * 1000,
+            "max": max(lag, default=0.0) * 1000,
+        },
+        "gemini": {
+            "calls": sum(stats["calls"] for stats in gemini),
+            "max_concurrency": max(
+                (stats["max_concurrency"] for stats in gemini), default=0
+            ),
+        },
+        "github": github,
+    }
+
+
+def print_report(results: List[Dict], args):
+    mix = ",".join(f"{kind}={weight:g}" for kind, weight in args.mix.items())
+    print(
+        f"{args.arrivals} arrivals at {args.rate:g}/s for {args.duration:g}s, "
+        f"mix {mix}, {args.distinct} repos per kind\n"
+    )
+
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    header = (
+        f"{'workers':>7}{'sent':>7}{'ok':>6}{'err %':>7}{'req/s':>8}"
+        f"{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'max s':>8}"
+        f"{'lag p99':>9}{'lag max':>9}{'GitHub':>8}{'403':>6}{'Gemini':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        latency = result["latency_seconds"]
+        lag = result["loop_lag_ms"]
+        print(
+            f"{result['workers']:>7}{result['requests']:>7}{result['succeeded']:>6}"
+            f"{result['error_rate'] * 100:>7.1f}{result['throughput_rps']:>8.2f}"
+            f"{seconds(latency['p50']):>8}{seconds(latency['p95']):>8}"
+            f"{seconds(latency['p99']):>8}{seconds(latency['max']):>8}"
+            f"{lag['p99']:>7.0f}ms{lag['max']:>7.0f}ms"
+            f"{result['github']['total']:>8}{result['github']['rate_limited']:>6}"
+            f"{result['gemini']['calls']:>8}"
+        )
+    print()
+    for result in results:
+        by_kind = ", ".join(
+            f"{kind} p50 {seconds(data['p50'])}s p99 {seconds(data['p99'])}s"
+            for kind, data in result["latency_by_kind"].items()
+        )
+        errors = ", ".join(f"{status}: {n}" for status, n in result["errors"].items())
+        print(
+            f"{result['workers']} worker(s): {by_kind}"
+            + (f"; errors {errors}" if errors else "")
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument(
+        "--arrivals", choices=["poisson", "constant"], default="poisson"
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix("small=3,medium=1"),
+        help="Repo kinds and weights, e.g. small=3,medium=1,huge=0.1",
+    )
+    parser.add_argument("--distinct", type=int, default=5, help="Repositories per kind")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="SETTING=VALUE",
+        help="App setting for the server, e.g. JOB_WORKERS=8 (repeatable)",
+    )
+    parser.add_argument(
+        "--rpm", type=int, help="MAX_REQUESTS_PER_MINUTE (default: the app's)"
+    )
+    parser.add_argument("--github-quota", type=int, default=RATE_LIMIT)
+    parser.add_argument(
+        "--quota-window", type=float, default=3600, help="GitHub quota reset period (s)"
+    )
+    parser.add_argument(
+        "--ttft", type=float, default=0.3, help="Fake Gemini time to first token (s)"
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--response-tokens", type=int, default=400)
+    parser.add_argument(
+        "--timeout", type=float, default=300.0, help="Per-request timeout (s)"
+    )
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Also write the full results here")
+    args = parser.parse_args()
+
+    repos = build_repos(args.mix, args.distinct)
+    results = [asyncio.run(run_load(workers, repos, args)) for workers in args.workers]
+    print_report(results, args)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+End-to-end pipeline benchmark against recorded GitHub fixtures and a fake Gemini
+
+Run from backend/:  python -m benchmarks.bench_pipeline [--scenarios small medium]
+                    [--check | --update-baseline] [--json results.json]
+
+Each scenario runs AgentOrchestrator.generate_documentation twice in a fresh
+process, with empty caches: "cold" (first request for the repo) and "warm"
+(the same commit again). It needs no network: GitHub is a local server
+replaying the fixture (benchmarks.fake_github) and Gemini is a fake model
+with configurable latency and throughput (benchmarks.fake_gemini).
+
+Reported per run: wall time, GitHub calls (and how many were free 304s),
+Gemini calls and tokens, peak RSS of the pipeline process, and the slowest
+pipeline stages. --check compares against baselines.json and exits 1 on a
+regression: more API calls than the baseline, or wall time / memory beyond
+the tolerance.
+"""
+
+from pathlib import Path
+from typing import Dict, List
+from . import fixtures
+from .fake_gemini import FakeGemini
+from .fake_github import FakeGitHub
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+
+# name -> checked-in fixture, or a synthetic repo of that many files
+SCENARIOS = {
+    "small": {"fixture": "small"},
+    "medium": {"synthetic": 400},  # Git Trees ingestion
+    "huge": {"synthetic": 20000},  # Above the archive threshold
+}
+
+# Noise floor below which wall time / memory differences are ignored
+MIN_SLACK = {"wall_seconds": 0.25, "peak_rss_mb": 16.0}
+
+
+def scenario_fixture(name: str) -> Dict:
+    spec = SCENARIOS[name]
+    if "fixture" in spec:
+        return fixtures.load(spec["fixture"])
+    return fixtures.synthesize(f"{name}-repo", spec["synthetic"])
+
+
+def fake_gemini_config(args) -> Dict:
+    return {
+        "time_to_first_token": args.ttft,
+        "tokens_per_second": args.tokens_per_second,
+        "response_tokens": args.response_tokens,
+    }
+
+
+async def run_scenario(name: str, args) -> Dict:
+    """Serve the scenario's fixture here and run the pipeline in a child process"""
+    fixture = scenario_fixture(name)
+    server = FakeGitHub([fixture])
+    base = await server.start()
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = dict(
+                os.environ,
+                GEMINI_API_KEY="benchmark",
+                GITHUB_TOKEN="",
+                GITHUB_API_BASE=base,
+                MAX_REQUESTS_PER_MINUTE=str(args.rpm),
+                MAX_TOKENS_PER_MINUTE=str(10**9),
+                GITHUB_CACHE_PATH=f"{cache_dir}/github.sqlite3",
+                LLM_CACHE_PATH=f"{cache_dir}/llm.sqlite3",
+                ARTIFACT_STORE_PATH=f"{cache_dir}/artifacts.sqlite3",
+                STATIC_ANALYSIS_CACHE_PATH=f"{cache_dir}/analysis.sqlite3",
+                DOC_STORE_PATH=f"{cache_dir}/docs.sqlite3",
+            )
+            command = [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_pipeline",
+                "--worker",
+                f"{fixture['owner']}/{fixture['repo']}",
+                "--ttft",
+                str(args.ttft),
+                "--tokens-per-second",
+                str(args.tokens_per_second),
+                "--response-tokens",
+                str(args.response_tokens),
+            ]
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                cwd=BACKEND_DIR,
+                env=env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, stderr = await process.communicate()
+    finally:
+        await server.stop()
+
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"Scenario {name} failed:\n{stderr.decode(errors='replace')[-2000:]}"
+        )
+    report = json.loads(stdout.decode().strip().splitlines()[-1])
+    report["files"] = len(fixture["files"])
+    return report
+
+
+async def worker(owner_repo: str, args) -> Dict:
+    """Child process: cold and warm runs of the real orchestrator"""
+    import aiohttp
+
+    gemini = FakeGemini(**fake_gemini_config(args))
+    gemini.install()
+
+    # Imported after the environment and the fake model are in place
+    from app.agents.orchestrator import AgentOrchestrator
+    from app.analysis.engine import get_static_analyzer
+    from app.config import get_settings
+    from app.mcp_servers.github_client import close_github_clients
+
+    settings = get_settings()
+    stats_url = f"{settings.github_api_base}/_bench/stats?reset=1"
+    orchestrator = AgentOrchestrator(settings.gemini_api_key)
+    repo_url = f"https://github.com/{owner_repo}"
+    runs = {}
+
+    async with aiohttp.ClientSession() as session:
+        await session.get(stats_url)
+        for run in ("cold", "warm"):
+            gemini.reset_stats()
+            started = time.perf_counter()
+            result = await orchestrator.generate_documentation(repo_url)
+            wall = time.perf_counter() - started
+            async with session.get(stats_url) as response:
+                github = await response.json()
+
+            if not result.get("success"):
+                raise RuntimeError(f"{run} run failed: {result.get('error')}")
+            metadata = result["metadata"]
+            stages = {
+                stage: timing["duration"]
+                for stage, timing in metadata["timings"].items()
+                if stage != "total"
+            }
+            runs[run] = {
+                "wall_seconds": round(wall, 3),
+                "github_calls": github["total"],
+                "github_not_modified": github["not_modified"],
+                "github_by_kind": github["by_kind"],
+                "gemini_calls": gemini.calls,
+                "gemini": gemini.stats(),
+                "incremental": metadata["incremental"]["mode"],
+                "ingestion_mode": metadata.get("ingestion_mode"),
+                "stages": stages,
+            }
+
+    await close_github_clients()
+    get_static_analyzer().close()
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    return {"runs": runs, "peak_rss_mb": round(peak, 1)}
+
+
+def flatten(report: Dict) -> Dict[str, Dict[str, float]]:
+    """The metrics baselines track, per run"""
+    return {
+        run: {
+            "wall_seconds": data["wall_seconds"],
+            "github_calls": data["github_calls"],
+            "gemini_calls": data["gemini_calls"],
+            "peak_rss_mb": report["peak_rss_mb"],
+        }
+        for run, data in report["runs"].items()
+    }
+
+
+def compare(
+    results: Dict[str, Dict], baselines: Dict, tolerance: float, config: Dict
+) -> List[str]:
+    """Regressions of results against baselines, as readable lines"""
+    timing_comparable = baselines.get("config") == config
+    if not timing_comparable:
+        print(
+            "Fake Gemini settings differ from the baseline: checking call counts only"
+        )
+
+    problems = []
+    for name, report in results.items():
+        expected = baselines.get("scenarios", {}).get(name)
+        if expected is None:
+            problems.append(f"{name}: no baseline (run with --update-baseline)")
+            continue
+        for run, metrics in flatten(report).items():
+            for metric, value in metrics.items():
+                base = expected.get(run, {}).get(metric)
+                if base is None:
+                    continue
+                if metric in MIN_SLACK:
+                    if not timing_comparable:
+                        continue
+                    limit = max(base * (1 + tolerance), base + MIN_SLACK[metric])
+                else:
+                    limit = base  # API calls are deterministic
+                if value > limit:
+                    problems.append(
+                        f"{name}/{run} {metric}: {value} (baseline {base}, limit {limit:g})"
+                    )
+    return problems
+
+
+def print_report(results: Dict[str, Dict], stages: int):
+    header = f"{'scenario':<10}{'run':<6}{'files':>7}{'wall s':>9}{'GitHub':>8}{'(304)':>7}{'Gemini':>8}{'tokens':>9}{'RSS MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, report in results.items():
+        for run, data in report["runs"].items():
+            tokens = data["gemini"]["prompt_tokens"] + data["gemini"]["response_tokens"]
+            print(
+                f"{name:<10}{run:<6}{report['files']:>7}{data['wall_seconds']:>9.2f}"
+                f"{data['github_calls']:>8}{data['github_not_modified']:>7}"
+                f"{data['gemini_calls']:>8}{tokens:>9}{report['peak_rss_mb']:>9.1f}"
+            )
+    print()
+    for name, report in results.items():
+        cold = report["runs"]["cold"]
+        slowest = sorted(cold["stages"].items(), key=lambda item: -item[1])[:stages]
+        breakdown = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in slowest)
+        print(f"{name} cold ({cold['ingestion_mode']}): {breakdown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument(
+        "--ttft", type=float, default=0.3, help="Fake Gemini time to first token (s)"
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--response-tokens", type=int, default=400)
+    parser.add_argument(
+        "--rpm", type=int, default=100000, help="MAX_REQUESTS_PER_MINUTE for the run"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit 1 on regressions against baselines.json",
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed wall time / memory growth",
+    )
+    parser.add_argument(
+        "--stages", type=int, default=5, help="Slowest stages to list per scenario"
+    )
+    parser.add_argument("--json", help="Also write the full results here")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(worker(args.worker, args))))
+        return
+
+    results = {}
+    for name in args.scenarios:
+        results[name] = asyncio.run(run_scenario(name, args))
+    print_report(results, args.stages)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+    config = fake_gemini_config(args)
+    if args.update_baseline:
+        baselines = (
+            json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+        )
+        baselines["config"] = config
+        scenarios = baselines.setdefault("scenarios", {})
+        for name, report in results.items():
+            scenarios[name] = flatten(report)
+        BASELINES_PATH.write_text(
+            json.dumps(baselines, indent=2, sort_keys=True) + "\n"
+        )
+        print(f"\nBaselines written to {BASELINES_PATH}")
+
+    if args.check:
+        baselines = json.loads(BASELINES_PATH.read_text())
+        problems = compare(results, baselines, args.tolerance, config)
+        print()
+        if problems:
+            print("Regressions:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Nested contents dicts vs TreeIndex on a synthetic repository tree
+
+Run from backend/:  python -m benchmarks.bench_tree_index [--files 50000]
+
+Reports the memory held by each representation, the time for the
+analysis queries the agents run (statistics, structure checks, file
+selection, SHA lookups) against each, and the time for stack detection
+over the index.
+"""
+
+from app.analysis.stacks import StackDetector, load_rules
+from app.analysis.tree_index import TreeIndex
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+EXTENSIONS = ["py", "ts", "tsx", "js", "go", "rs", "md", "json", "yml"]
+TOP_LEVEL = ["src", "lib", "tests", "docs", "scripts", "packages", "app"]
+
+
+def synthetic_contents(files: int, seed: int = 7):
+    """A nested contents list shaped like the GitHub MCP's, ~10 files per dir"""
+    rng = random.Random(seed)
+    root = []
+    directories = {"": root}
+    for name in TOP_LEVEL:
+        children = []
+        directories[name] = children
+        root.append(
+            {"type": "directory", "name": name, "path": name, "children": children}
+        )
+    root.append(
+        {"type": "file", "name": "package.json", "path": "package.json", "size": 900}
+    )
+
+    for i in range(files):
+        parent = rng.choice(list(directories)[1:])
+        if rng.random() < 0.1 and parent.count("/") < 5:
+            name = f"module_{i}"
+            path = f"{parent}/{name}"
+            children = []
+            directories[path] = children
+            directories[parent].append(
+                {"type": "directory", "name": name, "path": path, "children": children}
+            )
+            parent = path
+        name = f"file_{i % 97}.{rng.choice(EXTENSIONS)}"
+        path = f"{parent}/{name}"
+        directories[parent].append(
+            {
+                "type": "file",
+                "name": name,
+                "path": path,
+                "size": rng.randint(100, 40000),
+                "sha": f"{rng.getrandbits(160):040x}",
+                "download_url": f"https://raw.githubusercontent.com/o/r/main/{path}",
+            }
+        )
+    return root
+
+
+def nested_queries(contents, paths):
+    """The traversals the analysis functions used to run over the dicts"""
+    stats = {"files": 0, "lines": 0, "languages": {}}
+
+    def walk(items):
+        for item in items:
+            if item["type"] == "file":
+                stats["files"] += 1
+                stats["lines"] += item.get("size", 0) // 50
+                ext = item["name"].split(".")[-1] if "." in item["name"] else "other"
+                stats["languages"][ext] = stats["languages"].get(ext, 0) + 1
+            else:
+                walk(item.get("children", []))
+
+    walk(contents)
+    any("test" in i["name"].lower() for i in contents if i["type"] == "directory")
+    any("doc" in i["name"].lower() for i in contents if i["type"] == "directory")
+    [i["name"] for i in contents if i["type"] == "file"]
+
+    shas = {}
+
+    def collect(items):
+        for item in items:
+            if item["type"] == "file":
+                shas[item["path"]] = item.get("sha")
+            else:
+                collect(item.get("children", []))
+
+    collect(contents)
+    return [shas.get(path) for path in paths]
+
+
+def index_queries(index: TreeIndex, paths):
+    lines = sum(index.sizes[node] // 50 for node in index.file_ids)
+    index.extension_counts()
+    directories = [name.lower() for name in index.top_level(directories=True)]
+    any("test" in name for name in directories)
+    any("doc" in name for name in directories)
+    set(index.top_level(directories=False))
+    return lines, [index.sha(path) for path in paths]
+
+
+def measure(build):
+    """Value built and the bytes it holds"""
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def best_of(runs, fn, *args):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    contents, nested_bytes = measure(lambda: synthetic_contents(args.files))
+    index, index_bytes = measure(lambda: TreeIndex.from_contents(contents))
+    # tracemalloc slows allocation down; time the build on its own
+    build_seconds = best_of(args.runs, TreeIndex.from_contents, contents)
+    paths = random.Random(1).sample(index.paths(), min(args.lookups, index.file_count))
+
+    nested_seconds = best_of(args.runs, nested_queries, contents, paths)
+    index_seconds = best_of(args.runs, index_queries, index, paths)
+    detector = StackDetector(load_rules())
+    detect_seconds = best_of(args.runs, detector.detect, index)
+
+    print(f"entries: {len(index.names) - 1} ({index.file_count} files)")
+    print(f"memory   nested dicts: {nested_bytes / 1e6:8.1f} MB")
+    print(f"memory   TreeIndex:    {index_bytes / 1e6:8.1f} MB")
+    print(f"build    TreeIndex:    {build_seconds * 1000:8.1f} ms (once per fetch)")
+    print(f"queries  nested dicts: {nested_seconds * 1000:8.1f} ms")
+    print(f"queries  TreeIndex:    {index_seconds * 1000:8.1f} ms")
+    print(f"detect   stacks:       {detect_seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Latency-injecting stand-in for google.generativeai.GenerativeModel
+
+Each call waits time_to_first_token, then streams response_tokens at
+tokens_per_second, like the real API does at a given load. Calls, tokens
+and peak concurrency are counted so benchmarks can report them.
+
+    gemini = FakeGemini(time_to_first_token=0.4, tokens_per_second=150)
+    gemini.install()        # before the orchestrator is built
+"""
+
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict
+import asyncio
+
+# ~4 characters per token, like the app's own estimate
+WORD = "lorem "
+
+
+class FakeGemini:
+    def __init__(
+        self,
+        time_to_first_token: float = 0.0,
+        tokens_per_second: float = 0.0,
+        response_tokens: int = 400,
+        chunk_tokens: int = 20,
+    ):
+        self.time_to_first_token = time_to_first_token
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.chunk_tokens = chunk_tokens
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.response_tokens_sent = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens_sent,
+            "max_concurrency": self.max_in_flight,
+        }
+
+    def install(self):
+        """Make every GenerativeModel the app builds from now on a fake one"""
+        import google.generativeai as genai
+
+        fake = self
+
+        class FakeGenerativeModel:
+            def __init__(self, model_name: str = "", generation_config=None, **kwargs):
+                self.model_name = model_name
+
+            async def generate_content_async(self, prompt: str, stream: bool = False):
+                if stream:
+                    return fake._stream(prompt)
+                chunks = [chunk async for chunk in fake._stream(prompt)]
+                return SimpleNamespace(text="".join(c.text for c in chunks))
+
+            async def count_tokens_async(self, contents):
+                return SimpleNamespace(total_tokens=len(str(contents)) // 4)
+
+        genai.GenerativeModel = FakeGenerativeModel
+
+    async def _stream(self, prompt: str) -> AsyncIterator[SimpleNamespace]:
+        self.calls += 1
+        self.prompt_tokens += max(1, len(prompt) // 4)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.time_to_first_token)
+            # Echo the prompt's first line so different prompts differ
+            header = prompt.strip().splitlines()[0][:60] if prompt.strip() else ""
+            yield SimpleNamespace(text=f"# {header}\n\n")
+            sent = 0
+            while sent < self.response_tokens:
+                tokens = min(self.chunk_tokens, self.response_tokens - sent)
+                if self.tokens_per_second:
+                    await asyncio.sleep(tokens / self.tokens_per_second)
+                sent += tokens
+                self.response_tokens_sent += tokens
+                yield SimpleNamespace(text=WORD * tokens)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,251 @@
+"""
+Local stand-in for the GitHub REST API, serving repository fixtures
+
+Serves the endpoints GitHubMCP calls (repo metadata, commit SHA, recursive
+Git trees, README, raw contents, tarball, compare) with ETags, 304s and
+X-RateLimit-* headers, and counts every request by kind so benchmarks can
+report how many API calls a run made. Like GitHub, it answers 403 once
+`quota` calls are spent, until the `quota_window` resets.
+
+    server = FakeGitHub([fixture])
+    base = await server.start()          # e.g. http://127.0.0.1:53122
+    ... GITHUB_API_BASE=base ...
+    await server.stop()
+
+GET {base}/_bench/stats[?reset=1] returns the counters to other processes.
+"""
+
+from aiohttp import web
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import io
+import json
+import tarfile
+import time
+
+RATE_LIMIT = 5000
+
+
+def _git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _filler(size: int) -> str:
+    line = "# content not recorded\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+class _Repo:
+    """One fixture, with its file bodies and derived API payloads"""
+
+    def __init__(self, fixture: Dict):
+        self.fixture = fixture
+        self.sha = fixture["sha"]
+        self.bodies: Dict[str, bytes] = {}
+        directories = set()
+        entries = []
+        for path, meta in sorted(fixture["files"].items()):
+            text = meta.get("text")
+            body = (text if text is not None else _filler(meta["size"])).encode()
+            self.bodies[path] = body
+            parent = path.rpartition("/")[0]
+            while parent and parent not in directories:
+                directories.add(parent)
+                parent = parent.rpartition("/")[0]
+            entries.append(
+                {
+                    "path": path,
+                    "mode": "100644",
+                    "type": "blob",
+                    "size": len(body),
+                    "sha": _git_blob_sha(body),
+                }
+            )
+        for directory in directories:
+            entries.append(
+                {
+                    "path": directory,
+                    "mode": "040000",
+                    "type": "tree",
+                    "sha": hashlib.sha1(directory.encode()).hexdigest(),
+                }
+            )
+        entries.sort(key=lambda entry: entry["path"])
+        self.tree = json.dumps({"sha": self.sha, "truncated": False, "tree": entries})
+        self._tarball: Optional[bytes] = None
+
+    def tarball(self) -> bytes:
+        """The repo as GitHub's tarball (one top-level folder), built once"""
+        if self._tarball is None:
+            buffer = io.BytesIO()
+            prefix = f"{self.fixture['owner']}-{self.fixture['repo']}-{self.sha[:7]}"
+            with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+                for path, body in self.bodies.items():
+                    info = tarfile.TarInfo(f"{prefix}/{path}")
+                    info.size = len(body)
+                    archive.addfile(info, io.BytesIO(body))
+            self._tarball = buffer.getvalue()
+        return self._tarball
+
+
+class FakeGitHub:
+    def __init__(
+        self,
+        fixtures: List[Dict],
+        latency: float = 0.0,
+        quota: int = RATE_LIMIT,
+        quota_window: float = 3600,
+    ):
+        self.repos = {(f["owner"], f["repo"]): _Repo(f) for f in fixtures}
+        self.latency = latency
+        self.quota = quota
+        self.quota_window = quota_window
+        self.calls: Counter = Counter()
+        self.not_modified = 0
+        self.rate_limited = 0
+        self.remaining = quota
+        self.reset_at = time.time() + quota_window
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, port: int = 0) -> str:
+        """Listen on 127.0.0.1 (a free port by default); returns the base URL"""
+        # Build tarballs up front so the first download isn't measured slow
+        for repo in self.repos.values():
+            await asyncio.to_thread(repo.tarball)
+
+        app = web.Application()
+        base = "/repos/{owner}/{repo}"
+        app.router.add_get("/_bench/stats", self._stats)
+        app.router.add_get("/rate_limit", self._rate_limit)
+        app.router.add_get(base, self._metadata)
+        app.router.add_get(base + "/commits/{ref}", self._commit)
+        app.router.add_get(base + "/git/trees/{sha}", self._tree)
+        app.router.add_get(base + "/readme", self._readme)
+        app.router.add_get(base + "/contents/{path:.*}", self._contents)
+        app.router.add_get(base + "/tarball/{ref}", self._tarball)
+        app.router.add_get(base + "/compare/{spec}", self._compare)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def stats(self) -> Dict:
+        """{"total", "not_modified", "rate_limited", "by_kind"} since the last reset"""
+        return {
+            "total": sum(self.calls.values()),
+            "not_modified": self.not_modified,
+            "rate_limited": self.rate_limited,
+            "by_kind": dict(sorted(self.calls.items())),
+        }
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.not_modified = 0
+        self.rate_limited = 0
+
+    async def _respond(
+        self, request: web.Request, kind: str, body, content_type: str
+    ) -> web.Response:
+        self.calls[kind] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(body, str):
+            body = body.encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        now = time.time()
+        if now >= self.reset_at:
+            self.remaining = self.quota
+            self.reset_at = now + self.quota_window
+        headers = {
+            "ETag": etag,
+            "X-RateLimit-Limit": str(self.quota),
+            "X-RateLimit-Reset": str(int(self.reset_at + 0.999)),
+            "X-RateLimit-Resource": "core",
+        }
+        # Like GitHub, conditional hits don't count against the quota
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            headers["X-RateLimit-Remaining"] = str(self.remaining)
+            return web.Response(status=304, headers=headers)
+        if self.remaining <= 0:
+            self.rate_limited += 1
+            headers["X-RateLimit-Remaining"] = "0"
+            return web.json_response(
+                {"message": "API rate limit exceeded"}, status=403, headers=headers
+            )
+        self.remaining -= 1
+        headers["X-RateLimit-Remaining"] = str(self.remaining)
+        return web.Response(body=body, headers=headers, content_type=content_type)
+
+    def _repo(self, request: web.Request) -> _Repo:
+        key: Tuple[str, str] = (
+            request.match_info["owner"],
+            request.match_info["repo"],
+        )
+        if key not in self.repos:
+            self.calls["not_found"] += 1
+            raise web.HTTPNotFound(text='{"message": "Not Found"}')
+        return self.repos[key]
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        # For benchmark processes that don't share memory with the server;
+        # not counted as an API call
+        stats = self.stats()
+        if request.query.get("reset"):
+            self.reset_stats()
+        return web.json_response(stats)
+
+    async def _rate_limit(self, request: web.Request) -> web.Response:
+        body = {"resources": {"core": {"remaining": self.remaining}}}
+        return await self._respond(
+            request, "rate_limit", json.dumps(body), "application/json"
+        )
+
+    async def _metadata(self, request: web.Request) -> web.Response:
+        repo = self._repo(request)
+        body = json.dumps(repo.fixture["metadata"])
+        return await self._respond(request, "repo", body, "application/json")
+
+    async def _commit(self, request: web.Request) -> web.Response:
+        repo = self._repo(request)
+        return await self._respond(request, "commit", repo.sha, "text/plain")
+
+    async def _tree(self, request: web.Request) -> web.Response:
+        repo = self._repo(request)
+        return await self._respond(request, "tree", repo.tree, "application/json")
+
+    async def _readme(self, request: web.Request) -> web.Response:
+        repo = self._repo(request)
+        if repo.fixture.get("readme") is None:
+            self.calls["readme"] += 1
+            raise web.HTTPNotFound(text='{"message": "Not Found"}')
+        return await self._respond(
+            request, "readme", repo.fixture["readme"], "text/plain"
+        )
+
+    async def _contents(self, request: web.Request) -> web.Response:
+        repo = self._repo(request)
+        body = repo.bodies.get(request.match_info["path"])
+        if body is None:
+            self.calls["contents"] += 1
+            raise web.HTTPNotFound(text='{"message": "Not Found"}')
+        return await self._respond(request, "contents", body, "text/plain")
+
+    async def _tarball(self, request: web.Request) -> web.Response:
+        repo = self._repo(request)
+        return await self._respond(
+            request, "tarball", repo.tarball(), "application/gzip"
+        )
+
+    async def _compare(self, request: web.Request) -> web.Response:
+        self._repo(request)
+        body = json.dumps({"status": "identical", "files": []})
+        return await self._respond(request, "compare", body, "application/json")
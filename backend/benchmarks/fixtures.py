@@ -0,0 +1,203 @@
+"""
+Repository fixtures for the offline pipeline benchmark
+
+A fixture is one repository at one commit, as the GitHub API showed it:
+
+    {
+      "owner": "acme", "repo": "todo-api", "sha": "<commit>",
+      "metadata": {<GET /repos/{owner}/{repo}: name, description, ...>},
+      "readme": "<README text or null>",
+      "files": {"<path>": {"size": <bytes>, "text": "<content or null>"}}
+    }
+
+benchmarks.fake_github serves every endpoint the pipeline calls from it.
+Files recorded without text (binaries, or past --max-files) are served as
+filler of the recorded size.
+
+Record a real repository (needs network and, ideally, GITHUB_TOKEN):
+
+    python -m benchmarks.fixtures record owner/repo [--max-files 2000]
+
+The built-in scenarios are a recorded-format fixture checked in under
+fixtures/, plus deterministic synthetic repos that are too large to check in.
+"""
+
+from pathlib import Path
+from typing import Dict, Optional
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+def load(name: str) -> Dict:
+    """A checked-in or recorded fixture, by file name under fixtures/"""
+    for candidate in (f"{name}.json", f"{name}.json.gz"):
+        path = FIXTURES_DIR / candidate
+        if path.exists():
+            opener = gzip.open if path.suffix == ".gz" else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+    raise FileNotFoundError(f"No fixture named '{name}' in {FIXTURES_DIR}")
+
+
+def save(fixture: Dict, name: str) -> Path:
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    path = FIXTURES_DIR / f"{name}.json.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(fixture, f)
+    return path
+
+
+def synthesize(repo: str, files: int, seed: int = 7) -> Dict:
+    """
+    A deterministic Python/TypeScript monorepo of about `files` files
+
+    Modules import each other (so the import graph has structure) and
+    have branches and functions (so the metrics have something to count).
+    """
+    rng = random.Random(seed)
+    out: Dict[str, Dict] = {}
+
+    def add(path: str, text: str):
+        out[path] = {"size": len(text.encode("utf-8")), "text": text}
+
+    add("pyproject.toml", f'[project]\nname = "{repo}"\nversion = "1.0.0"\n')
+    add("package.json", json.dumps({"name": repo, "workspaces": ["web"]}))
+    add("web/package.json", json.dumps({"name": f"{repo}-web"}))
+    add("web/tsconfig.json", "{}")
+    add("Dockerfile", "FROM python:3.11-slim\nCOPY . /app\n")
+    add(".github/workflows/ci.yml", "on: [push]\njobs: {}\n")
+
+    packages = [
+        f"{repo.replace('-', '_')}/{name}" for name in ("core", "api", "io", "cli")
+    ]
+    python_modules = []
+    count = len(out)
+    while count < files:
+        roll = rng.random()
+        if roll < 0.55:
+            package = rng.choice(packages)
+            module = f"{package}/mod_{count}.py"
+            imports = rng.sample(python_modules, min(3, len(python_modules)))
+            lines = [
+                f"from {m[:-3].replace('/', '.')} import run as run_{i}"
+                for i, m in enumerate(imports)
+            ]
+            lines += ["", "", "def run(value):"]
+            for branch in range(rng.randint(1, 6)):
+                lines.append(f"    if value > {branch}:")
+                lines.append(f"        value -= {branch + 1}")
+            lines += ["    return value", ""]
+            add(module, "\n".join(lines))
+            python_modules.append(module)
+        elif roll < 0.8:
+            component = f"web/src/components/Component{count}.tsx"
+            add(
+                component,
+                "import React from 'react';\n\n"
+                f"export function Component{count}() {{\n"
+                f"  return <div>{count}</div>;\n}}\n",
+            )
+        elif roll < 0.92:
+            add(f"tests/test_{count}.py", f"def test_{count}():\n    assert True\n")
+        else:
+            add(f"docs/page_{count}.md", f"# Page {count}\n\n" + "Text. " * 40)
+        count += 1
+
+    for package in packages:
+        add(f"{package}/__init__.py", "")
+    add(
+        f"{packages[3]}/__main__.py",
+        f"from {packages[3].replace('/', '.')} import mod_0\n",
+    )
+    add("main.py", "\n".join(f"import {p.replace('/', '.')}" for p in packages) + "\n")
+
+    readme = f"# {repo}\n\nA synthetic repository with {len(out)} files.\n"
+    return {
+        "owner": "bench",
+        "repo": repo,
+        "sha": f"{rng.getrandbits(160):040x}",
+        "metadata": {
+            "name": repo,
+            "description": f"Synthetic benchmark repository ({files} files)",
+            "language": "Python",
+            "stargazers_count": 42,
+            "default_branch": "main",
+            "size": sum(f["size"] for f in out.values()) // 1024,
+        },
+        "readme": readme,
+        "files": out,
+    }
+
+
+async def record(owner_repo: str, max_files: int, max_file_kb: int) -> Dict:
+    """Capture a repository through the app's own GitHub client"""
+    from app.mcp_servers.github_client import close_github_clients
+    from app.mcp_servers.github_mcp import GitHubMCP
+
+    repo_url = f"https://github.com/{owner_repo}"
+    mcp = GitHubMCP(os.environ.get("GITHUB_TOKEN") or None)
+    mcp.max_depth = 64  # The whole tree, not the analysis depth limit
+    try:
+        head = await mcp.resolve_head(repo_url)
+        metadata = await mcp.client.get_json(f"/repos/{owner_repo}")
+        tree = await mcp.fetch_repo_tree(repo_url, "git_trees", ref=head["sha"])
+        readme = await mcp.fetch_readme(repo_url, head["sha"])
+
+        sizes = {
+            path: tree["index"].sizes[node] for node, path in tree["index"].files()
+        }
+        wanted = [
+            path
+            for path, size in sizes.items()
+            if mcp._is_code_file(path.rpartition("/")[2]) and size <= max_file_kb * 1024
+        ][:max_files]
+        texts = await mcp.fetch_files(repo_url, wanted, head["sha"])
+    finally:
+        await close_github_clients()
+
+    return {
+        "owner": head["owner"],
+        "repo": head["repo"],
+        "sha": head["sha"],
+        "metadata": {
+            key: metadata.get(key)
+            for key in (
+                "name",
+                "description",
+                "language",
+                "stargazers_count",
+                "default_branch",
+                "size",
+            )
+        },
+        "readme": readme,
+        "files": {
+            path: {"size": size, "text": texts.get(path)}
+            for path, size in sizes.items()
+        },
+    }
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Record a repository fixture")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="Capture owner/repo into fixtures/")
+    rec.add_argument("owner_repo")
+    rec.add_argument("--name", help="Fixture name (default: the repo name)")
+    rec.add_argument("--max-files", type=int, default=2000)
+    rec.add_argument("--max-file-kb", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    fixture = asyncio.run(record(args.owner_repo, args.max_files, args.max_file_kb))
+    path = save(fixture, args.name or fixture["repo"])
+    print(f"Recorded {len(fixture['files'])} files at {fixture['sha'][:12]} -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useCallback } from 'react';
 import RepoInput from './components/RepoInput';
 import LoadingState from './components/LoadingState';
 import DocumentationViewer from './components/DocumentationViewer';
 import ErrorBoundary from './components/ErrorBoundary';
-import { generateDocumentation, checkHealth } from './services/api';
+import {
+  generateDocumentation,
+  getStoredDocumentation,
+  streamDocumentation,
+  checkHealth,
+} from './services/api';
 
 function App() {
   const [isLoading, setIsLoading] = useState(false);
   const [documentation, setDocumentation] = useState(null);
+  const [pendingLevels, setPendingLevels] = useState([]);
   const [error, setError] = useState(null);
   const [repoName, setRepoName] = useState('');
+  const [repoUrl, setRepoUrl] = useState('');
   const [backendHealth, setBackendHealth] = useState(false);
   const [isDarkMode, setIsDarkMode] = useState(false);
 
@@ -37,11 +44,22 @@ function App() {
     setIsLoading(true);
     setError(null);
     setDocumentation(null);
+    setRepoUrl(repoUrl);
 
     try {
-      const result = await generateDocumentation(repoUrl);
-      setDocumentation(result.documentation);
-      setRepoName(result.repo_name);
+      // Show stored docs right away; only generate for a new repo, and
+      // only the tab that opens first (the others load when selected)
+      const stored = await getStoredDocumentation(repoUrl).catch(() => null);
+      const result =
+        stored ??
+        (await generateDocumentation(repoUrl, { levels: ['beginner'], metadataFields: [] }));
+      // Out of time is not a failure: the viewer offers to try again
+      if (!result.success && !result.pending_levels?.length) {
+        throw new Error(result.error || 'Documentation generation failed');
+      }
+      setPendingLevels(result.pending_levels ?? []);
+      setDocumentation(result.documentation ?? {});
+      setRepoName(result.repo_name ?? repoUrl.split('/').filter(Boolean).pop());
     } catch (err) {
       setError(err.message);
     } finally {
@@ -49,6 +67,42 @@ function App() {
     }
   };
 
+  // Streams the level into its tab as it is written. Resolves to the levels
+  // that didn't finish before the server's deadline.
+  const loadLevel = useCallback(
+    (level) =>
+      new Promise((resolve, reject) => {
+        // Partial text of a level that didn't finish isn't worth showing
+        const discard = () =>
+          setDocumentation(({ [level]: _partial, ...current }) => current);
+
+        streamDocumentation(repoUrl, {
+          levels: [level],
+          // Cheapest metadata there is (no stages behind it)
+          metadataFields: ['commit_sha'],
+          onToken: (tokenLevel, text) =>
+            setDocumentation((current) => ({
+              ...current,
+              [tokenLevel]: (current[tokenLevel] ?? '') + text,
+            })),
+          onComplete: (result) => {
+            const pending = result.pending_levels ?? [];
+            if (pending.includes(level)) {
+              discard();
+            } else {
+              setDocumentation((current) => ({ ...current, ...result.documentation }));
+            }
+            resolve(pending);
+          },
+          onError: (err) => {
+            discard();
+            reject(err);
+          },
+        });
+      }),
+    [repoUrl]
+  );
+
   return (
     <ErrorBoundary>
       <div className={`min-h-screen py-8 transition-colors duration-200 ${
@@ -106,6 +160,8 @@ function App() {
         {documentation && (
           <DocumentationViewer
             documentation={documentation}
+            pendingLevels={pendingLevels}
+            onLoadLevel={loadLevel}
             repoName={repoName}
             isDarkMode={isDarkMode}
           />
@@ -1,10 +1,41 @@
-import { useState } from 'react';
+import { useCallback, useEffect, useState } from 'react';
 import ReactMarkdown from 'react-markdown';
 import { Prism as SyntaxHighlighter } from 'react-syntax-highlighter';
 import { vscDarkPlus, prism } from 'react-syntax-highlighter/dist/esm/styles/prism';
 
-export default function DocumentationViewer({ documentation, repoName, isDarkMode }) {
+export default function DocumentationViewer({
+  documentation,
+  pendingLevels = [],
+  onLoadLevel,
+  repoName,
+  isDarkMode,
+}) {
   const [activeTab, setActiveTab] = useState('beginner');
+  // Per level: 'loading', 'pending' (the server ran out of time) or { error }
+  const [levelStatus, setLevelStatus] = useState(() =>
+    Object.fromEntries(pendingLevels.map((level) => [level, 'pending']))
+  );
+  const content = documentation[activeTab];
+  const status = levelStatus[activeTab];
+
+  const loadLevel = useCallback(
+    (level) => {
+      const setStatus = (value) => setLevelStatus((current) => ({ ...current, [level]: value }));
+      setStatus('loading');
+      onLoadLevel(level)
+        .then((pending) => setStatus(pending.includes(level) ? 'pending' : undefined))
+        .catch((err) => setStatus({ error: err.message }));
+    },
+    [onLoadLevel]
+  );
+
+  // Levels are generated on demand, the first time their tab is opened;
+  // pending and failed levels wait for the reader to retry
+  useEffect(() => {
+    if (content === undefined && status === undefined && onLoadLevel) {
+      loadLevel(activeTab);
+    }
+  }, [activeTab, content, status, onLoadLevel, loadLevel]);
 
   const tabs = [
     { id: 'beginner', label: 'Beginner', icon: '🌱' },
@@ -118,14 +149,32 @@ export default function DocumentationViewer({ documentation, repoName, isDarkMod
             },
           }}
         >
-          {documentation[activeTab]}
+          {content ??
+            (status === 'pending'
+              ? "_This level didn't finish in time. Finished steps were kept, so trying again picks up where it stopped._"
+              : status?.error
+              ? `Could not generate this level: ${status.error}`
+              : '_Generating documentation for this level..._')}
         </ReactMarkdown>
+        {content === undefined && (status === 'pending' || status?.error) && (
+          <button
+            onClick={() => loadLevel(activeTab)}
+            className={`mt-4 px-6 py-2 rounded-lg transition ${
+              isDarkMode
+                ? 'bg-blue-500 hover:bg-blue-600 text-white'
+                : 'bg-blue-600 hover:bg-blue-700 text-white'
+            }`}
+          >
+            Try Again
+          </button>
+        )}
       </div>
 
       {/* Download Buttons */}
       <div className="mt-6 flex gap-4">
         <button
           onClick={() => downloadMarkdown(activeTab)}
+          disabled={content === undefined}
           className={`px-6 py-2 rounded-lg transition ${
             isDarkMode
               ? 'bg-green-600 hover:bg-green-700 text-white'
@@ -2,10 +2,14 @@ import axios from 'axios';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
-export const generateDocumentation = async (repoUrl) => {
+// levels/metadataFields default to everything; the app asks for one level
+// at a time and no metadata, which saves Gemini calls and bytes.
+export const generateDocumentation = async (repoUrl, { levels, metadataFields } = {}) => {
   try {
     const response = await axios.post(`${API_BASE_URL}/api/v1/generate`, {
       repo_url: repoUrl,
+      levels,
+      metadata_fields: metadataFields,
     });
     return response.data;
   } catch (error) {
@@ -22,6 +26,55 @@ export const generateDocumentation = async (repoUrl) => {
   }
 };
 
+// Previously generated docs for a repo, or null if there are none yet.
+// The browser revalidates with the stored ETag, so repeat views are cheap.
+export const getStoredDocumentation = async (repoUrl) => {
+  const [owner, repo] = new URL(repoUrl).pathname.split('/').filter(Boolean);
+  try {
+    const response = await axios.get(`${API_BASE_URL}/api/v1/docs/${owner}/${repo}`);
+    return response.data;
+  } catch (error) {
+    if (error.response?.status === 404) {
+      return null;
+    }
+    throw error;
+  }
+};
+
+// Stream generation over Server-Sent Events. Returns a function that closes
+// the stream (which also stops generation on the server). levels and
+// metadataFields select like generateDocumentation, but an empty list can't
+// be sent as a query, so leave metadataFields unset only to get everything.
+export const streamDocumentation = (
+  repoUrl,
+  { levels, metadataFields, onStage, onToken, onComplete, onError } = {}
+) => {
+  const params = new URLSearchParams({ repo_url: repoUrl });
+  levels?.forEach((level) => params.append('levels', level));
+  metadataFields?.forEach((field) => params.append('metadata_fields', field));
+  const source = new EventSource(`${API_BASE_URL}/api/v1/generate/stream?${params}`);
+
+  source.addEventListener('stage', (event) => {
+    onStage?.(JSON.parse(event.data).stage);
+  });
+  source.addEventListener('token', (event) => {
+    const { level, text } = JSON.parse(event.data);
+    onToken?.(level, text);
+  });
+  source.addEventListener('complete', (event) => {
+    source.close();
+    onComplete?.(JSON.parse(event.data));
+  });
+  source.addEventListener('error', (event) => {
+    source.close();
+    // Server-sent "error" events carry data; connection failures don't
+    const message = event.data ? JSON.parse(event.data).error : 'Stream connection lost';
+    onError?.(new Error(message));
+  });
+
+  return () => source.close();
+};
+
 export const checkHealth = async () => {
   try {
     const response = await axios.get(`${API_BASE_URL}/api/v1/health`);